@@ -0,0 +1,212 @@
+import time
+from collections import defaultdict
+from pathlib import Path
+from statistics import median
+from tempfile import TemporaryDirectory
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import click
+
+from benchmarks.utils import (
+    RESULTS_DIR,
+    compare_results,
+    get_env,
+    get_environment,
+    get_git_revision,
+    get_sqs_client,
+    get_version,
+    load_results,
+    moto_server,
+    run_python,
+    save_results,
+    summarize,
+    write_config,
+)
+
+if TYPE_CHECKING:
+    from mypy_boto3_sqs import SQSClient
+
+CONFIG = """[secrets]
+mysecret = {string = "value"}
+
+[topics]
+mytopic = {subscribers = [{queue = "subscribed"}]}
+
+[queues]
+myqueue = {}
+subscribed = {}
+purged = {}
+
+[lambdas]
+print = {handler = "qldebugger.example.lambdas.print_messages"}
+
+[event_source_mapping]
+bench = {queue = "myqueue", function_name = "print", batch_size = 1}
+"""
+
+TOP_PACKAGES = 15
+
+
+class Workspace(NamedTuple):
+    config_dir: Path
+    empty_dir: Path
+    sqs: 'SQSClient'
+
+
+class Scenario(NamedTuple):
+    argv: Tuple[str, ...]
+    setup: Optional[Callable[[Workspace], Path]] = None
+
+
+def _in_config_dir(workspace: Workspace) -> Path:
+    return workspace.config_dir
+
+
+def _in_empty_dir(workspace: Workspace) -> Path:
+    (workspace.empty_dir / 'qldebugger.toml').unlink(missing_ok=True)
+    return workspace.empty_dir
+
+
+def _with_message(workspace: Workspace) -> Path:
+    queue_url = workspace.sqs.get_queue_url(QueueName='myqueue')['QueueUrl']
+    workspace.sqs.send_message(QueueUrl=queue_url, MessageBody='message')
+    return workspace.config_dir
+
+
+def _with_new_queue(workspace: Workspace) -> Path:
+    # SQS allows only one purge per queue every 60 seconds
+    queue_url = workspace.sqs.get_queue_url(QueueName='purged')['QueueUrl']
+    workspace.sqs.delete_queue(QueueUrl=queue_url)
+    workspace.sqs.create_queue(QueueName='purged')
+    return workspace.config_dir
+
+
+SCENARIOS = {
+    'help': Scenario(('--help',)),
+    'init': Scenario(('init',), _in_empty_dir),
+    'run': Scenario(('run', 'bench'), _with_message),
+    'infra create-secrets': Scenario(('infra', 'create-secrets')),
+    'infra create-topics': Scenario(('infra', 'create-topics')),
+    'infra create-queues': Scenario(('infra', 'create-queues')),
+    'infra subscribe-topics': Scenario(('infra', 'subscribe-topics')),
+    'infra create-all': Scenario(('infra', 'create-all')),
+    'msg publish': Scenario(('msg', 'publish', 'mytopic', 'message')),
+    'msg send': Scenario(('msg', 'send', 'myqueue', 'message')),
+    'msg receive': Scenario(('msg', 'receive', 'myqueue'), _with_message),
+    'msg purge': Scenario(('msg', 'purge', 'purged'), _with_new_queue),
+}
+
+
+def get_package_name(module_name: str, /) -> str:
+    parts = module_name.split('.')
+    return '.'.join(parts[:3] if parts[0] == 'qldebugger' else parts[:1])
+
+
+def parse_importtime(output: str, /) -> Dict[str, int]:
+    packages: Dict[str, int] = defaultdict(int)
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        self_time, _, module_name = line[len('import time:') :].split('|', maxsplit=2)
+        if not self_time.strip().isdigit():
+            continue
+        packages[get_package_name(module_name.strip())] += int(self_time)
+    return packages
+
+
+def run_scenario(scenario: Scenario, workspace: Workspace, /, *, env: Dict[str, str], importtime: bool) -> str:
+    cwd = (scenario.setup or _in_config_dir)(workspace)
+    args = ['-X', 'importtime'] if importtime else []
+    result = run_python([*args, '-m', 'qldebugger', *scenario.argv], cwd=cwd, env=env)
+    if result.returncode != 0:
+        raise click.ClickException(f'{" ".join(scenario.argv)!r} failed:\n{result.stderr}')
+    return result.stderr
+
+
+def measure_scenario(
+    scenario: Scenario, workspace: Workspace, /, *, env: Dict[str, str], repeat: int
+) -> Dict[str, Any]:
+    run_scenario(scenario, workspace, env=env, importtime=False)
+    wall_times: List[float] = []
+    imports: Dict[str, List[int]] = defaultdict(list)
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run_scenario(scenario, workspace, env=env, importtime=False)
+        wall_times.append(time.perf_counter() - start)
+        for name, self_time in parse_importtime(run_scenario(scenario, workspace, env=env, importtime=True)).items():
+            imports[name].append(self_time)
+    packages = {name: median(times + [0] * (repeat - len(times))) / 1_000_000 for name, times in imports.items()}
+    top_packages = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:TOP_PACKAGES]
+    return {
+        'wall': summarize(wall_times),
+        'imports': {
+            'total': sum(packages.values()),
+            'packages': dict(top_packages),
+        },
+    }
+
+
+@click.command()
+@click.option('--repeat', default=10, type=click.IntRange(min=1), show_default=True)
+@click.option('--scenario', 'scenario_names', multiple=True, type=click.Choice(list(SCENARIOS)))
+@click.option('--label')
+@click.option('--output', type=click.Path(dir_okay=False, path_type=Path))
+@click.option('--compare', 'baseline_filename', type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option('--max-regression', default=10.0, type=float, show_default=True)
+def main(
+    repeat: int,
+    scenario_names: Tuple[str, ...],
+    label: Optional[str],
+    output: Optional[Path],
+    baseline_filename: Optional[Path],
+    max_regression: float,
+) -> None:
+    label = label or get_git_revision() or get_version()
+    output = output or RESULTS_DIR / f'cold-start-{label}.json'
+    scenarios = {name: SCENARIOS[name] for name in scenario_names or SCENARIOS}
+
+    results: Dict[str, Any] = {'label': label, 'environment': get_environment(), 'repeat': repeat, 'scenarios': {}}
+    with moto_server() as endpoint_url, TemporaryDirectory() as tmpdir:
+        workspace_dir = Path(tmpdir)
+        (workspace_dir / 'config').mkdir()
+        (workspace_dir / 'empty').mkdir()
+        write_config(workspace_dir / 'config', endpoint_url=endpoint_url, body=CONFIG)
+        env = get_env(cache_dir=workspace_dir / 'cache')
+        workspace = Workspace(
+            config_dir=workspace_dir / 'config',
+            empty_dir=workspace_dir / 'empty',
+            sqs=get_sqs_client(endpoint_url=endpoint_url),
+        )
+        run_scenario(SCENARIOS['infra create-all'], workspace, env=env, importtime=False)
+        for name, scenario in scenarios.items():
+            stats = measure_scenario(scenario, workspace, env=env, repeat=repeat)
+            results['scenarios'][name] = stats
+            wall_time, import_time = stats['wall']['median'], stats['imports']['total']
+            click.echo(f'{name}: {wall_time * 1000:.1f}ms wall, {import_time * 1000:.1f}ms imports')
+
+    save_results(output, results)
+    click.echo(f'Results saved to {str(output)!r}')
+
+    if baseline_filename is not None:
+        baseline = load_results(baseline_filename)['scenarios']
+        current = results['scenarios']
+        click.echo('\nImports (s):')
+        compare_results(
+            {name: stats['imports'] for name, stats in baseline.items()},
+            {name: stats['imports'] for name, stats in current.items()},
+            metric='total',
+            max_regression=max_regression,
+        )
+        click.echo('\nWall time (s):')
+        regressions = compare_results(
+            {name: stats['wall'] for name, stats in baseline.items()},
+            {name: stats['wall'] for name, stats in current.items()},
+            metric='median',
+            max_regression=max_regression,
+        )
+        if regressions:
+            raise click.ClickException(f'Cold start regressions: {", ".join(regressions)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,10 @@
+import os
+import time
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from aws_lambda_typing.events import SQSEvent
+
+
+def sleep(event: 'SQSEvent', context: None) -> None:
+    time.sleep(float(os.environ['HANDLER_COST']) * len(event['Records']))
@@ -0,0 +1,207 @@
+import os
+from collections import defaultdict
+from itertools import product
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from unittest.mock import patch
+
+import click
+
+from benchmarks.utils import (
+    RESULTS_DIR,
+    compare_results,
+    get_aws_config,
+    get_environment,
+    get_git_revision,
+    get_version,
+    load_results,
+    moto_server,
+    save_results,
+    summarize,
+)
+from qldebugger.actions import event_source_mapping
+from qldebugger.actions.infra import create_all
+from qldebugger.actions.lambda_ import run_lambda
+from qldebugger.actions.message import (
+    MessageEntry,
+    publish_message,
+    receive_message_batch,
+    send_message,
+    send_messages,
+)
+from qldebugger.config import get_config, set_config
+from qldebugger.config.file_parser import Config
+
+Case = Tuple[int, float]
+
+
+def get_case_name(batch_size: int, handler_cost: float, /) -> str:
+    return f'batch_size={batch_size},handler_cost={handler_cost}'
+
+
+def build_config(*, endpoint_url: str, cases: List[Case]) -> Dict[str, Any]:
+    config: Dict[str, Any] = {
+        'aws': get_aws_config(endpoint_url=endpoint_url),
+        'topics': {'published': {'subscribers': [{'queue': 'published'}]}},
+        'queues': {'sent': {}, 'published': {}},
+        'lambdas': {},
+        'event_source_mapping': {},
+    }
+    for i, (batch_size, handler_cost) in enumerate(cases):
+        config['queues'][f'case-{i}'] = {}
+        config['lambdas'][f'case-{i}'] = {
+            'handler': 'benchmarks.lambdas.sleep',
+            'environment': {'HANDLER_COST': str(handler_cost)},
+        }
+        config['event_source_mapping'][f'case-{i}'] = {
+            'queue': f'case-{i}',
+            'function_name': f'case-{i}',
+            'batch_size': batch_size,
+        }
+    return config
+
+
+def measure_calls(func: Callable[[int], object], /, *, count: int) -> Dict[str, Any]:
+    latencies = []
+    start = perf_counter()
+    for i in range(count):
+        call_start = perf_counter()
+        func(i)
+        latencies.append(perf_counter() - call_start)
+    elapsed = perf_counter() - start
+    return {'messages': count, 'elapsed': elapsed, 'throughput': count / elapsed, 'latency': summarize(latencies)}
+
+
+def _timed(func: Callable[..., Any], latencies: List[float], /) -> Callable[..., Any]:
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        start = perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            latencies.append(perf_counter() - start)
+
+    return wrapper
+
+
+def measure_event_source_mapping(event_source_mapping_name: str, /, *, messages: int) -> Dict[str, Any]:
+    queue_name = get_config().event_source_mapping[event_source_mapping_name].queue
+    start = perf_counter()
+    send_messages(queue_name=queue_name, entries=(MessageEntry(f'message {i}', {}) for i in range(messages)))
+    seed_elapsed = perf_counter() - start
+
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    received = 0
+    timed_receive_message_batch = _timed(receive_message_batch, latencies['receive'])
+
+    def receive(**kwargs: Any) -> Any:
+        nonlocal received
+        batch = timed_receive_message_batch(**kwargs)
+        received += len(batch.get('Messages', []))
+        return batch
+
+    with patch.multiple(
+        event_source_mapping,
+        receive_message_batch=receive,
+        run_lambda=_timed(run_lambda, latencies['lambda']),
+        complete_messages=_timed(event_source_mapping.complete_messages, latencies['complete']),
+    ):
+        start = end = perf_counter()
+        while True:
+            batch_start = perf_counter()
+            try:
+                event_source_mapping.receive_messages_and_run_lambda(
+                    event_source_mapping_name=event_source_mapping_name
+                )
+            except RuntimeWarning:
+                break
+            end = perf_counter()
+            latencies['batch'].append(end - batch_start)
+    # The last receive only confirms that the queue is empty
+    latencies['receive'].pop()
+
+    elapsed = end - start
+    return {
+        'seed': {'messages': messages, 'elapsed': seed_elapsed, 'throughput': messages / seed_elapsed},
+        'messages': received,
+        'batches': len(latencies['batch']),
+        'elapsed': elapsed,
+        'throughput': received / elapsed if elapsed else 0.0,
+        'stages': {stage: summarize(values) for stage, values in latencies.items() if values},
+    }
+
+
+def get_throughputs(results: Dict[str, Any], /) -> Dict[str, Dict[str, float]]:
+    throughputs = {name: {'throughput': results[name]['throughput']} for name in ('send_message', 'publish_message')}
+    for name, stats in results['event_source_mapping'].items():
+        throughputs[f'event_source_mapping {name}'] = {'throughput': stats['throughput']}
+    return throughputs
+
+
+@click.command()
+@click.option('--messages', default=1000, type=click.IntRange(min=1), show_default=True)
+@click.option('--batch-size', 'batch_sizes', multiple=True, default=[1, 10], type=click.IntRange(min=1, max=10_000))
+@click.option('--handler-cost', 'handler_costs', multiple=True, default=[0.0], type=click.FloatRange(min=0))
+@click.option('--label')
+@click.option('--output', type=click.Path(dir_okay=False, path_type=Path))
+@click.option('--compare', 'baseline_filename', type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option('--max-regression', default=10.0, type=float, show_default=True)
+def main(
+    messages: int,
+    batch_sizes: Tuple[int, ...],
+    handler_costs: Tuple[float, ...],
+    label: Optional[str],
+    output: Optional[Path],
+    baseline_filename: Optional[Path],
+    max_regression: float,
+) -> None:
+    label = label or get_git_revision() or get_version()
+    output = output or RESULTS_DIR / f'throughput-{label}.json'
+    cases = list(product(batch_sizes, handler_costs))
+
+    results: Dict[str, Any] = {
+        'label': label,
+        'environment': get_environment(),
+        'parameters': {'messages': messages, 'batch_sizes': batch_sizes, 'handler_costs': handler_costs},
+        'results': {'event_source_mapping': {}},
+    }
+    with moto_server() as endpoint_url, TemporaryDirectory() as tmpdir:
+        os.environ['XDG_CACHE_HOME'] = tmpdir
+
+        set_config(Config.model_validate(build_config(endpoint_url=endpoint_url, cases=cases)))
+        create_all()
+
+        stats = results['results']['send_message'] = measure_calls(
+            lambda i: send_message(queue_name='sent', message=f'message {i}'), count=messages
+        )
+        click.echo(f'send_message: {stats["throughput"]:.1f} messages/s')
+        stats = results['results']['publish_message'] = measure_calls(
+            lambda i: publish_message(topic_name='published', message=f'message {i}', attributes={}), count=messages
+        )
+        click.echo(f'publish_message: {stats["throughput"]:.1f} messages/s')
+        for i, (batch_size, handler_cost) in enumerate(cases):
+            name = get_case_name(batch_size, handler_cost)
+            stats = results['results']['event_source_mapping'][name] = measure_event_source_mapping(
+                f'case-{i}', messages=messages
+            )
+            click.echo(f'event_source_mapping {name}: {stats["throughput"]:.1f} messages/s')
+
+    save_results(output, results)
+    click.echo(f'Results saved to {str(output)!r}')
+
+    if baseline_filename is not None:
+        click.echo('\nThroughput (messages/s):')
+        regressions = compare_results(
+            get_throughputs(load_results(baseline_filename)['results']),
+            get_throughputs(results['results']),
+            metric='throughput',
+            max_regression=max_regression,
+            higher_is_better=True,
+        )
+        if regressions:
+            raise click.ClickException(f'Throughput regressions: {", ".join(regressions)}')
+
+
+if __name__ == '__main__':
+    main()
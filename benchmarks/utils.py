@@ -0,0 +1,191 @@
+import json
+import math
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Sequence
+
+import boto3
+import click
+import tomli
+
+if TYPE_CHECKING:
+    from mypy_boto3_sqs import SQSClient
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = ROOT_DIR / 'benchmarks' / 'results'
+
+ACCOUNT_ID = '123456789012'
+
+
+def get_sqs_client(*, endpoint_url: str) -> 'SQSClient':
+    return boto3.client(
+        'sqs',
+        region_name='us-east-1',
+        endpoint_url=endpoint_url,
+        aws_access_key_id='secret',
+        aws_secret_access_key='secret',  # noqa: S106
+    )
+
+
+def _get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return int(sock.getsockname()[1])
+
+
+def _wait_port(port: int, /, *, process: 'subprocess.Popen[bytes]', timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while process.poll() is None and time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.1).close()
+        except OSError:
+            time.sleep(0.05)
+        else:
+            return
+    raise RuntimeError('Moto server did not start')
+
+
+@contextmanager
+def moto_server() -> Iterator[str]:
+    # Separate process, so the server does not compete with the benchmark for the GIL
+    port = _get_free_port()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'moto.server', '-H', '127.0.0.1', '-p', str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        _wait_port(port, process=process, timeout=30)
+        yield f'http://127.0.0.1:{port}/'
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def get_aws_config(*, endpoint_url: str) -> Dict[str, str]:
+    return {
+        'access_key_id': 'secret',
+        'secret_access_key': 'secret',
+        'region': 'us-east-1',
+        'endpoint_url': endpoint_url,
+        'account_id': ACCOUNT_ID,
+    }
+
+
+def write_config(path: Path, /, *, endpoint_url: str, body: str) -> Path:
+    filename = path / 'qldebugger.toml'
+    aws_config = ''.join(f'{key} = "{value}"\n' for key, value in get_aws_config(endpoint_url=endpoint_url).items())
+    filename.write_text(f'[aws]\n{aws_config}\n{body}')
+    return filename
+
+
+def get_env(*, cache_dir: Path) -> Dict[str, str]:
+    env = os.environ.copy()
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(ROOT_DIR / 'src'), env.get('PYTHONPATH')]))
+    env['XDG_CACHE_HOME'] = str(cache_dir)
+    return env
+
+
+def get_version() -> str:
+    with (ROOT_DIR / 'pyproject.toml').open('rb') as fp:
+        return str(tomli.load(fp)['tool']['poetry']['version'])
+
+
+def get_git_revision() -> Optional[str]:
+    try:
+        result = subprocess.run(
+            ['git', 'describe', '--tags', '--always', '--dirty'],
+            cwd=ROOT_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def get_environment() -> Dict[str, Any]:
+    return {
+        'version': get_version(),
+        'git_revision': get_git_revision(),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    }
+
+
+def percentile(values: Sequence[float], p: float, /) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(len(ordered) * p / 100) - 1)]
+
+
+def summarize(values: Sequence[float], /) -> Dict[str, float]:
+    return {
+        'min': min(values),
+        'median': statistics.median(values),
+        'mean': statistics.mean(values),
+        'p99': percentile(values, 99),
+        'max': max(values),
+        'stdev': statistics.stdev(values) if len(values) > 1 else 0.0,
+    }
+
+
+def save_results(filename: Path, results: Dict[str, Any], /) -> None:
+    filename.parent.mkdir(parents=True, exist_ok=True)
+    with filename.open('w') as fp:
+        json.dump(results, fp, indent=2, sort_keys=True)
+        fp.write('\n')
+
+
+def load_results(filename: Path, /) -> Dict[str, Any]:
+    with filename.open() as fp:
+        data = json.load(fp)
+    if not isinstance(data, dict):
+        raise ValueError(f'Invalid results file {str(filename)!r}')
+    return data
+
+
+def compare_results(
+    baseline: Dict[str, Dict[str, float]],
+    current: Dict[str, Dict[str, float]],
+    /,
+    *,
+    metric: str,
+    max_regression: float,
+    higher_is_better: bool = False,
+) -> List[str]:
+    regressions = []
+    width = max(map(len, current), default=0)
+    click.echo(f'{"":{width}}  {"baseline":>10}  {"current":>10}  {"delta":>8}')
+    for name, stats in current.items():
+        if name not in baseline:
+            click.echo(f'{name:{width}}  {"-":>10}  {stats[metric]:>10.4f}  {"-":>8}')
+            continue
+        before = baseline[name][metric]
+        delta = (stats[metric] - before) / before * 100 if before else 0.0
+        click.echo(f'{name:{width}}  {before:>10.4f}  {stats[metric]:>10.4f}  {delta:>+7.1f}%')
+        if (-delta if higher_is_better else delta) > max_regression:
+            regressions.append(name)
+    return regressions
+
+
+def run_python(args: Sequence[str], /, *, cwd: Path, env: Dict[str, str]) -> 'subprocess.CompletedProcess[str]':
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=cwd,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
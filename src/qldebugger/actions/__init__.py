@@ -1,4 +1,8 @@
-from . import event_source_mapping, infra, lambda_, message
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from . import event_source_mapping, infra, lambda_, message  # noqa: TCH004
 
 __all__ = [
     'event_source_mapping',
@@ -6,3 +10,9 @@ __all__ = [
     'lambda_',
     'message',
 ]
+
+
+def __getattr__(name: str) -> Any:
+    if name in __all__:
+        return import_module(f'.{name}', __name__)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
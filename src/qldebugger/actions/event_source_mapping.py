@@ -1,11 +1,27 @@
+import asyncio
 import logging
-from typing import TYPE_CHECKING
+import signal
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ThreadPoolExecutor, as_completed, wait
+from contextlib import closing, suppress
+from functools import partial
+from threading import Event, Thread
+from time import monotonic, perf_counter
+from typing import TYPE_CHECKING, Any, Callable, Deque, Dict, Generator, Optional, Sequence, Set, Tuple
 
-from qldebugger.aws import get_account_id, get_client
+from qldebugger.aws import get_account_id, get_client, get_queue_arn
 from qldebugger.config import get_config
+from qldebugger.config.file_parser import ConfigEventSourceMapping
+from qldebugger.metrics import increment_counter, measure_stage, observe_stage
 
-from .lambda_ import run_lambda
-from .message import delete_messages, receive_message
+from .lambda_ import get_profile_filename, run_lambda, submit_lambda
+from .message import (
+    change_messages_visibility,
+    delete_messages,
+    get_visibility_timeout,
+    receive_message_batch,
+    release_messages,
+)
 
 if TYPE_CHECKING:
     from aws_lambda_typing.events import SQSEvent
@@ -13,27 +29,652 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
+# Event source mappings whose last receive was empty, so following an idle queue warns only once
+_idle_event_source_mappings: Set[str] = set()
+
+
+class EventSourceMappingsError(Exception):
+    def __init__(self, event_source_mapping_names: Sequence[str]) -> None:
+        super().__init__(f'Error on execute event source mappings: {", ".join(event_source_mapping_names)}')
+        self.event_source_mapping_names = event_source_mapping_names
+
 
 def receive_messages_and_run_lambda(*, event_source_mapping_name: str) -> None:
     sqs = get_client('sqs')
     event_source_mapping = get_config().event_source_mapping[event_source_mapping_name]
 
-    queue_arn = f'arn:{sqs.meta.partition}:sqs:{sqs.meta.region_name}:{get_account_id()}:{event_source_mapping.queue}'
+    queue_arn = get_queue_arn(event_source_mapping.queue)
+    heartbeat_visibility_timeout = get_heartbeat_visibility_timeout(event_source_mapping=event_source_mapping)
 
     logger.debug('Execute %r event source mapping...', event_source_mapping_name)
-    messages = receive_message(
-        queue_name=event_source_mapping.queue,
-        batch_size=event_source_mapping.batch_size,
-        maximum_batching_window=event_source_mapping.maximum_batching_window,
-    )
-    event = convert_sqs_messages_to_event(
-        aws_region=sqs.meta.region_name,
-        event_source=f'{sqs.meta.partition}:sqs',
-        event_source_arn=queue_arn,
+    messages = receive_messages(
+        partial(
+            receive_message_batch,
+            queue_name=event_source_mapping.queue,
+            batch_size=event_source_mapping.batch_size,
+            maximum_batching_window=event_source_mapping.maximum_batching_window,
+        ),
+        event_source_mapping_name=event_source_mapping_name,
+    )
+    with measure_stage(event_source_mapping_name, 'convert'):
+        event = convert_sqs_messages_to_event(
+            aws_region=sqs.meta.region_name,
+            event_source=f'{sqs.meta.partition}:sqs',
+            event_source_arn=queue_arn,
+            messages=messages,
+        )
+    stop_heartbeat = start_visibility_heartbeat(
+        event_source_mapping=event_source_mapping, messages=messages, visibility_timeout=heartbeat_visibility_timeout
+    )
+    try:
+        with measure_stage(event_source_mapping_name, 'lambda'):
+            result = run_lambda(
+                lambda_name=event_source_mapping.function_name,
+                event=event,
+                profile_filename=get_profile_filename(
+                    lambda_name=event_source_mapping.function_name, event_source_mapping_name=event_source_mapping_name
+                ),
+            )
+    except Exception:
+        _count_messages(event_source_mapping_name, 'failed', messages)
+        raise
+    finally:
+        stop_heartbeat()
+    complete_batch(
+        event_source_mapping_name=event_source_mapping_name,
+        event_source_mapping=event_source_mapping,
         messages=messages,
+        result=result,
+    )
+
+
+def poll_messages_and_run_lambda(
+    *,
+    event_source_mapping_name: str,
+    poll_interval: float = 1,
+    processes: int = 0,
+    prefetch: int = 0,
+    stop_event: Optional[Event] = None,
+) -> None:
+    if stop_event is None:
+        stop_event = Event()
+    sqs = get_client('sqs')
+    event_source_mapping = get_config().event_source_mapping[event_source_mapping_name]
+
+    queue_arn = get_queue_arn(event_source_mapping.queue)
+    heartbeat_visibility_timeout = get_heartbeat_visibility_timeout(event_source_mapping=event_source_mapping)
+    receive = partial(
+        receive_messages,
+        partial(
+            receive_message_batch,
+            queue_name=event_source_mapping.queue,
+            batch_size=event_source_mapping.batch_size,
+            maximum_batching_window=event_source_mapping.maximum_batching_window,
+        ),
+        event_source_mapping_name=event_source_mapping_name,
+    )
+
+    logger.info('Polling %r event source mapping, press Ctrl+C to stop...', event_source_mapping_name)
+    batches = 0
+    in_flight: Dict['Future[Any]', 'ReceiveMessageResultTypeDef'] = {}
+    with ThreadPoolExecutor(max_workers=prefetch + 1, thread_name_prefix='qldebugger-prefetch') as executor:
+        delete_executor = executor if prefetch > 0 else None
+        with closing(
+            prefetch_messages(receive, queue_name=event_source_mapping.queue, prefetch=prefetch, executor=executor)
+            if prefetch > 0
+            else iter_messages(receive)
+        ) as received:
+            try:
+                while not stop_event.is_set():
+                    if in_flight:
+                        complete_lambda_batches(
+                            event_source_mapping_name=event_source_mapping_name,
+                            event_source_mapping=event_source_mapping,
+                            in_flight=in_flight,
+                            block=len(in_flight) >= processes,
+                            executor=delete_executor,
+                        )
+                    messages = next(received)
+                    if messages is None:
+                        stop_event.wait(poll_interval)
+                        continue
+                    with measure_stage(event_source_mapping_name, 'convert'):
+                        event = convert_sqs_messages_to_event(
+                            aws_region=sqs.meta.region_name,
+                            event_source=f'{sqs.meta.partition}:sqs',
+                            event_source_arn=queue_arn,
+                            messages=messages,
+                        )
+                    batches += 1
+                    stop_heartbeat = start_visibility_heartbeat(
+                        event_source_mapping=event_source_mapping,
+                        messages=messages,
+                        visibility_timeout=heartbeat_visibility_timeout,
+                    )
+                    profile_filename = get_profile_filename(
+                        lambda_name=event_source_mapping.function_name,
+                        event_source_mapping_name=event_source_mapping_name,
+                    )
+                    if processes > 0:
+                        future = submit_lambda(
+                            lambda_name=event_source_mapping.function_name,
+                            event=event,
+                            processes=processes,
+                            profile_filename=profile_filename,
+                        )
+                        future.add_done_callback(stop_heartbeat)
+                        future.add_done_callback(partial(_observe_lambda, event_source_mapping_name, perf_counter()))
+                        in_flight[future] = messages
+                        continue
+                    try:
+                        with measure_stage(event_source_mapping_name, 'lambda'):
+                            result = run_lambda(
+                                lambda_name=event_source_mapping.function_name,
+                                event=event,
+                                profile_filename=profile_filename,
+                            )
+                    except Exception:  # noqa: BLE001
+                        logger.warning('Messages will be available again after the queue visibility timeout')
+                        _count_messages(event_source_mapping_name, 'failed', messages)
+                        continue
+                    finally:
+                        stop_heartbeat()
+                    complete_batch(
+                        event_source_mapping_name=event_source_mapping_name,
+                        event_source_mapping=event_source_mapping,
+                        messages=messages,
+                        result=result,
+                        executor=delete_executor,
+                    )
+            except KeyboardInterrupt:
+                pass
+            while in_flight:
+                complete_lambda_batches(
+                    event_source_mapping_name=event_source_mapping_name,
+                    event_source_mapping=event_source_mapping,
+                    in_flight=in_flight,
+                    block=True,
+                    executor=delete_executor,
+                )
+    logger.info('Stopped polling %r event source mapping after %d batches', event_source_mapping_name, batches)
+
+
+def get_heartbeat_visibility_timeout(*, event_source_mapping: ConfigEventSourceMapping) -> Optional[int]:
+    interval = event_source_mapping.visibility_heartbeat_interval
+    if interval is None:
+        return None
+    return max(get_visibility_timeout(queue_name=event_source_mapping.queue), interval * 2)
+
+
+def start_visibility_heartbeat(
+    *,
+    event_source_mapping: ConfigEventSourceMapping,
+    messages: 'ReceiveMessageResultTypeDef',
+    visibility_timeout: Optional[int],
+) -> Callable[..., None]:
+    interval = event_source_mapping.visibility_heartbeat_interval
+    if interval is None or visibility_timeout is None:
+        return lambda *_: None
+    stop_event = Event()
+
+    def heartbeat() -> None:
+        while not stop_event.wait(interval):
+            try:
+                change_messages_visibility(
+                    queue_name=event_source_mapping.queue, messages=messages, visibility_timeout=visibility_timeout
+                )
+            except Exception as e:  # noqa: BLE001
+                logger.warning('Error on extend visibility timeout of messages (%r)', e)
+
+    thread = Thread(target=heartbeat, name='qldebugger-heartbeat', daemon=True)
+    thread.start()
+
+    def stop(*_: object) -> None:
+        stop_event.set()
+        thread.join()
+
+    return stop
+
+
+def iter_messages(
+    receive: Callable[[], 'ReceiveMessageResultTypeDef'], /
+) -> Generator[Optional['ReceiveMessageResultTypeDef'], None, None]:
+    while True:
+        try:
+            yield receive()
+        except RuntimeWarning:
+            yield None
+
+
+def _receive_message_at(
+    receive: Callable[[], 'ReceiveMessageResultTypeDef'], /
+) -> Tuple[float, 'ReceiveMessageResultTypeDef']:
+    messages = receive()
+    return monotonic(), messages
+
+
+def prefetch_messages(
+    receive: Callable[[], 'ReceiveMessageResultTypeDef'],
+    /,
+    *,
+    queue_name: str,
+    prefetch: int,
+    executor: Executor,
+) -> Generator[Optional['ReceiveMessageResultTypeDef'], None, None]:
+    visibility_timeout = get_visibility_timeout(queue_name=queue_name)
+    pending: Deque['Future[Tuple[float, ReceiveMessageResultTypeDef]]'] = deque()
+    try:
+        while True:
+            if not pending:
+                pending.append(executor.submit(_receive_message_at, receive))
+            try:
+                received_at, messages = pending.popleft().result()
+            except RuntimeWarning:
+                yield None
+                continue
+            while len(pending) < prefetch:
+                pending.append(executor.submit(_receive_message_at, receive))
+            if monotonic() - received_at >= visibility_timeout:
+                logger.warning('Prefetched messages of %r queue exceeded the visibility timeout', queue_name)
+                continue
+            yield messages
+    finally:
+        for future in pending:
+            if future.cancel() or future.exception() is not None:
+                continue
+            release_messages(queue_name=queue_name, messages=future.result()[1])
+
+
+def get_batch_item_failures(*, result: Any, messages: 'ReceiveMessageResultTypeDef') -> Set[str]:
+    message_ids = {message['MessageId'] for message in messages['Messages']}
+    if result is None:
+        return set()
+    if not isinstance(result, dict):
+        logger.warning('Invalid lambda response (%r), the whole batch failed', result)
+        return message_ids
+    failures = result.get('batchItemFailures')
+    if failures is None:
+        return set()
+    if not isinstance(failures, list):
+        logger.warning('Invalid batch item failures (%r), the whole batch failed', failures)
+        return message_ids
+    failed_message_ids = set()
+    for failure in failures:
+        item_identifier = failure.get('itemIdentifier') if isinstance(failure, dict) else None
+        if item_identifier not in message_ids:
+            logger.warning('Invalid batch item failure (%r), the whole batch failed', failure)
+            return message_ids
+        failed_message_ids.add(item_identifier)
+    return failed_message_ids
+
+
+def complete_messages(
+    *,
+    event_source_mapping: ConfigEventSourceMapping,
+    messages: 'ReceiveMessageResultTypeDef',
+    result: Any,
+    executor: Optional[Executor] = None,
+) -> int:
+    failed_message_ids = (
+        get_batch_item_failures(result=result, messages=messages)
+        if 'ReportBatchItemFailures' in event_source_mapping.function_response_types
+        else set()
+    )
+    if failed_message_ids:
+        logger.warning('Lambda reported %d failed messages, releasing them', len(failed_message_ids))
+        failed = messages.copy()
+        failed['Messages'] = [m for m in messages['Messages'] if m['MessageId'] in failed_message_ids]
+        _run_in_background(release_messages, queue_name=event_source_mapping.queue, messages=failed, executor=executor)
+        succeeded = messages.copy()
+        succeeded['Messages'] = [m for m in messages['Messages'] if m['MessageId'] not in failed_message_ids]
+        if not succeeded['Messages']:
+            return len(failed_message_ids)
+        messages = succeeded
+    _run_in_background(delete_messages, queue_name=event_source_mapping.queue, messages=messages, executor=executor)
+    return len(failed_message_ids)
+
+
+def receive_messages(
+    receive: Callable[[], 'ReceiveMessageResultTypeDef'], /, *, event_source_mapping_name: str
+) -> 'ReceiveMessageResultTypeDef':
+    try:
+        with measure_stage(event_source_mapping_name, 'receive'):
+            messages = receive()
+    except RuntimeWarning:
+        increment_counter('qldebugger_empty_receives_total', event_source_mapping=event_source_mapping_name)
+        if event_source_mapping_name not in _idle_event_source_mappings:
+            _idle_event_source_mappings.add(event_source_mapping_name)
+            logger.warning('No messages received by %r event source mapping', event_source_mapping_name)
+        raise
+    _idle_event_source_mappings.discard(event_source_mapping_name)
+    increment_counter('qldebugger_batches_total', event_source_mapping=event_source_mapping_name)
+    _count_messages(event_source_mapping_name, 'received', messages)
+    return messages
+
+
+def complete_batch(
+    *,
+    event_source_mapping_name: str,
+    event_source_mapping: ConfigEventSourceMapping,
+    messages: 'ReceiveMessageResultTypeDef',
+    result: Any,
+    executor: Optional[Executor] = None,
+) -> None:
+    with measure_stage(event_source_mapping_name, 'complete'):
+        failed = complete_messages(
+            event_source_mapping=event_source_mapping, messages=messages, result=result, executor=executor
+        )
+    increment_counter(
+        'qldebugger_messages_total',
+        len(messages['Messages']) - failed,
+        event_source_mapping=event_source_mapping_name,
+        status='succeeded',
+    )
+    if failed:
+        increment_counter(
+            'qldebugger_messages_total', failed, event_source_mapping=event_source_mapping_name, status='failed'
+        )
+
+
+def _count_messages(event_source_mapping_name: str, status: str, messages: 'ReceiveMessageResultTypeDef') -> None:
+    increment_counter(
+        'qldebugger_messages_total',
+        len(messages['Messages']),
+        event_source_mapping=event_source_mapping_name,
+        status=status,
+    )
+
+
+def _observe_lambda(event_source_mapping_name: str, start: float, future: 'Future[Any]') -> None:
+    observe_stage(event_source_mapping_name, 'lambda', perf_counter() - start)
+    if future.cancelled() or future.exception() is not None:
+        increment_counter(
+            'qldebugger_stage_errors_total', event_source_mapping=event_source_mapping_name, stage='lambda'
+        )
+
+
+def _run_in_background(
+    func: Callable[..., None],
+    /,
+    *,
+    queue_name: str,
+    messages: 'ReceiveMessageResultTypeDef',
+    executor: Optional[Executor],
+) -> None:
+    if executor is None:
+        func(queue_name=queue_name, messages=messages)
+        return
+    executor.submit(func, queue_name=queue_name, messages=messages).add_done_callback(_log_background_error)
+
+
+def _log_background_error(future: 'Future[None]') -> None:
+    error = future.exception()
+    if error is not None:
+        logger.warning('Error on complete messages (%r), messages will be available again later', error)
+
+
+def complete_lambda_batches(
+    *,
+    event_source_mapping_name: str,
+    event_source_mapping: ConfigEventSourceMapping,
+    in_flight: Dict['Future[Any]', 'ReceiveMessageResultTypeDef'],
+    block: bool,
+    executor: Optional[Executor] = None,
+) -> None:
+    done = wait(in_flight, return_when=FIRST_COMPLETED).done if block else [f for f in in_flight if f.done()]
+    for future in done:
+        messages = in_flight.pop(future)
+        try:
+            result = future.result()
+        except Exception as e:  # noqa: BLE001
+            logger.warning('Error on execute lambda (%r), messages will be available again later', e)
+            _count_messages(event_source_mapping_name, 'failed', messages)
+            continue
+        complete_batch(
+            event_source_mapping_name=event_source_mapping_name,
+            event_source_mapping=event_source_mapping,
+            messages=messages,
+            result=result,
+            executor=executor,
+        )
+
+
+def run_event_source_mappings(
+    *,
+    event_source_mapping_names: Sequence[str],
+    follow: bool = False,
+    poll_interval: float = 1,
+    processes: int = 0,
+    prefetch: int = 0,
+    workers: Optional[int] = None,
+) -> None:
+    if workers is None:
+        workers = len(event_source_mapping_names)
+
+    get_client('sqs')
+    get_account_id()
+
+    stop_event = Event()
+    failed = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='qldebugger') as executor:
+        futures = {
+            (
+                executor.submit(
+                    poll_messages_and_run_lambda,
+                    event_source_mapping_name=event_source_mapping_name,
+                    poll_interval=poll_interval,
+                    processes=processes,
+                    prefetch=prefetch,
+                    stop_event=stop_event,
+                )
+                if follow
+                else executor.submit(
+                    receive_messages_and_run_lambda, event_source_mapping_name=event_source_mapping_name
+                )
+            ): event_source_mapping_name
+            for event_source_mapping_name in event_source_mapping_names
+        }
+        try:
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except RuntimeWarning:
+                    pass
+                except Exception:
+                    logger.exception('Error on execute %r event source mapping', futures[future])
+                    failed.append(futures[future])
+        except KeyboardInterrupt:
+            logger.info('Stopping event source mappings...')
+            stop_event.set()
+            for future in futures:
+                future.cancel()
+    if failed:
+        raise EventSourceMappingsError(failed)
+
+
+async def poll_messages_and_run_lambda_async(
+    *,
+    event_source_mapping_name: str,
+    executor: ThreadPoolExecutor,
+    stop_event: asyncio.Event,
+    follow: bool = True,
+    poll_interval: float = 1,
+    processes: int = 0,
+    lambda_executor: Optional[ThreadPoolExecutor] = None,
+    delete_executor: Optional[ThreadPoolExecutor] = None,
+) -> None:
+    loop = asyncio.get_running_loop()
+    sqs = get_client('sqs')
+    event_source_mapping = get_config().event_source_mapping[event_source_mapping_name]
+
+    queue_arn = get_queue_arn(event_source_mapping.queue)
+    heartbeat_visibility_timeout = await loop.run_in_executor(
+        executor, partial(get_heartbeat_visibility_timeout, event_source_mapping=event_source_mapping)
+    )
+
+    # With batch_size above 10, receive_message_batch fans out its requests on its own threads, but still holds the
+    # executor thread until the whole batch is received
+    receive = partial(
+        receive_messages,
+        partial(
+            receive_message_batch,
+            queue_name=event_source_mapping.queue,
+            batch_size=event_source_mapping.batch_size,
+            maximum_batching_window=event_source_mapping.maximum_batching_window,
+        ),
+        event_source_mapping_name=event_source_mapping_name,
+    )
+
+    logger.debug('Polling %r event source mapping...', event_source_mapping_name)
+    deletes: Set['asyncio.Future[None]'] = set()
+    while not stop_event.is_set():
+        try:
+            messages = await loop.run_in_executor(executor, receive)
+        except RuntimeWarning:
+            if not follow:
+                break
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(stop_event.wait(), poll_interval)
+            continue
+        with measure_stage(event_source_mapping_name, 'convert'):
+            event = convert_sqs_messages_to_event(
+                aws_region=sqs.meta.region_name,
+                event_source=f'{sqs.meta.partition}:sqs',
+                event_source_arn=queue_arn,
+                messages=messages,
+            )
+        stop_heartbeat = start_visibility_heartbeat(
+            event_source_mapping=event_source_mapping,
+            messages=messages,
+            visibility_timeout=heartbeat_visibility_timeout,
+        )
+        profile_filename = get_profile_filename(
+            lambda_name=event_source_mapping.function_name, event_source_mapping_name=event_source_mapping_name
+        )
+        try:
+            with measure_stage(event_source_mapping_name, 'lambda'):
+                if processes > 0:
+                    result = await asyncio.wrap_future(
+                        submit_lambda(
+                            lambda_name=event_source_mapping.function_name,
+                            event=event,
+                            processes=processes,
+                            profile_filename=profile_filename,
+                        )
+                    )
+                else:
+                    result = await loop.run_in_executor(
+                        lambda_executor or executor,
+                        partial(
+                            run_lambda,
+                            lambda_name=event_source_mapping.function_name,
+                            event=event,
+                            profile_filename=profile_filename,
+                        ),
+                    )
+        except Exception as e:
+            logger.warning('Error on execute lambda (%r), messages will be available again later', e)
+            _count_messages(event_source_mapping_name, 'failed', messages)
+            if not follow:
+                raise
+        else:
+            delete = loop.run_in_executor(
+                delete_executor or executor,
+                partial(
+                    complete_batch,
+                    event_source_mapping_name=event_source_mapping_name,
+                    event_source_mapping=event_source_mapping,
+                    messages=messages,
+                    result=result,
+                ),
+            )
+            deletes.add(delete)
+            delete.add_done_callback(deletes.discard)
+        finally:
+            await loop.run_in_executor(delete_executor or executor, stop_heartbeat)
+        if not follow:
+            break
+    await asyncio.gather(*deletes)
+
+
+async def _run_event_source_mappings_async(
+    *,
+    event_source_mapping_names: Sequence[str],
+    follow: bool,
+    poll_interval: float,
+    processes: int,
+    workers: int,
+) -> None:
+    loop = asyncio.get_running_loop()
+    stop_event = asyncio.Event()
+    with suppress(NotImplementedError):
+        loop.add_signal_handler(signal.SIGINT, stop_event.set)
+
+    # Handlers run one at a time (see lambda_._run_lock), so they get their own thread and can not hold the
+    # threads used by receives of the other event source mappings, and deletes and heartbeat stops get a few threads
+    # of their own so long polling receives can not delay them
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='qldebugger') as executor, ThreadPoolExecutor(
+        max_workers=1, thread_name_prefix='qldebugger-lambda'
+    ) as lambda_executor, ThreadPoolExecutor(max_workers=4, thread_name_prefix='qldebugger-delete') as delete_executor:
+        results = await asyncio.gather(
+            *(
+                poll_messages_and_run_lambda_async(
+                    event_source_mapping_name=event_source_mapping_name,
+                    executor=executor,
+                    stop_event=stop_event,
+                    follow=follow,
+                    poll_interval=poll_interval,
+                    processes=processes,
+                    lambda_executor=lambda_executor,
+                    delete_executor=delete_executor,
+                )
+                for event_source_mapping_name in event_source_mapping_names
+            ),
+            return_exceptions=True,
+        )
+    failed = []
+    for event_source_mapping_name, result in zip(event_source_mapping_names, results):
+        if isinstance(result, Exception):
+            logger.error('Error on execute %r event source mapping: %r', event_source_mapping_name, result)
+            failed.append(event_source_mapping_name)
+    if failed:
+        raise EventSourceMappingsError(failed)
+
+
+def run_event_source_mappings_async(
+    *,
+    event_source_mapping_names: Sequence[str],
+    follow: bool = False,
+    poll_interval: float = 1,
+    processes: int = 0,
+    workers: Optional[int] = None,
+) -> None:
+    if workers is None:
+        workers = min(32, len(event_source_mapping_names) + 4)
+    long_polling = sum(
+        get_config().event_source_mapping[event_source_mapping_name].maximum_batching_window > 0
+        for event_source_mapping_name in event_source_mapping_names
+    )
+    if long_polling >= workers:
+        logger.warning(
+            '%d event source mappings wait for messages with maximum_batching_window while holding one of the %d '
+            'workers, receives of the others may be delayed',
+            long_polling,
+            workers,
+        )
+
+    get_client('sqs')
+    get_account_id()
+
+    asyncio.run(
+        _run_event_source_mappings_async(
+            event_source_mapping_names=event_source_mapping_names,
+            follow=follow,
+            poll_interval=poll_interval,
+            processes=processes,
+            workers=workers,
+        )
     )
-    run_lambda(lambda_name=event_source_mapping.function_name, event=event)
-    delete_messages(queue_name=event_source_mapping.queue, messages=messages)
 
 
 def convert_sqs_messages_to_event(
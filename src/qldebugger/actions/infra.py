@@ -1,25 +1,118 @@
+import hmac
 import json
 import logging
-from typing import TYPE_CHECKING, Dict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from hashlib import sha256
+from secrets import token_bytes
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Mapping, Optional, Set, Tuple, TypeVar, Union
 
 from botocore.exceptions import ClientError
 from graphlib import TopologicalSorter
 
-from qldebugger.aws import get_account_id, get_client
+from qldebugger.aws import get_client, get_queue_arn, get_topic_arn
+from qldebugger.cache import load_binary_cache, save_binary_cache
 from qldebugger.config import get_config
-from qldebugger.config.file_parser import ConfigQueue, ConfigSecretString
+from qldebugger.config.file_parser import ConfigQueue, ConfigSecretString, ConfigTopicSubscriber
 
 if TYPE_CHECKING:
+    from mypy_boto3_secretsmanager import SecretsManagerClient
+    from mypy_boto3_secretsmanager.type_defs import TagTypeDef
+    from mypy_boto3_sns import SNSClient
+    from mypy_boto3_sqs import SQSClient
     from mypy_boto3_sqs.literals import QueueAttributeNameType
 
 logger = logging.getLogger(__name__)
 
+HASH_TAG_KEY = 'qldebugger:hash'
+HMAC_KEY_CACHE_NAME = 'secret-hash-key'
+HMAC_KEY_SIZE = 32
+# SQS only paginates the queues when MaxResults is set, otherwise it returns up to 1000 queues
+LIST_QUEUES_PAGE_SIZE = 1000
 
-def create_secrets() -> None:
+T = TypeVar('T')
+
+
+def _run_concurrently(func: Callable[[T], None], items: Iterable[T], /, *, workers: int) -> None:
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='qldebugger') as executor:
+        for _ in executor.map(func, items):
+            pass
+
+
+def _list_secrets_hashes(secretsmanager: 'SecretsManagerClient', /) -> Dict[str, Optional[str]]:
+    return {
+        secret['Name']: next((tag['Value'] for tag in secret.get('Tags', []) if tag['Key'] == HASH_TAG_KEY), None)
+        for page in secretsmanager.get_paginator('list_secrets').paginate()
+        for secret in page['SecretList']
+    }
+
+
+def _list_topics_names(sns: 'SNSClient', /) -> Set[str]:
+    return {
+        topic['TopicArn'].rsplit(':', maxsplit=1)[-1]
+        for page in sns.get_paginator('list_topics').paginate()
+        for topic in page['Topics']
+    }
+
+
+def _list_queues_urls(sqs: 'SQSClient', /) -> Dict[str, str]:
+    return {
+        queue_url.rstrip('/').rsplit('/', maxsplit=1)[-1]: queue_url
+        for page in sqs.get_paginator('list_queues').paginate(PaginationConfig={'PageSize': LIST_QUEUES_PAGE_SIZE})
+        for queue_url in page.get('QueueUrls', [])
+    }
+
+
+def _get_secret_hash_key() -> bytes:
+    # The hash tag is visible to anyone allowed to list the secrets, so it is keyed by a local secret
+    key = load_binary_cache(HMAC_KEY_CACHE_NAME)
+    if key is None or len(key) != HMAC_KEY_SIZE:
+        key = token_bytes(HMAC_KEY_SIZE)
+        save_binary_cache(HMAC_KEY_CACHE_NAME, key)
+    return key
+
+
+def _get_secret_hash(key: bytes, value: Union[str, bytes], /) -> str:
+    if isinstance(value, str):
+        return hmac.new(key, b'string:' + value.encode(), sha256).hexdigest()
+    return hmac.new(key, b'binary:' + value, sha256).hexdigest()
+
+
+def _normalize_redrive_policy(redrive_policy: Optional[str]) -> Optional[Tuple[str, int]]:
+    if not redrive_policy:
+        return None
+    data = json.loads(redrive_policy)
+    return data.get('deadLetterTargetArn'), int(data.get('maxReceiveCount', 0))
+
+
+def create_secrets(*, workers: int = 4, reconcile: bool = False) -> None:
     secretsmanager = get_client('secretsmanager')
     secrets = get_config().secrets
+    existing_secrets = _list_secrets_hashes(secretsmanager) if reconcile else None
+    secret_hash_key = _get_secret_hash_key() if reconcile else b''
 
-    for name, value in secrets.items():
+    def create_secret(name: str) -> None:
+        value = secrets[name]
+        if existing_secrets is not None:
+            secret_hash = _get_secret_hash(secret_hash_key, value.get_value())
+            if name not in existing_secrets:
+                logger.info('Creating %r secret...', name)
+                tags: List['TagTypeDef'] = [{'Key': HASH_TAG_KEY, 'Value': secret_hash}]
+                if isinstance(value, ConfigSecretString):
+                    secretsmanager.create_secret(Name=name, SecretString=value.get_value(), Tags=tags)
+                else:
+                    secretsmanager.create_secret(Name=name, SecretBinary=value.get_value(), Tags=tags)
+                return
+            if existing_secrets[name] == secret_hash:
+                logger.debug('Skipping unchanged %r secret', name)
+                return
+            logger.info('Updating %r secret...', name)
+            if isinstance(value, ConfigSecretString):
+                secretsmanager.put_secret_value(SecretId=name, SecretString=value.get_value())
+            else:
+                secretsmanager.put_secret_value(SecretId=name, SecretBinary=value.get_value())
+            secretsmanager.tag_resource(SecretId=name, Tags=[{'Key': HASH_TAG_KEY, 'Value': secret_hash}])
+            return
         try:
             secretsmanager.describe_secret(SecretId=name)
             if isinstance(value, ConfigSecretString):
@@ -36,70 +129,192 @@ def create_secrets() -> None:
                 logger.info('Creating %r binary secret...', name)
                 secretsmanager.create_secret(Name=name, SecretBinary=value.get_value())
 
+    _run_concurrently(create_secret, secrets, workers=workers)
+
 
-def create_topics() -> None:
+def create_topics(*, workers: int = 4, reconcile: bool = False) -> None:
     sns = get_client('sns')
     topics = get_config().topics
+    existing_topics = _list_topics_names(sns) if reconcile else set()
 
-    for topic_name in topics:
+    def create_topic(topic_name: str) -> None:
+        if topic_name in existing_topics:
+            logger.debug('Skipping existing %r topic', topic_name)
+            return
         logger.info('Creating %r topic...', topic_name)
         sns.create_topic(Name=topic_name)
 
+    _run_concurrently(create_topic, topics, workers=workers)
+
+
+def _reconcile_queue(
+    queue_name: str,
+    /,
+    *,
+    sqs: 'SQSClient',
+    queues: Mapping[str, ConfigQueue],
+    existing_queues: Mapping[str, str],
+) -> None:
+    attributes: Dict['QueueAttributeNameType', str] = {}
+    if redrive_policy := queues.get(queue_name, ConfigQueue()).redrive_policy:
+        attributes['RedrivePolicy'] = json.dumps(
+            {
+                'deadLetterTargetArn': get_queue_arn(redrive_policy.dead_letter_queue),
+                'maxReceiveCount': redrive_policy.max_receive_count,
+            }
+        )
+    if queue_name not in existing_queues:
+        logger.info('Creating %r queue...', queue_name)
+        sqs.create_queue(QueueName=queue_name, Attributes=attributes)
+        return
+    current_attributes = sqs.get_queue_attributes(
+        QueueUrl=existing_queues[queue_name], AttributeNames=['RedrivePolicy']
+    ).get('Attributes', {})
+    if _normalize_redrive_policy(current_attributes.get('RedrivePolicy')) == _normalize_redrive_policy(
+        attributes.get('RedrivePolicy')
+    ):
+        logger.debug('Skipping unchanged %r queue', queue_name)
+        return
+    logger.info('Updating %r queue...', queue_name)
+    # An empty RedrivePolicy removes the policy that is no longer in the config
+    sqs.set_queue_attributes(
+        QueueUrl=existing_queues[queue_name], Attributes={'RedrivePolicy': attributes.get('RedrivePolicy', '')}
+    )
+
+
+def _create_queue(queue_name: str, /, *, sqs: 'SQSClient', queues: Mapping[str, ConfigQueue]) -> None:
+    attributes: Dict['QueueAttributeNameType', str] = {}
+    if redrive_policy := queues.get(queue_name, ConfigQueue()).redrive_policy:
+        logger.debug('Checking dead letter queue (%r) for %r...', redrive_policy.dead_letter_queue, queue_name)
+        dead_letter_queue_attributes = sqs.get_queue_attributes(
+            QueueUrl=redrive_policy.dead_letter_queue, AttributeNames=['QueueArn']
+        )
+        attributes['RedrivePolicy'] = json.dumps(
+            {
+                'deadLetterTargetArn': dead_letter_queue_attributes['Attributes']['QueueArn'],
+                'maxReceiveCount': redrive_policy.max_receive_count,
+            }
+        )
+    try:
+        queue_url = sqs.get_queue_url(QueueName=queue_name)
+        logger.info('Updating %r queue...', queue_name)
+        sqs.set_queue_attributes(QueueUrl=queue_url['QueueUrl'], Attributes=attributes)
+    except ClientError:
+        logger.info('Creating %r queue...', queue_name)
+        sqs.create_queue(QueueName=queue_name, Attributes=attributes)
+
 
-def create_queues() -> None:
+def create_queues(*, workers: int = 4, reconcile: bool = False) -> None:
     sqs = get_client('sqs')
     queues = get_config().queues
-    order = TopologicalSorter(
+    create_queue = (
+        partial(_reconcile_queue, sqs=sqs, queues=queues, existing_queues=_list_queues_urls(sqs))
+        if reconcile
+        else partial(_create_queue, sqs=sqs, queues=queues)
+    )
+    sorter = TopologicalSorter(
         {
             name: {queue.redrive_policy.dead_letter_queue} if queue.redrive_policy else set()
             for name, queue in queues.items()
         }
-    ).static_order()
-
-    for queue_name in order:
-        attributes: Dict['QueueAttributeNameType', str] = {}
-        if redrive_policy := queues.get(queue_name, ConfigQueue()).redrive_policy:
-            logger.debug('Checking dead letter queue (%r) for %r...', redrive_policy.dead_letter_queue, queue_name)
-            dead_letter_queue_attributes = sqs.get_queue_attributes(
-                QueueUrl=redrive_policy.dead_letter_queue, AttributeNames=['QueueArn']
-            )
-            attributes['RedrivePolicy'] = json.dumps(
-                {
-                    'deadLetterTargetArn': dead_letter_queue_attributes['Attributes']['QueueArn'],
-                    'maxReceiveCount': redrive_policy.max_receive_count,
-                }
+    )
+
+    sorter.prepare()
+    while sorter.is_active():
+        level = sorter.get_ready()
+        _run_concurrently(create_queue, level, workers=workers)
+        sorter.done(*level)
+
+
+def _list_subscriptions(sns: 'SNSClient', /) -> Dict[Tuple[str, str], List[str]]:
+    subscriptions: Dict[Tuple[str, str], List[str]] = {}
+    for page in sns.get_paginator('list_subscriptions').paginate():
+        for subscription in page['Subscriptions']:
+            if subscription['SubscriptionArn'] == 'PendingConfirmation':
+                continue
+            subscriptions.setdefault((subscription['TopicArn'], subscription['Endpoint']), []).append(
+                subscription['SubscriptionArn']
             )
-        try:
-            queue_url = sqs.get_queue_url(QueueName=queue_name)
-            logger.info('Updating %r queue...', queue_name)
-            sqs.set_queue_attributes(QueueUrl=queue_url['QueueUrl'], Attributes=attributes)
-        except ClientError:
-            logger.info('Creating %r queue...', queue_name)
-            sqs.create_queue(QueueName=queue_name, Attributes=attributes)
+    return subscriptions
+
+
+def _get_subscription_attributes(subscriber: ConfigTopicSubscriber) -> Dict[str, str]:
+    attributes = {
+        'RawMessageDelivery': 'true' if subscriber.raw_message_delivery else 'false',
+    }
+    if subscriber.filter_policy is not None:
+        attributes['FilterPolicy'] = subscriber.filter_policy
+    return attributes
 
 
-def subscribe_topics() -> None:
+def _is_same_filter_policy(a: Optional[str], b: Optional[str]) -> bool:
+    try:
+        return bool(json.loads(a or '{}') == json.loads(b or '{}'))
+    except ValueError:
+        return a == b
+
+
+def _update_subscription(subscription_arn: str, /, *, sns: 'SNSClient', attributes: Mapping[str, str]) -> None:
+    current_attributes = sns.get_subscription_attributes(SubscriptionArn=subscription_arn)['Attributes']
+    if current_attributes.get('RawMessageDelivery', 'false') != attributes['RawMessageDelivery']:
+        logger.info('Updating raw message delivery of %r subscription...', subscription_arn)
+        sns.set_subscription_attributes(
+            SubscriptionArn=subscription_arn,
+            AttributeName='RawMessageDelivery',
+            AttributeValue=attributes['RawMessageDelivery'],
+        )
+    if not _is_same_filter_policy(current_attributes.get('FilterPolicy'), attributes.get('FilterPolicy')):
+        logger.info('Updating filter policy of %r subscription...', subscription_arn)
+        sns.set_subscription_attributes(
+            SubscriptionArn=subscription_arn,
+            AttributeName='FilterPolicy',
+            AttributeValue=attributes.get('FilterPolicy', '{}'),
+        )
+
+
+def subscribe_topics(*, workers: int = 4) -> None:
     sns = get_client('sns')
     topics = get_config().topics
-    account_id = get_account_id()
-    region = sns.meta.region_name
-
-    subscriptions = sns.list_subscriptions()['Subscriptions']
-    for subscription in subscriptions:
-        logger.info('Unsubscribing %r queue (%r)...', subscription['Endpoint'], subscription['SubscriptionArn'])
-        sns.unsubscribe(SubscriptionArn=subscription['SubscriptionArn'])
-
-    for topic_name, config_topic in topics.items():
-        for subscriber in config_topic.subscribers:
-            logger.info('Subscribing %r topic to %r queue...', topic_name, subscriber.queue)
-            attributes = {
-                'RawMessageDelivery': 'true' if subscriber.raw_message_delivery else 'false',
-            }
-            if subscriber.filter_policy is not None:
-                attributes['FilterPolicy'] = subscriber.filter_policy
-            sns.subscribe(
-                TopicArn=f'arn:aws:sns:{region}:{account_id}:{topic_name}',
-                Protocol='sqs',
-                Endpoint=f'arn:aws:sqs:{region}:{account_id}:{subscriber.queue}',
-                Attributes=attributes,
-            )
+
+    subscribers = {
+        (get_topic_arn(topic_name), get_queue_arn(subscriber.queue)): subscriber
+        for topic_name, config_topic in topics.items()
+        for subscriber in config_topic.subscribers
+    }
+    subscriptions = _list_subscriptions(sns)
+
+    def subscribe(key: Tuple[str, str]) -> None:
+        topic_arn, queue_arn = key
+        attributes = _get_subscription_attributes(subscribers[key])
+        if key in subscriptions:
+            _update_subscription(subscriptions[key][0], sns=sns, attributes=attributes)
+            return
+        logger.info('Subscribing %r topic to %r queue...', topic_arn, queue_arn)
+        sns.subscribe(TopicArn=topic_arn, Protocol='sqs', Endpoint=queue_arn, Attributes=attributes)
+
+    def unsubscribe(subscription_arn: str) -> None:
+        logger.info('Unsubscribing %r subscription...', subscription_arn)
+        sns.unsubscribe(SubscriptionArn=subscription_arn)
+
+    _run_concurrently(subscribe, subscribers, workers=workers)
+    _run_concurrently(
+        unsubscribe,
+        [
+            subscription_arn
+            for key, subscriptions_arns in subscriptions.items()
+            for subscription_arn in (subscriptions_arns[1:] if key in subscribers else subscriptions_arns)
+        ],
+        workers=workers,
+    )
+
+
+def create_all(*, workers: int = 4, reconcile: bool = False) -> None:
+    with ThreadPoolExecutor(max_workers=3, thread_name_prefix='qldebugger') as executor:
+        futures = [
+            executor.submit(create_secrets, workers=workers, reconcile=reconcile),
+            executor.submit(create_topics, workers=workers, reconcile=reconcile),
+            executor.submit(create_queues, workers=workers, reconcile=reconcile),
+        ]
+        for future in futures:
+            future.result()
+    subscribe_topics(workers=workers)
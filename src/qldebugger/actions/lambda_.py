@@ -1,17 +1,74 @@
+import cProfile
+import glob
 import logging
-from importlib import import_module
+import multiprocessing
+import pstats
+import signal
+import sys
+import threading
+import tracemalloc
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from importlib import import_module, reload
+from pathlib import Path
+from threading import Event, Lock, RLock, Thread
 from traceback import format_exc
-from typing import TYPE_CHECKING, Any, Callable
+from types import FunctionType, ModuleType
+from typing import (
+    TYPE_CHECKING,
+    AbstractSet,
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    TextIO,
+    Tuple,
+)
 from unittest.mock import patch
 
-from qldebugger.aws import inject_aws_config_in_client
-from qldebugger.config import get_config
+from qldebugger.aws import InjectedSession, inject_aws_config_in_client, inject_aws_config_in_resource
+from qldebugger.config import get_config, set_config
 
 if TYPE_CHECKING:
     from aws_lambda_typing.events import SQSEvent
 
+    from qldebugger.config.file_parser import Config
+
 logger = logging.getLogger(__name__)
 
+MEMORY_TOP_ALLOCATIONS = 10
+MEMORY_SAMPLE_INTERVAL = 0.005
+
+# boto3.client and os.environ patches are process wide, so handlers can not run concurrently in threads
+_run_lock = RLock()
+
+_pools: Dict[str, ProcessPoolExecutor] = {}
+_pools_lock = Lock()
+
+_watch_modules = False
+_modules_mtime: Dict[str, float] = {}
+
+_profile_dirs: Dict[str, Path] = {}
+_profile_invocations: Dict[str, int] = {}
+_profile_lock = Lock()
+
+
+def _patch_boto3() -> ContextManager[Dict[str, Any]]:
+    # Handlers usually create their clients when imported, so imports need the patches as well as invocations
+    return patch.multiple(
+        'boto3',
+        client=inject_aws_config_in_client,
+        resource=inject_aws_config_in_resource,
+        Session=InjectedSession,
+    )
+
 
 def get_lambda_function(*, lambda_name: str) -> Callable[['SQSEvent', None], Any]:
     module_name, function_name = get_config().lambdas[lambda_name].handler
@@ -20,16 +77,303 @@ def get_lambda_function(*, lambda_name: str) -> Callable[['SQSEvent', None], Any
     return lambda_handler
 
 
-def run_lambda(*, lambda_name: str, event: 'SQSEvent') -> Any:
-    environment = get_config().lambdas[lambda_name].environment
-    with patch('boto3.client', inject_aws_config_in_client):
+def _get_project_module_file(module_name: str, root: Path) -> Optional[Path]:
+    if module_name.partition('.')[0] == __name__.partition('.')[0]:
+        return None
+    filename = getattr(sys.modules.get(module_name), '__file__', None)
+    if filename is None:
+        return None
+    path = Path(filename).resolve()
+    if 'site-packages' in path.parts or not path.is_relative_to(root):
+        return None
+    return path
+
+
+def _get_module_dependencies(module_name: str, module_names: AbstractSet[str]) -> Set[str]:
+    dependencies = set()
+    for value in list(vars(sys.modules[module_name]).values()):
+        if isinstance(value, ModuleType):
+            dependency = value.__name__
+        elif isinstance(value, (type, FunctionType)):
+            dependency = value.__module__
+        else:
+            continue
+        if dependency in module_names and dependency != module_name:
+            dependencies.add(dependency)
+    return dependencies
+
+
+def _sort_by_dependencies(module_names: AbstractSet[str], dependencies: Dict[str, Set[str]]) -> List[str]:
+    ordered: List[str] = []
+    visited: Set[str] = set()
+
+    def visit(module_name: str) -> None:
+        if module_name in visited:
+            return
+        visited.add(module_name)
+        for dependency in sorted(dependencies[module_name] & module_names):
+            visit(dependency)
+        ordered.append(module_name)
+
+    for module_name in sorted(module_names):
+        visit(module_name)
+    return ordered
+
+
+def reload_changed_modules(*, root: Optional[Path] = None) -> List[str]:
+    root = (root or Path.cwd()).resolve()
+    paths = {
+        module_name: path
+        for module_name in list(sys.modules)
+        if (path := _get_project_module_file(module_name, root)) is not None
+    }
+    stale = set()
+    for module_name, path in paths.items():
+        try:
+            mtime = path.stat().st_mtime
+        except OSError:
+            continue
+        if _modules_mtime.setdefault(module_name, mtime) != mtime:
+            _modules_mtime[module_name] = mtime
+            stale.add(module_name)
+    if not stale:
+        return []
+
+    # Modules that imported names from a changed module keep the old objects until they are reloaded too
+    dependencies = {module_name: _get_module_dependencies(module_name, paths.keys()) for module_name in paths}
+    pending = list(stale)
+    while pending:
+        changed = pending.pop()
+        for module_name, module_dependencies in dependencies.items():
+            if changed in module_dependencies and module_name not in stale:
+                stale.add(module_name)
+                pending.append(module_name)
+
+    reloaded = _sort_by_dependencies(stale, dependencies)
+    for module_name in reloaded:
+        logger.info('Reloading %r module...', module_name)
+        reload(sys.modules[module_name])
+    return reloaded
+
+
+def watch_lambda_modules(*, lambda_names: Iterable[str]) -> None:
+    global _watch_modules  # noqa: PLW0603
+    with _run_lock, _patch_boto3():
+        for lambda_name in lambda_names:
+            get_lambda_function(lambda_name=lambda_name)
+        reload_changed_modules()
+        _watch_modules = True
+
+
+def profile_lambdas(*, lambda_names: Iterable[str], profile_dir: Optional[Path] = None) -> None:
+    with _profile_lock:
+        for lambda_name in lambda_names:
+            lambda_profile_dir = profile_dir or get_config().lambdas[lambda_name].profile_dir
+            if lambda_profile_dir is None:
+                continue
+            lambda_profile_dir.mkdir(parents=True, exist_ok=True)
+            _profile_dirs[lambda_name] = lambda_profile_dir
+
+
+def _iter_profile_invocations(profile_dir: Path, event_source_mapping_name: str) -> Iterator[Tuple[Path, int]]:
+    prefix = f'{event_source_mapping_name}-'
+    for filename in profile_dir.glob(f'{glob.escape(prefix)}*.pstats'):
+        if (invocation := filename.stem[len(prefix) :]).isdigit():
+            yield filename, int(invocation)
+
+
+def _get_last_profile_invocation(profile_dir: Path, event_source_mapping_name: str) -> int:
+    return max(
+        (invocation for _, invocation in _iter_profile_invocations(profile_dir, event_source_mapping_name)), default=0
+    )
+
+
+def get_profile_filename(*, lambda_name: str, event_source_mapping_name: str) -> Optional[Path]:
+    with _profile_lock:
+        if (profile_dir := _profile_dirs.get(lambda_name)) is None:
+            return None
+        if event_source_mapping_name not in _profile_invocations:
+            _profile_invocations[event_source_mapping_name] = _get_last_profile_invocation(
+                profile_dir, event_source_mapping_name
+            )
+        _profile_invocations[event_source_mapping_name] += 1
+        invocation = _profile_invocations[event_source_mapping_name]
+    return profile_dir / f'{event_source_mapping_name}-{invocation:06d}.pstats'
+
+
+def _call_lambda_handler(
+    lambda_handler: Callable[['SQSEvent', None], Any], event: 'SQSEvent', /, *, profile_filename: Optional[Path]
+) -> Any:
+    if profile_filename is None:
+        return lambda_handler(event, None)
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(lambda_handler, event, None)
+    finally:
+        profiler.dump_stats(profile_filename)
+        logger.info('Profile saved to %r', str(profile_filename))
+
+
+def _filter_memory_snapshot(snapshot: tracemalloc.Snapshot, /) -> tracemalloc.Snapshot:
+    return snapshot.filter_traces(
+        [
+            tracemalloc.Filter(inclusive=False, filename_pattern=tracemalloc.__file__),
+            tracemalloc.Filter(inclusive=False, filename_pattern=threading.__file__),
+            tracemalloc.Filter(inclusive=False, filename_pattern=str(Path(__file__).parent / '*')),
+        ]
+    )
+
+
+def _sample_memory_peak(stop_event: Event, snapshots: List[tracemalloc.Snapshot], /, *, threshold: int) -> None:
+    # Handler allocations are usually freed when it returns, so the snapshot must be taken while they are alive
+    while not stop_event.wait(MEMORY_SAMPLE_INTERVAL):
+        current = tracemalloc.get_traced_memory()[0]
+        if current > threshold:
+            snapshots[:] = [tracemalloc.take_snapshot()]
+            threshold = current + current // 10
+
+
+def _call_with_memory_limit(func: Callable[[], Any], /, *, lambda_name: str, memory_size: int, enforce: bool) -> Any:
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    start_snapshot = tracemalloc.take_snapshot()
+    baseline = tracemalloc.get_traced_memory()[0]
+    peak_snapshots: List[tracemalloc.Snapshot] = []
+    stop_event = Event()
+    sampler = Thread(
+        target=_sample_memory_peak,
+        args=(stop_event, peak_snapshots),
+        kwargs={'threshold': baseline + memory_size * 1024 * 1024},
+        name='qldebugger-memory',
+        daemon=True,
+    )
+    sampler.start()
+    try:
+        try:
+            result = func()
+        finally:
+            stop_event.set()
+            sampler.join()
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+        exceeded = peak > memory_size * 1024 * 1024
+        top_stats = (
+            _filter_memory_snapshot(peak_snapshots[0] if peak_snapshots else tracemalloc.take_snapshot()).compare_to(
+                _filter_memory_snapshot(start_snapshot), 'lineno'
+            )[:MEMORY_TOP_ALLOCATIONS]
+            if exceeded
+            else []
+        )
+    finally:
+        if started:
+            tracemalloc.stop()
+    logger.info('Peak memory of %r lambda: %.1f MB of %d MB', lambda_name, peak / 1024 / 1024, memory_size)
+    if exceeded:
+        logger.warning(
+            'Lambda %r exceeded its memory size, top allocations near the peak:\n%s',
+            lambda_name,
+            '\n'.join(map(str, top_stats)),
+        )
+        if enforce:
+            raise MemoryError(f'Lambda {lambda_name!r} used {peak / 1024 / 1024:.1f} MB of {memory_size} MB')
+    return result
+
+
+def aggregate_profiles(
+    *,
+    profile_dir: Path,
+    output: TextIO,
+    event_source_mapping_names: Sequence[str] = (),
+    sort: str = 'cumulative',
+    limit: Optional[int] = 30,
+    dump: Optional[Path] = None,
+) -> int:
+    filenames = sorted(
+        {
+            filename
+            for event_source_mapping_name in event_source_mapping_names
+            for filename, _ in _iter_profile_invocations(profile_dir, event_source_mapping_name)
+        }
+        if event_source_mapping_names
+        else profile_dir.glob('*.pstats')
+    )
+    if not filenames:
+        raise RuntimeWarning(f'No profiles found in {str(profile_dir)!r}')
+    stats = pstats.Stats(*map(str, filenames), stream=output)
+    if dump is not None:
+        stats.dump_stats(dump)
+    stats.sort_stats(sort).print_stats(*([] if limit is None else [limit]))
+    return len(filenames)
+
+
+def run_lambda(*, lambda_name: str, event: 'SQSEvent', profile_filename: Optional[Path] = None) -> Any:
+    lambda_config = get_config().lambdas[lambda_name]
+    with _run_lock, _patch_boto3():
+        if _watch_modules:
+            reload_changed_modules()
         lambda_handler = get_lambda_function(lambda_name=lambda_name)
         logger.info('Running %r lambda...', lambda_name)
         try:
-            with patch.dict('os.environ', environment, True):
-                result = lambda_handler(event, None)
+            with patch.dict('os.environ', lambda_config.environment, True):
+                call = partial(_call_lambda_handler, lambda_handler, event, profile_filename=profile_filename)
+                result = (
+                    call()
+                    if lambda_config.memory_size is None
+                    else _call_with_memory_limit(
+                        call,
+                        lambda_name=lambda_name,
+                        memory_size=lambda_config.memory_size,
+                        enforce=lambda_config.enforce_memory_size,
+                    )
+                )
         except Exception:
             logger.exception('Error on execute lambda:\n%s', format_exc())
             raise
         logger.info('Result: %r', result)
         return result
+
+
+def _init_lambda_worker(config: 'Config', lambda_name: str, watch: bool) -> None:
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    set_config(config)
+    if watch:
+        watch_lambda_modules(lambda_names=[lambda_name])
+        return
+    with _run_lock, _patch_boto3():
+        get_lambda_function(lambda_name=lambda_name)
+
+
+def _create_lambda_pool(*, lambda_name: str, processes: int) -> ProcessPoolExecutor:
+    logger.info('Starting %d workers for %r lambda...', processes, lambda_name)
+    # Pools start lazily while other threads (heartbeats, metrics, other event source mappings) may hold locks,
+    # which a forked worker would inherit locked forever
+    return ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_lambda_worker,
+        initargs=(get_config(), lambda_name, _watch_modules),
+    )
+
+
+def submit_lambda(
+    *, lambda_name: str, event: 'SQSEvent', processes: int, profile_filename: Optional[Path] = None
+) -> 'Future[Any]':
+    with _pools_lock:
+        if (pool := _pools.get(lambda_name)) is None:
+            pool = _pools[lambda_name] = _create_lambda_pool(lambda_name=lambda_name, processes=processes)
+        try:
+            return pool.submit(run_lambda, lambda_name=lambda_name, event=event, profile_filename=profile_filename)
+        except BrokenProcessPool:
+            logger.warning('Workers of %r lambda crashed, restarting...', lambda_name)
+            pool.shutdown(wait=False)
+            pool = _pools[lambda_name] = _create_lambda_pool(lambda_name=lambda_name, processes=processes)
+            return pool.submit(run_lambda, lambda_name=lambda_name, event=event, profile_filename=profile_filename)
+
+
+def shutdown_lambda_pools() -> None:
+    with _pools_lock:
+        for lambda_name, pool in _pools.items():
+            logger.debug('Stopping workers of %r lambda...', lambda_name)
+            pool.shutdown()
+        _pools.clear()
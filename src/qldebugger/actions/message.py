@@ -1,15 +1,99 @@
+import json
 import logging
-from typing import TYPE_CHECKING, Mapping
+from base64 import b64encode
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from functools import partial
+from math import ceil
+from threading import Lock
+from time import monotonic, sleep
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Set,
+    TextIO,
+)
 
-from qldebugger.aws import get_account_id, get_client
+from qldebugger.aws import forget_queue_url_on_error, get_client, get_queue_url, get_topic_arn
 
 if TYPE_CHECKING:
-    from mypy_boto3_sns.type_defs import MessageAttributeValueTypeDef
-    from mypy_boto3_sqs.type_defs import ReceiveMessageResultTypeDef
+    from mypy_boto3_sns.type_defs import MessageAttributeValueTypeDef, PublishBatchRequestEntryTypeDef
+    from mypy_boto3_sqs.type_defs import (
+        MessageTypeDef,
+        ReceiveMessageResultTypeDef,
+        SendMessageBatchRequestEntryTypeDef,
+    )
 
 
 logger = logging.getLogger(__name__)
 
+MAX_BATCH_ENTRIES = 10
+MAX_BATCH_PAYLOAD_SIZE = 256 * 1024
+MAX_BATCH_ATTEMPTS = 5
+MAX_RECEIVE_WAIT_SECONDS = 20
+MAX_RECEIVE_BATCH_SIZE = 10_000
+MAX_RECEIVE_PAYLOAD_SIZE = 6 * 1024 * 1024
+MAX_CONCURRENT_REQUESTS = 10
+
+
+class MessageEntry(NamedTuple):
+    body: str
+    attributes: Mapping[str, Any]
+
+
+def read_message_entries(fp: TextIO, /, *, jsonl: bool = False) -> Iterator[MessageEntry]:
+    for line in fp:
+        content = line.rstrip('\r\n')
+        if not content:
+            continue
+        if jsonl:
+            data = json.loads(content)
+            yield MessageEntry(body=data['body'], attributes=data.get('attributes', {}))
+        else:
+            yield MessageEntry(body=content, attributes={})
+
+
+def batch_message_entries(entries: Iterable[MessageEntry], /) -> Iterator[List[MessageEntry]]:
+    batch: List[MessageEntry] = []
+    batch_size = 0
+    for entry in entries:
+        entry_size = len(entry.body.encode()) + len(json.dumps(entry.attributes).encode())
+        if batch and (len(batch) >= MAX_BATCH_ENTRIES or batch_size + entry_size > MAX_BATCH_PAYLOAD_SIZE):
+            yield batch
+            batch = []
+            batch_size = 0
+        batch.append(entry)
+        batch_size += entry_size
+    if batch:
+        yield batch
+
+
+def run_batches_concurrently(
+    func: Callable[[List[MessageEntry]], int],
+    batches: Iterable[List[MessageEntry]],
+    /,
+    *,
+    workers: int,
+) -> int:
+    total = 0
+    in_flight: Set['Future[int]'] = set()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='qldebugger') as executor:
+        for batch in batches:
+            if len(in_flight) >= workers * 2:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                total += sum(future.result() for future in done)
+            in_flight.add(executor.submit(func, batch))
+        total += sum(future.result() for future in wait(in_flight).done)
+    return total
+
 
 def publish_message(
     *,
@@ -18,7 +102,7 @@ def publish_message(
     attributes: Mapping[str, 'MessageAttributeValueTypeDef'] = {},
 ) -> None:
     sns = get_client('sns')
-    arn = f'arn:aws:sns:{sns.meta.region_name}:{get_account_id()}:{topic_name}'
+    arn = get_topic_arn(topic_name)
     logger.info('Sending message to %r topic...', topic_name)
     sns.publish(
         TopicArn=arn,
@@ -27,11 +111,93 @@ def publish_message(
     )
 
 
+def _publish_message_batch(topic_arn: str, topic_name: str, batch: List[MessageEntry]) -> int:
+    sns = get_client('sns')
+
+    def send(pending: Dict[int, MessageEntry]) -> Mapping[str, Any]:
+        entries: List['PublishBatchRequestEntryTypeDef'] = []
+        for i, entry in pending.items():
+            request_entry: 'PublishBatchRequestEntryTypeDef' = {'Id': str(i), 'Message': entry.body}
+            if entry.attributes:
+                request_entry['MessageAttributes'] = entry.attributes
+            entries.append(request_entry)
+        return sns.publish_batch(TopicArn=topic_arn, PublishBatchRequestEntries=entries)
+
+    return _send_batch_with_retries(batch, send, target=f'{topic_name!r} topic')
+
+
+def publish_messages(*, topic_name: str, entries: Iterable[MessageEntry], workers: int = 4) -> int:
+    topic_arn = get_topic_arn(topic_name)
+    logger.info('Sending messages to %r topic...', topic_name)
+    sent = run_batches_concurrently(
+        lambda batch: _publish_message_batch(topic_arn, topic_name, batch),
+        batch_message_entries(entries),
+        workers=workers,
+    )
+    logger.info('Sent %d messages to %r topic', sent, topic_name)
+    return sent
+
+
 def send_message(*, queue_name: str, message: str) -> None:
     sqs = get_client('sqs')
-    queue_url = sqs.get_queue_url(QueueName=queue_name)['QueueUrl']
+    queue_url = get_queue_url(queue_name)
     logger.info('Sending message to %r queue...', queue_name)
-    sqs.send_message(QueueUrl=queue_url, MessageBody=message)
+    with forget_queue_url_on_error(queue_name):
+        sqs.send_message(QueueUrl=queue_url, MessageBody=message)
+
+
+def _send_batch_with_retries(
+    batch: List[MessageEntry],
+    send: Callable[[Dict[int, MessageEntry]], Mapping[str, Any]],
+    /,
+    *,
+    target: str,
+) -> int:
+    pending = dict(enumerate(batch))
+    sent = 0
+    for attempt in range(MAX_BATCH_ATTEMPTS):
+        if attempt > 0:
+            sleep(0.1 * 2**attempt)
+        response = send(pending)
+        sent += len(response.get('Successful', []))
+        failed = response.get('Failed', [])
+        for error in failed:
+            if error['SenderFault']:
+                logger.error('Message not sent to %s: %s', target, error.get('Message', error['Code']))
+        pending = {int(error['Id']): pending[int(error['Id'])] for error in failed if not error['SenderFault']}
+        if not pending:
+            break
+    if pending:
+        logger.error('%d messages not sent to %s after %d attempts', len(pending), target, MAX_BATCH_ATTEMPTS)
+    return sent
+
+
+def _send_message_batch(queue_name: str, queue_url: str, batch: List[MessageEntry]) -> int:
+    sqs = get_client('sqs')
+
+    def send(pending: Dict[int, MessageEntry]) -> Mapping[str, Any]:
+        entries: List['SendMessageBatchRequestEntryTypeDef'] = []
+        for i, entry in pending.items():
+            request_entry: 'SendMessageBatchRequestEntryTypeDef' = {'Id': str(i), 'MessageBody': entry.body}
+            if entry.attributes:
+                request_entry['MessageAttributes'] = entry.attributes
+            entries.append(request_entry)
+        with forget_queue_url_on_error(queue_name):
+            return sqs.send_message_batch(QueueUrl=queue_url, Entries=entries)
+
+    return _send_batch_with_retries(batch, send, target=f'{queue_name!r} queue')
+
+
+def send_messages(*, queue_name: str, entries: Iterable[MessageEntry], workers: int = 4) -> int:
+    queue_url = get_queue_url(queue_name)
+    logger.info('Sending messages to %r queue...', queue_name)
+    sent = run_batches_concurrently(
+        lambda batch: _send_message_batch(queue_name, queue_url, batch),
+        batch_message_entries(entries),
+        workers=workers,
+    )
+    logger.info('Sent %d messages to %r queue', sent, queue_name)
+    return sent
 
 
 def receive_message(
@@ -41,13 +207,14 @@ def receive_message(
     maximum_batching_window: int,
 ) -> 'ReceiveMessageResultTypeDef':
     sqs = get_client('sqs')
-    queue_url = sqs.get_queue_url(QueueName=queue_name)['QueueUrl']
+    queue_url = get_queue_url(queue_name)
     logger.debug('Receiving messages from %r queue...', queue_name)
-    messages = sqs.receive_message(
-        QueueUrl=queue_url,
-        MaxNumberOfMessages=batch_size,
-        WaitTimeSeconds=maximum_batching_window,
-    )
+    with forget_queue_url_on_error(queue_name):
+        messages = sqs.receive_message(
+            QueueUrl=queue_url,
+            MaxNumberOfMessages=batch_size,
+            WaitTimeSeconds=maximum_batching_window,
+        )
     if 'Messages' not in messages:
         logger.warning('No messages received from %r queue', queue_name)
         raise RuntimeWarning('No messages received')
@@ -55,13 +222,90 @@ def receive_message(
     return messages
 
 
+def receive_message_batch(
+    *,
+    queue_name: str,
+    batch_size: int,
+    maximum_batching_window: int,
+) -> 'ReceiveMessageResultTypeDef':
+    sqs = get_client('sqs')
+    queue_url = get_queue_url(queue_name)
+    deadline = monotonic() + maximum_batching_window
+    received: List['MessageTypeDef'] = []
+    overflow: List['MessageTypeDef'] = []
+    payload_size = 0
+
+    def receive(max_number_of_messages: int, *, wait_time_seconds: int) -> 'ReceiveMessageResultTypeDef':
+        with forget_queue_url_on_error(queue_name):
+            return sqs.receive_message(
+                QueueUrl=queue_url,
+                MaxNumberOfMessages=max_number_of_messages,
+                WaitTimeSeconds=wait_time_seconds,
+            )
+
+    logger.debug('Receiving batch of messages from %r queue...', queue_name)
+    # Batches that fit in one request do not need threads for concurrent requests
+    with (
+        ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS, thread_name_prefix='qldebugger')
+        if batch_size > MAX_BATCH_ENTRIES
+        else nullcontext()
+    ) as executor:
+        map_requests = map if executor is None else executor.map
+        while True:
+            missing = batch_size - len(received)
+            wait_time_seconds = min(MAX_RECEIVE_WAIT_SECONDS, max(0, ceil(deadline - monotonic())))
+            requests = [min(MAX_BATCH_ENTRIES, missing - i) for i in range(0, missing, MAX_BATCH_ENTRIES)]
+            for response in map_requests(
+                partial(receive, wait_time_seconds=wait_time_seconds), requests[:MAX_CONCURRENT_REQUESTS]
+            ):
+                for message in response.get('Messages', []):
+                    message_size = len(json.dumps(message).encode())
+                    if overflow or payload_size + message_size > MAX_RECEIVE_PAYLOAD_SIZE:
+                        overflow.append(message)
+                        continue
+                    received.append(message)
+                    payload_size += message_size
+            if overflow or len(received) >= batch_size or monotonic() >= deadline:
+                break
+
+    if overflow:
+        logger.info('Batch of %r queue reached the payload limit, releasing %d messages', queue_name, len(overflow))
+        remaining = response.copy()
+        remaining['Messages'] = overflow
+        release_messages(queue_name=queue_name, messages=remaining)
+    if not received:
+        logger.debug('No messages received from %r queue', queue_name)
+        raise RuntimeWarning('No messages received')
+    logger.info('Receved %d messages from %r queue', len(received), queue_name)
+    messages = response.copy()
+    messages['Messages'] = received
+    return messages
+
+
+def _run_in_chunks(func: Callable[[List[Any]], object], entries: List[Any], /) -> None:
+    chunks = [entries[i : i + MAX_BATCH_ENTRIES] for i in range(0, len(entries), MAX_BATCH_ENTRIES)]
+    if len(chunks) <= 1:
+        for chunk in chunks:
+            func(chunk)
+        return
+    workers = min(len(chunks), MAX_CONCURRENT_REQUESTS)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='qldebugger') as executor:
+        for _ in executor.map(func, chunks):
+            pass
+
+
 def delete_messages(*, queue_name: str, messages: 'ReceiveMessageResultTypeDef') -> None:
     sqs = get_client('sqs')
-    queue_url = sqs.get_queue_url(QueueName=queue_name)['QueueUrl']
+    queue_url = get_queue_url(queue_name)
+
+    def delete(entries: List[Any]) -> None:
+        with forget_queue_url_on_error(queue_name):
+            sqs.delete_message_batch(QueueUrl=queue_url, Entries=entries)
+
     logger.debug('Deleting messages of %r queue...', queue_name)
-    sqs.delete_message_batch(
-        QueueUrl=queue_url,
-        Entries=[
+    _run_in_chunks(
+        delete,
+        [
             {
                 'Id': message['MessageId'],
                 'ReceiptHandle': message['ReceiptHandle'],
@@ -72,8 +316,123 @@ def delete_messages(*, queue_name: str, messages: 'ReceiveMessageResultTypeDef')
     logger.info('Deleted %d messages from %r queue', len(messages['Messages']), queue_name)
 
 
+def get_visibility_timeout(*, queue_name: str) -> int:
+    sqs = get_client('sqs')
+    queue_url = get_queue_url(queue_name)
+    with forget_queue_url_on_error(queue_name):
+        attributes = sqs.get_queue_attributes(QueueUrl=queue_url, AttributeNames=['VisibilityTimeout'])
+    return int(attributes['Attributes']['VisibilityTimeout'])
+
+
+def change_messages_visibility(
+    *,
+    queue_name: str,
+    messages: 'ReceiveMessageResultTypeDef',
+    visibility_timeout: int,
+) -> None:
+    sqs = get_client('sqs')
+    queue_url = get_queue_url(queue_name)
+
+    def change_visibility(entries: List[Any]) -> None:
+        with forget_queue_url_on_error(queue_name):
+            sqs.change_message_visibility_batch(QueueUrl=queue_url, Entries=entries)
+
+    logger.debug('Changing visibility of messages of %r queue to %d seconds...', queue_name, visibility_timeout)
+    _run_in_chunks(
+        change_visibility,
+        [
+            {
+                'Id': message['MessageId'],
+                'ReceiptHandle': message['ReceiptHandle'],
+                'VisibilityTimeout': visibility_timeout,
+            }
+            for message in messages['Messages']
+        ],
+    )
+
+
+def release_messages(*, queue_name: str, messages: 'ReceiveMessageResultTypeDef') -> None:
+    change_messages_visibility(queue_name=queue_name, messages=messages, visibility_timeout=0)
+    logger.info('Released %d messages from %r queue', len(messages['Messages']), queue_name)
+
+
+def _dump_json_default(value: Any) -> Any:
+    if isinstance(value, bytes):
+        return b64encode(value).decode()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def drain_messages(
+    *,
+    queue_name: str,
+    output: TextIO,
+    wait_seconds: int = 0,
+    workers: int = 4,
+    empty_receives: int = 2,
+    max_messages: Optional[int] = None,
+) -> int:
+    sqs = get_client('sqs')
+    queue_url = get_queue_url(queue_name)
+    lock = Lock()
+    reserved = 0
+    drained = 0
+
+    def reserve() -> int:
+        nonlocal reserved
+        with lock:
+            size = MAX_BATCH_ENTRIES if max_messages is None else min(MAX_BATCH_ENTRIES, max_messages - reserved)
+            reserved += size
+            return size
+
+    def drain() -> None:
+        nonlocal reserved, drained
+        empty = 0
+        while empty < empty_receives and (size := reserve()) > 0:
+            with forget_queue_url_on_error(queue_name):
+                response = sqs.receive_message(
+                    QueueUrl=queue_url,
+                    MaxNumberOfMessages=size,
+                    WaitTimeSeconds=wait_seconds,
+                    AttributeNames=['All'],
+                    MessageAttributeNames=['All'],
+                )
+            messages = response.get('Messages', [])
+            lines = ''.join(
+                json.dumps(
+                    {k: v for k, v in message.items() if k != 'ReceiptHandle'},
+                    default=_dump_json_default,
+                )
+                + '\n'
+                for message in messages
+            )
+            with lock:
+                reserved -= size - len(messages)
+                drained += len(messages)
+                output.write(lines)
+            if not messages:
+                empty += 1
+                continue
+            empty = 0
+            with forget_queue_url_on_error(queue_name):
+                sqs.delete_message_batch(
+                    QueueUrl=queue_url,
+                    Entries=[
+                        {'Id': str(i), 'ReceiptHandle': message['ReceiptHandle']} for i, message in enumerate(messages)
+                    ],
+                )
+
+    logger.info('Draining messages of %r queue...', queue_name)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='qldebugger') as executor:
+        for future in [executor.submit(drain) for _ in range(workers)]:
+            future.result()
+    output.flush()
+    logger.info('Drained %d messages from %r queue', drained, queue_name)
+    return drained
+
+
 def purge_messages(*, queue_name: str) -> None:
     sqs = get_client('sqs')
-    queue_url = sqs.get_queue_url(QueueName=queue_name)['QueueUrl']
+    queue_url = get_queue_url(queue_name)
     logger.info('Purging messages of %r queue...', queue_name)
-    sqs.purge_queue(QueueUrl=queue_url)
+    with forget_queue_url_on_error(queue_name):
+        sqs.purge_queue(QueueUrl=queue_url)
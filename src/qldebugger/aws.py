@@ -1,10 +1,16 @@
 import logging
+import os
+from contextlib import contextmanager
 from functools import lru_cache
-from typing import TYPE_CHECKING, Any, Literal, Optional, Union, overload
+from hashlib import sha256
+from time import time
+from typing import TYPE_CHECKING, Any, Dict, Iterator, Literal, Optional, Tuple, Union, overload
 
 import boto3
 from botocore.config import Config
+from botocore.exceptions import ClientError
 
+from .cache import load_cache, save_cache
 from .config import get_config
 
 if TYPE_CHECKING:
@@ -15,6 +21,14 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
+ACCOUNT_ID_CACHE_NAME = 'account_id'
+ACCOUNT_ID_CACHE_TTL = 24 * 60 * 60
+
+QUEUE_DOES_NOT_EXIST_ERROR_CODES = frozenset({'AWS.SimpleQueueService.NonExistentQueue', 'QueueDoesNotExist'})
+
+_queue_urls: Dict[Tuple[Optional[str], str, str], str] = {}
+_injected_clients: Dict[Tuple[Any, ...], Any] = {}
+
 
 @overload
 def get_client(service_name: Literal['secretsmanager'], /) -> 'SecretsManagerClient': ...
@@ -35,7 +49,7 @@ def get_client(service_name: Literal['sts'], /) -> 'STSClient': ...
 def get_client(service_name, /):  # type: ignore[no-untyped-def]
     aws_config = get_config().aws
     logger.debug('Connecting to %s service...', service_name)
-    session = boto3.Session(
+    session = boto3.session.Session(
         aws_access_key_id=aws_config.access_key_id,
         aws_secret_access_key=aws_config.secret_access_key,
         aws_session_token=aws_config.session_token,
@@ -52,21 +66,85 @@ get_client = lru_cache(maxsize=None)(get_client)  # type: ignore[assignment]
 
 
 def get_account_id() -> str:
+    aws_config = get_config().aws
+    if aws_config.account_id is not None:
+        return aws_config.account_id
+
+    cache_key = sha256(
+        '\0'.join(
+            [
+                aws_config.endpoint_url or '',
+                aws_config.profile or os.environ.get('AWS_PROFILE', ''),
+                aws_config.access_key_id or os.environ.get('AWS_ACCESS_KEY_ID', ''),
+            ]
+        ).encode()
+    ).hexdigest()
+    now = time()
+    cache = {
+        k: v
+        for k, v in load_cache(ACCOUNT_ID_CACHE_NAME).items()
+        if isinstance(v, dict) and isinstance(v.get('expires_at'), (int, float)) and v['expires_at'] > now
+    }
+    if cache_key in cache:
+        return str(cache[cache_key]['account_id'])
+
     sts = get_client('sts')
-    return sts.get_caller_identity()['Account']
+    account_id = sts.get_caller_identity()['Account']
+    cache[cache_key] = {'account_id': account_id, 'expires_at': now + ACCOUNT_ID_CACHE_TTL}
+    save_cache(ACCOUNT_ID_CACHE_NAME, cache)
+    return account_id
 
 
-def inject_aws_config_in_client(
+get_account_id = lru_cache(maxsize=None)(get_account_id)
+
+
+def get_queue_url(queue_name: str, /) -> str:
+    sqs = get_client('sqs')
+    key = (sqs.meta.endpoint_url, sqs.meta.region_name, queue_name)
+    if (queue_url := _queue_urls.get(key)) is None:
+        logger.debug('Resolving %r queue url...', queue_name)
+        queue_url = _queue_urls[key] = sqs.get_queue_url(QueueName=queue_name)['QueueUrl']
+    return queue_url
+
+
+def forget_queue_url(queue_name: str, /) -> None:
+    sqs = get_client('sqs')
+    logger.debug('Forgetting %r queue url...', queue_name)
+    _queue_urls.pop((sqs.meta.endpoint_url, sqs.meta.region_name, queue_name), None)
+
+
+@contextmanager
+def forget_queue_url_on_error(queue_name: str, /) -> Iterator[None]:
+    try:
+        yield
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in QUEUE_DOES_NOT_EXIST_ERROR_CODES:
+            forget_queue_url(queue_name)
+        raise
+
+
+def get_queue_arn(queue_name: str, /) -> str:
+    sqs = get_client('sqs')
+    return f'arn:{sqs.meta.partition}:sqs:{sqs.meta.region_name}:{get_account_id()}:{queue_name}'
+
+
+def get_topic_arn(topic_name: str, /) -> str:
+    sns = get_client('sns')
+    return f'arn:{sns.meta.partition}:sns:{sns.meta.region_name}:{get_account_id()}:{topic_name}'
+
+
+def _inject_aws_config(
+    kind: Literal['client', 'resource'],
     service_name: str,
-    region_name: Optional[str] = None,
-    api_version: Optional[str] = None,
-    use_ssl: Optional[bool] = True,
-    verify: Optional[Union[bool, str]] = None,
-    endpoint_url: Optional[str] = None,
-    aws_access_key_id: Optional[str] = None,
-    aws_secret_access_key: Optional[str] = None,
-    aws_session_token: Optional[str] = None,
-    config: Optional[Config] = None,
+    region_name: Optional[str],
+    api_version: Optional[str],
+    use_ssl: Optional[bool],
+    verify: Optional[Union[bool, str]],
+    endpoint_url: Optional[str],
+    aws_access_key_id: Optional[str],
+    aws_secret_access_key: Optional[str],
+    aws_session_token: Optional[str],
+    config: Optional[Config],
 ) -> Any:
     aws_config = get_config().aws
     if aws_config.access_key_id is not None:
@@ -79,14 +157,33 @@ def inject_aws_config_in_client(
         region_name = aws_config.region
     if aws_config.endpoint_url is not None:
         endpoint_url = aws_config.endpoint_url
-    session = boto3.Session(
+
+    key = (
+        kind,
+        service_name,
+        region_name,
+        api_version,
+        use_ssl,
+        verify,
+        endpoint_url,
+        aws_access_key_id,
+        aws_secret_access_key,
+        aws_session_token,
+        aws_config.profile,
+        None if config is None else repr(sorted(getattr(config, '_user_provided_options', {}).items())),
+    )
+    if (injected := _injected_clients.get(key)) is not None:
+        return injected
+
+    logger.debug('Creating %s %s for lambda...', service_name, kind)
+    session = boto3.session.Session(
         aws_access_key_id=aws_access_key_id,
         aws_secret_access_key=aws_secret_access_key,
         aws_session_token=aws_session_token,
         region_name=region_name,
         profile_name=aws_config.profile,
     )
-    return session.client(  # type: ignore[call-overload,misc]
+    injected = _injected_clients[key] = getattr(session, kind)(
         service_name=service_name,
         api_version=api_version,
         use_ssl=use_ssl,
@@ -94,3 +191,116 @@ def inject_aws_config_in_client(
         endpoint_url=endpoint_url,
         config=config,
     )
+    return injected
+
+
+def clear_injected_clients() -> None:
+    _injected_clients.clear()
+
+
+def inject_aws_config_in_client(
+    service_name: str,
+    region_name: Optional[str] = None,
+    api_version: Optional[str] = None,
+    use_ssl: Optional[bool] = True,
+    verify: Optional[Union[bool, str]] = None,
+    endpoint_url: Optional[str] = None,
+    aws_access_key_id: Optional[str] = None,
+    aws_secret_access_key: Optional[str] = None,
+    aws_session_token: Optional[str] = None,
+    config: Optional[Config] = None,
+) -> Any:
+    return _inject_aws_config(
+        'client',
+        service_name,
+        region_name,
+        api_version,
+        use_ssl,
+        verify,
+        endpoint_url,
+        aws_access_key_id,
+        aws_secret_access_key,
+        aws_session_token,
+        config,
+    )
+
+
+def inject_aws_config_in_resource(
+    service_name: str,
+    region_name: Optional[str] = None,
+    api_version: Optional[str] = None,
+    use_ssl: Optional[bool] = True,
+    verify: Optional[Union[bool, str]] = None,
+    endpoint_url: Optional[str] = None,
+    aws_access_key_id: Optional[str] = None,
+    aws_secret_access_key: Optional[str] = None,
+    aws_session_token: Optional[str] = None,
+    config: Optional[Config] = None,
+) -> Any:
+    return _inject_aws_config(
+        'resource',
+        service_name,
+        region_name,
+        api_version,
+        use_ssl,
+        verify,
+        endpoint_url,
+        aws_access_key_id,
+        aws_secret_access_key,
+        aws_session_token,
+        config,
+    )
+
+
+class InjectedSession(boto3.session.Session):
+    def client(  # type: ignore[override]
+        self,
+        service_name: str,
+        region_name: Optional[str] = None,
+        api_version: Optional[str] = None,
+        use_ssl: Optional[bool] = True,
+        verify: Optional[Union[bool, str]] = None,
+        endpoint_url: Optional[str] = None,
+        aws_access_key_id: Optional[str] = None,
+        aws_secret_access_key: Optional[str] = None,
+        aws_session_token: Optional[str] = None,
+        config: Optional[Config] = None,
+    ) -> Any:
+        return inject_aws_config_in_client(
+            service_name,
+            region_name or self.region_name,
+            api_version,
+            use_ssl,
+            verify,
+            endpoint_url,
+            aws_access_key_id,
+            aws_secret_access_key,
+            aws_session_token,
+            config,
+        )
+
+    def resource(  # type: ignore[override]
+        self,
+        service_name: str,
+        region_name: Optional[str] = None,
+        api_version: Optional[str] = None,
+        use_ssl: Optional[bool] = True,
+        verify: Optional[Union[bool, str]] = None,
+        endpoint_url: Optional[str] = None,
+        aws_access_key_id: Optional[str] = None,
+        aws_secret_access_key: Optional[str] = None,
+        aws_session_token: Optional[str] = None,
+        config: Optional[Config] = None,
+    ) -> Any:
+        return inject_aws_config_in_resource(
+            service_name,
+            region_name or self.region_name,
+            api_version,
+            use_ssl,
+            verify,
+            endpoint_url,
+            aws_access_key_id,
+            aws_secret_access_key,
+            aws_session_token,
+            config,
+        )
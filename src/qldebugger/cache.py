@@ -0,0 +1,70 @@
+import json
+import logging
+import os
+from pathlib import Path
+from tempfile import mkstemp
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def get_cache_dir() -> Path:
+    if cache_home := os.environ.get('XDG_CACHE_HOME'):
+        return Path(cache_home) / 'qldebugger'
+    return Path.home() / '.cache' / 'qldebugger'
+
+
+def load_cache(name: str, /) -> Dict[str, Any]:
+    filename = get_cache_dir() / f'{name}.json'
+    try:
+        with filename.open() as fp:
+            data = json.load(fp)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    return data
+
+
+def _write_cache_file(filename: Path, data: bytes, /) -> None:
+    try:
+        filename.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        # mkstemp creates the file readable only by the current user, caches may contain credentials and secrets
+        fd, tmp_name = mkstemp(dir=filename.parent, prefix=f'.{filename.name}.')
+        tmp_filename = Path(tmp_name)
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                fp.write(data)
+            tmp_filename.replace(filename)
+        except BaseException:
+            tmp_filename.unlink()
+            raise
+    except OSError as e:
+        logger.debug('Could not write %r cache: %s', filename.name, e)
+
+
+def save_cache(name: str, data: Dict[str, Any], /) -> None:
+    _write_cache_file(get_cache_dir() / f'{name}.json', json.dumps(data).encode())
+
+
+def _is_private_file(fd: int, /) -> bool:
+    if not hasattr(os, 'getuid'):
+        return True
+    stat = os.fstat(fd)
+    return stat.st_uid == os.getuid() and not stat.st_mode & 0o022
+
+
+def load_binary_cache(name: str, /) -> Optional[bytes]:
+    # Binary caches are unpickled, so files that other users could have written are ignored
+    try:
+        with (get_cache_dir() / f'{name}.bin').open('rb') as fp:
+            if not _is_private_file(fp.fileno()):
+                logger.warning('Ignoring %r cache owned or writable by other users', name)
+                return None
+            return fp.read()
+    except OSError:
+        return None
+
+
+def save_binary_cache(name: str, data: bytes, /) -> None:
+    _write_cache_file(get_cache_dir() / f'{name}.bin', data)
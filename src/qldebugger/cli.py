@@ -1,19 +1,26 @@
 import json
 import logging
 from pathlib import Path
-from typing import TYPE_CHECKING, Mapping
+from typing import TYPE_CHECKING, Mapping, Optional, TextIO, Tuple
 
 import click
 
 from . import actions
-from .config import load_config
 
 if TYPE_CHECKING:
     from mypy_boto3_sns.type_defs import MessageAttributeValueTypeDef
 
+    from .config.file_parser import Config
+
 CONFIG_FILENAME = Path('qldebugger.toml')
 
 
+def load_config(filename: Path, /) -> 'Config':
+    from .config import load_config
+
+    return load_config(filename)
+
+
 @click.group()
 def cli() -> None:
     logging.basicConfig(level=logging.INFO, format='%(levelname)s:qldebugger:%(message)s')
@@ -52,10 +59,118 @@ b = {queue = "myqueue", function_name = "fail", batch_size = 1, maximum_batching
 
 
 @cli.command()
-@click.argument('event_source_mapping_name')
-def run(event_source_mapping_name: str) -> None:
-    load_config(CONFIG_FILENAME)
-    actions.event_source_mapping.receive_messages_and_run_lambda(event_source_mapping_name=event_source_mapping_name)
+@click.argument('event_source_mapping_names', nargs=-1)
+@click.option('--all', 'all_event_source_mappings', is_flag=True)
+@click.option('--follow', is_flag=True)
+@click.option('--poll-interval', default=1.0, type=float, show_default=True)
+@click.option('--processes', default=0, type=click.IntRange(min=0), show_default=True)
+@click.option('--prefetch', default=0, type=click.IntRange(min=0), show_default=True)
+@click.option('--reload', 'reload_modules', is_flag=True)
+@click.option('--workers', type=click.IntRange(min=1))
+@click.option('--engine', default='threads', type=click.Choice(['threads', 'asyncio']), show_default=True)
+@click.option('--metrics-port', type=click.IntRange(min=0, max=65535))
+@click.option('--metrics-file', type=click.Path(dir_okay=False, path_type=Path))
+@click.option('--metrics-interval', default=10.0, type=click.FloatRange(min=0, min_open=True), show_default=True)
+@click.option('--profile', 'profile_dir', type=click.Path(file_okay=False, path_type=Path))
+def run(
+    event_source_mapping_names: Tuple[str, ...],
+    all_event_source_mappings: bool,
+    follow: bool,
+    poll_interval: float,
+    processes: int,
+    prefetch: int,
+    reload_modules: bool,
+    workers: Optional[int],
+    engine: str,
+    metrics_port: Optional[int],
+    metrics_file: Optional[Path],
+    metrics_interval: float,
+    profile_dir: Optional[Path],
+) -> None:
+    from .metrics import start_metrics
+
+    config = load_config(CONFIG_FILENAME)
+    if all_event_source_mappings:
+        event_source_mapping_names = tuple(config.event_source_mapping)
+    if not event_source_mapping_names:
+        raise click.UsageError('Missing event source mapping name')
+    if prefetch and (not follow or engine == 'asyncio'):
+        raise click.UsageError('--prefetch requires --follow and the threads engine')
+    if follow and engine == 'threads' and workers is not None and workers < len(event_source_mapping_names):
+        raise click.UsageError('--follow requires at least one worker per event source mapping')
+    lambda_names = {config.event_source_mapping[name].function_name for name in event_source_mapping_names}
+    if reload_modules:
+        actions.lambda_.watch_lambda_modules(lambda_names=lambda_names)
+    actions.lambda_.profile_lambdas(lambda_names=lambda_names, profile_dir=profile_dir)
+    stop_metrics = start_metrics(port=metrics_port, filename=metrics_file, interval=metrics_interval)
+    try:
+        if engine == 'asyncio':
+            actions.event_source_mapping.run_event_source_mappings_async(
+                event_source_mapping_names=event_source_mapping_names,
+                follow=follow,
+                poll_interval=poll_interval,
+                processes=processes,
+                workers=workers,
+            )
+        elif len(event_source_mapping_names) > 1:
+            actions.event_source_mapping.run_event_source_mappings(
+                event_source_mapping_names=event_source_mapping_names,
+                follow=follow,
+                poll_interval=poll_interval,
+                processes=processes,
+                prefetch=prefetch,
+                workers=workers,
+            )
+        elif follow:
+            actions.event_source_mapping.poll_messages_and_run_lambda(
+                event_source_mapping_name=event_source_mapping_names[0],
+                poll_interval=poll_interval,
+                processes=processes,
+                prefetch=prefetch,
+            )
+        else:
+            actions.event_source_mapping.receive_messages_and_run_lambda(
+                event_source_mapping_name=event_source_mapping_names[0]
+            )
+    except actions.event_source_mapping.EventSourceMappingsError as e:
+        raise click.ClickException(str(e)) from e
+    finally:
+        actions.lambda_.shutdown_lambda_pools()
+        stop_metrics()
+
+
+@cli.command('profile-report')
+@click.argument('profile_dir', type=click.Path(exists=True, file_okay=False, path_type=Path))
+@click.argument('event_source_mapping_names', nargs=-1)
+@click.option(
+    '--sort',
+    default='cumulative',
+    type=click.Choice(['calls', 'cumulative', 'filename', 'line', 'name', 'nfl', 'pcalls', 'stdname', 'tottime']),
+    show_default=True,
+)
+@click.option('--limit', default=30, type=click.IntRange(min=1), show_default=True)
+@click.option('--output', default='-', type=click.File('w'))
+@click.option('--dump', type=click.Path(dir_okay=False, path_type=Path))
+def profile_report(
+    profile_dir: Path,
+    event_source_mapping_names: Tuple[str, ...],
+    sort: str,
+    limit: int,
+    output: TextIO,
+    dump: Optional[Path],
+) -> None:
+    try:
+        profiles = actions.lambda_.aggregate_profiles(
+            profile_dir=profile_dir,
+            output=output,
+            event_source_mapping_names=event_source_mapping_names,
+            sort=sort,
+            limit=limit,
+            dump=dump,
+        )
+    except RuntimeWarning as e:
+        raise click.ClickException(str(e)) from e
+    click.echo(f'Aggregated {profiles} profiles', err=True)
 
 
 # Infra
@@ -66,36 +181,39 @@ def infra() -> None: ...
 
 
 @infra.command('create-secrets')
-def infra_create_secrets() -> None:
+@click.option('--reconcile', is_flag=True)
+def infra_create_secrets(reconcile: bool) -> None:
     load_config(CONFIG_FILENAME)
-    actions.infra.create_secrets()
+    actions.infra.create_secrets(reconcile=reconcile)
 
 
 @infra.command('create-topics')
-def infra_create_topics() -> None:
+@click.option('--reconcile', is_flag=True)
+def infra_create_topics(reconcile: bool) -> None:
     load_config(CONFIG_FILENAME)
-    actions.infra.create_topics()
+    actions.infra.create_topics(reconcile=reconcile)
 
 
 @infra.command('create-queues')
-def infra_create_queues() -> None:
+@click.option('--reconcile', is_flag=True)
+def infra_create_queues(reconcile: bool) -> None:
     load_config(CONFIG_FILENAME)
-    actions.infra.create_queues()
+    actions.infra.create_queues(reconcile=reconcile)
 
 
 @infra.command('create-all')
-def infra_create_all() -> None:
+@click.option('--workers', default=4, type=click.IntRange(min=1), show_default=True)
+@click.option('--reconcile', is_flag=True)
+def infra_create_all(workers: int, reconcile: bool) -> None:
     load_config(CONFIG_FILENAME)
-    actions.infra.create_secrets()
-    actions.infra.create_topics()
-    actions.infra.create_queues()
-    actions.infra.subscribe_topics()
+    actions.infra.create_all(workers=workers, reconcile=reconcile)
 
 
 @infra.command('subscribe-topics')
-def infra_subscribe_topics() -> None:
+@click.option('--workers', default=4, type=click.IntRange(min=1), show_default=True)
+def infra_subscribe_topics(workers: int) -> None:
     load_config(CONFIG_FILENAME)
-    actions.infra.subscribe_topics()
+    actions.infra.subscribe_topics(workers=workers)
 
 
 # Msg
@@ -107,27 +225,82 @@ def msg() -> None: ...
 
 @msg.command('publish')
 @click.argument('topic_name')
-@click.argument('message')
+@click.argument('message', required=False)
 @click.argument('attributes', default='{}', type=json.loads)
-def msg_publish(topic_name: str, message: str, attributes: Mapping[str, 'MessageAttributeValueTypeDef']) -> None:
+@click.option('--from', 'from_file', type=click.File('r'))
+@click.option('--jsonl', is_flag=True)
+@click.option('--workers', default=4, type=click.IntRange(min=1), show_default=True)
+def msg_publish(
+    topic_name: str,
+    message: Optional[str],
+    attributes: Mapping[str, 'MessageAttributeValueTypeDef'],
+    from_file: Optional[TextIO],
+    jsonl: bool,
+    workers: int,
+) -> None:
+    if (message is None) == (from_file is None):
+        raise click.UsageError('Pass either a message or --from')
     load_config(CONFIG_FILENAME)
-    actions.message.publish_message(topic_name=topic_name, message=message, attributes=attributes)
+    if message is not None:
+        actions.message.publish_message(topic_name=topic_name, message=message, attributes=attributes)
+    elif from_file is not None:
+        actions.message.publish_messages(
+            topic_name=topic_name,
+            entries=actions.message.read_message_entries(from_file, jsonl=jsonl),
+            workers=workers,
+        )
 
 
 @msg.command('send')
 @click.argument('queue_name')
-@click.argument('message')
-def msg_send(queue_name: str, message: str) -> None:
+@click.argument('message', required=False)
+@click.option('--from', 'from_file', type=click.File('r'))
+@click.option('--jsonl', is_flag=True)
+@click.option('--workers', default=4, type=click.IntRange(min=1), show_default=True)
+def msg_send(queue_name: str, message: Optional[str], from_file: Optional[TextIO], jsonl: bool, workers: int) -> None:
+    if (message is None) == (from_file is None):
+        raise click.UsageError('Pass either a message or --from')
     load_config(CONFIG_FILENAME)
-    actions.message.send_message(queue_name=queue_name, message=message)
+    if message is not None:
+        actions.message.send_message(queue_name=queue_name, message=message)
+    elif from_file is not None:
+        actions.message.send_messages(
+            queue_name=queue_name,
+            entries=actions.message.read_message_entries(from_file, jsonl=jsonl),
+            workers=workers,
+        )
 
 
 @msg.command('receive')
 @click.argument('queue_name')
 @click.option('--batch-size', default=1, type=int, show_default=True)
 @click.option('--wait-seconds', default=0, type=int, show_default=True)
-def msg_receive(queue_name: str, batch_size: int, wait_seconds: int) -> None:
+@click.option('--drain', is_flag=True)
+@click.option('--output', default='-', type=click.File('w'))
+@click.option('--workers', default=4, type=click.IntRange(min=1), show_default=True)
+@click.option('--empty-receives', default=2, type=click.IntRange(min=1), show_default=True)
+@click.option('--max-messages', type=click.IntRange(min=1))
+def msg_receive(
+    queue_name: str,
+    batch_size: int,
+    wait_seconds: int,
+    drain: bool,
+    output: TextIO,
+    workers: int,
+    empty_receives: int,
+    max_messages: Optional[int],
+) -> None:
     load_config(CONFIG_FILENAME)
+    if drain:
+        actions.message.drain_messages(
+            queue_name=queue_name,
+            output=output,
+            wait_seconds=wait_seconds,
+            workers=workers,
+            empty_receives=empty_receives,
+            max_messages=max_messages,
+        )
+        return
     messages = actions.message.receive_message(
         queue_name=queue_name, batch_size=batch_size, maximum_batching_window=wait_seconds
     )
@@ -1,7 +1,15 @@
 import logging
+import pickle
+from hashlib import sha256
+from io import BytesIO
 from pathlib import Path
-from typing import Optional, Union
+from typing import Any, Optional, Tuple, Union
 
+from pydantic import VERSION as PYDANTIC_VERSION
+
+from qldebugger.cache import load_binary_cache, save_binary_cache
+
+from . import file_parser
 from .file_parser import Config
 
 logger = logging.getLogger(__name__)
@@ -9,14 +17,65 @@ logger = logging.getLogger(__name__)
 _current_config: Optional[Config] = None
 
 
-def load_config(filename: Union[str, Path], /) -> Config:
+def _get_config_cache_name(path: Path, /) -> str:
+    return f'config-{sha256(str(path).encode()).hexdigest()[:16]}'
+
+
+def _get_config_cache_key(path: Path, /) -> Tuple[Any, ...]:
+    stat = path.stat()
+    schema_stat = Path(file_parser.__file__).stat()
+    return (
+        str(path),
+        stat.st_mtime_ns,
+        stat.st_size,
+        schema_stat.st_mtime_ns,
+        schema_stat.st_size,
+        PYDANTIC_VERSION,
+    )
+
+
+def _load_cached_config(path: Path, key: Tuple[Any, ...], /) -> Optional[Config]:
+    data = load_binary_cache(_get_config_cache_name(path))
+    if data is None:
+        return None
+    try:
+        fp = BytesIO(data)
+        if pickle.load(fp) != key:  # noqa: S301
+            return None
+        config = pickle.load(fp)  # noqa: S301
+    except Exception:  # noqa: BLE001
+        logger.debug('Invalid config cache for %r', str(path))
+        return None
+    return config if isinstance(config, Config) else None
+
+
+def _save_cached_config(path: Path, key: Tuple[Any, ...], config: Config, /) -> None:
+    fp = BytesIO()
+    pickle.dump(key, fp, protocol=pickle.HIGHEST_PROTOCOL)
+    pickle.dump(config, fp, protocol=pickle.HIGHEST_PROTOCOL)
+    save_binary_cache(_get_config_cache_name(path), fp.getvalue())
+
+
+def load_config(filename: Union[str, Path], /, *, use_cache: bool = True) -> Config:
     logger.debug('Loading %r config...', str(filename))
     global _current_config  # noqa: PLW0603
-    with Path(filename).open('rb') as fp:
+    path = Path(filename).resolve()
+    key = _get_config_cache_key(path) if use_cache else ()
+    if use_cache and (config := _load_cached_config(path, key)) is not None:
+        _current_config = config
+        return _current_config
+    with path.open('rb') as fp:
         _current_config = Config.from_toml(fp)
+    if use_cache:
+        _save_cached_config(path, key, _current_config)
     return _current_config
 
 
+def set_config(config: Config, /) -> None:
+    global _current_config  # noqa: PLW0603
+    _current_config = config
+
+
 def get_config() -> Config:
     if _current_config is None:
         raise RuntimeError('Configuration file is not loaded yet')
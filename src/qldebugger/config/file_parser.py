@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
-from typing import Any, BinaryIO, Dict, List, NamedTuple, Optional, Tuple, Union
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, List, Literal, NamedTuple, Optional, Tuple, Union
 
 import tomli
 from pydantic import BaseModel, Field, PositiveInt, field_validator
@@ -12,6 +13,7 @@ class ConfigAWS(BaseModel):
     session_token: Optional[str] = None
     region: Optional[str] = None
     endpoint_url: Optional[str] = None
+    account_id: Optional[str] = None
 
 
 class ConfigSecret(BaseModel, ABC):
@@ -61,6 +63,9 @@ class NameHandlerTuple(NamedTuple):
 class ConfigLambda(BaseModel):
     handler: NameHandlerTuple
     environment: Dict[str, str] = Field(default_factory=dict)
+    profile_dir: Optional[Path] = None
+    memory_size: Optional[int] = Field(None, ge=128, le=10_240)
+    enforce_memory_size: bool = False
 
     @field_validator('handler', mode='before')
     @classmethod
@@ -75,9 +80,11 @@ class ConfigLambda(BaseModel):
 
 class ConfigEventSourceMapping(BaseModel):
     queue: str
-    batch_size: int = 10
-    maximum_batching_window: int = 0
+    batch_size: int = Field(10, ge=1, le=10_000)
+    maximum_batching_window: int = Field(0, ge=0, le=300)
     function_name: str
+    function_response_types: List[Literal['ReportBatchItemFailures']] = Field(default_factory=list)
+    visibility_heartbeat_interval: Optional[int] = Field(None, ge=1, le=43_200)
 
 
 class Config(BaseModel):
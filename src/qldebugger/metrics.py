@@ -0,0 +1,241 @@
+import json
+import logging
+import os
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from threading import Event, Lock, Thread
+from time import perf_counter, time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+METRICS_HELP = {
+    'qldebugger_batches_total': 'Batches of messages received by the event source mapping',
+    'qldebugger_empty_receives_total': 'Receives of the event source mapping without messages',
+    'qldebugger_messages_total': 'Messages of the event source mapping by status',
+    'qldebugger_stage_errors_total': 'Errors on each stage of the event source mapping',
+    'qldebugger_stage_duration_seconds': 'Duration of each stage of the event source mapping',
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    def __init__(self) -> None:
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(BUCKETS, value)
+        if index < len(self.buckets):
+            self.buckets[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def get_cumulative_buckets(self) -> List[Tuple[float, int]]:
+        cumulative = []
+        total = 0
+        for bound, count in zip(BUCKETS, self.buckets):
+            total += count
+            cumulative.append((bound, total))
+        return cumulative
+
+
+_lock = Lock()
+_counters: Dict[Tuple[str, Labels], float] = {}
+_histograms: Dict[Tuple[str, Labels], Histogram] = {}
+
+
+def increment_counter(name: str, value: float = 1, /, **labels: str) -> None:
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe_histogram(name: str, value: float, /, **labels: str) -> None:
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        if (histogram := _histograms.get(key)) is None:
+            histogram = _histograms[key] = Histogram()
+        histogram.observe(value)
+
+
+def observe_stage(event_source_mapping_name: str, stage: str, duration: float, /) -> None:
+    observe_histogram(
+        'qldebugger_stage_duration_seconds', duration, event_source_mapping=event_source_mapping_name, stage=stage
+    )
+
+
+@contextmanager
+def measure_stage(event_source_mapping_name: str, stage: str, /) -> Iterator[None]:
+    start = perf_counter()
+    try:
+        yield
+    except RuntimeWarning:
+        raise
+    except BaseException:
+        increment_counter('qldebugger_stage_errors_total', event_source_mapping=event_source_mapping_name, stage=stage)
+        raise
+    finally:
+        observe_stage(event_source_mapping_name, stage, perf_counter() - start)
+
+
+def reset_metrics() -> None:
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def get_resident_memory() -> Optional[int]:
+    try:
+        return int(Path('/proc/self/statm').read_text().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def get_process_metrics() -> Dict[str, float]:
+    times = os.times()
+    process_metrics = {'process_cpu_seconds_total': times.user + times.system}
+    if (resident_memory := get_resident_memory()) is not None:
+        process_metrics['process_resident_memory_bytes'] = resident_memory
+    return process_metrics
+
+
+def get_snapshot() -> Dict[str, Any]:
+    with _lock:
+        counters = [
+            {'name': name, 'labels': dict(labels), 'value': value} for (name, labels), value in _counters.items()
+        ]
+        histograms = [
+            {
+                'name': name,
+                'labels': dict(labels),
+                'count': histogram.count,
+                'sum': histogram.sum,
+                'buckets': {str(bound): count for bound, count in histogram.get_cumulative_buckets()},
+            }
+            for (name, labels), histogram in _histograms.items()
+        ]
+    return {'timestamp': time(), 'process': get_process_metrics(), 'counters': counters, 'histograms': histograms}
+
+
+def _format_labels(labels: Labels, /, **extra: str) -> str:
+    items = [*labels, *extra.items()]
+    if not items:
+        return ''
+    return '{' + ','.join(f'{key}={json.dumps(value)}' for key, value in items) + '}'
+
+
+def _format_value(value: float, /) -> str:
+    return repr(float(value))
+
+
+def render_prometheus() -> str:
+    lines: List[str] = []
+    for name, value in get_process_metrics().items():
+        lines.extend(
+            [f'# TYPE {name} {"counter" if name.endswith("_total") else "gauge"}', f'{name} {_format_value(value)}']
+        )
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted(_histograms.items(), key=lambda item: item[0])
+        described = set()
+        for (name, labels), value in counters:
+            if name not in described:
+                described.add(name)
+                lines.extend([f'# HELP {name} {METRICS_HELP.get(name, name)}', f'# TYPE {name} counter'])
+            lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        for (name, labels), histogram in histograms:
+            if name not in described:
+                described.add(name)
+                lines.extend([f'# HELP {name} {METRICS_HELP.get(name, name)}', f'# TYPE {name} histogram'])
+            lines.extend(
+                f'{name}_bucket{_format_labels(labels, le=_format_value(bound))} {count}'
+                for bound, count in histogram.get_cumulative_buckets()
+            )
+            lines.extend(
+                [
+                    f'{name}_bucket{_format_labels(labels, le="+Inf")} {histogram.count}',
+                    f'{name}_sum{_format_labels(labels)} {_format_value(histogram.sum)}',
+                    f'{name}_count{_format_labels(labels)} {histogram.count}',
+                ]
+            )
+    return '\n'.join(lines) + '\n'
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:  # noqa: N802
+        if self.path.split('?', maxsplit=1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render_prometheus().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+        logger.debug('Metrics request: %s', format % args)
+
+
+def start_metrics_server(*, port: int, host: str = '127.0.0.1') -> Callable[[], None]:
+    server = ThreadingHTTPServer((host, port), _MetricsRequestHandler)
+    server.daemon_threads = True
+    thread = Thread(target=server.serve_forever, name='qldebugger-metrics', daemon=True)
+    thread.start()
+    logger.info('Serving metrics on http://%s:%d/metrics', host, server.server_address[1])
+
+    def stop() -> None:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+    return stop
+
+
+def write_snapshot(filename: Path, /) -> None:
+    with filename.open('a') as fp:
+        fp.write(json.dumps(get_snapshot()) + '\n')
+
+
+def start_metrics_snapshots(*, filename: Path, interval: float) -> Callable[[], None]:
+    stop_event = Event()
+
+    def write_snapshots() -> None:
+        while not stop_event.wait(interval):
+            try:
+                write_snapshot(filename)
+            except OSError as e:
+                logger.warning('Error on write metrics snapshot (%r)', e)
+
+    thread = Thread(target=write_snapshots, name='qldebugger-metrics', daemon=True)
+    thread.start()
+
+    def stop() -> None:
+        stop_event.set()
+        thread.join()
+        write_snapshot(filename)
+
+    return stop
+
+
+def start_metrics(
+    *, port: Optional[int] = None, filename: Optional[Path] = None, interval: float = 10
+) -> Callable[[], None]:
+    stops = []
+    if port is not None:
+        stops.append(start_metrics_server(port=port))
+    if filename is not None:
+        stops.append(start_metrics_snapshots(filename=filename, interval=interval))
+
+    def stop() -> None:
+        for stop_metrics in stops:
+            stop_metrics()
+
+    return stop
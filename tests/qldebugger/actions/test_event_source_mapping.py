@@ -1,9 +1,29 @@
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import suppress
 from random import randint
-from typing import TYPE_CHECKING, Any, cast
-from unittest.mock import Mock, patch
+from threading import Event, current_thread
+from typing import TYPE_CHECKING, Any, ClassVar, Dict, List, cast
+from unittest.mock import ANY, Mock, call, patch
 
-from qldebugger.actions.event_source_mapping import convert_sqs_messages_to_event, receive_messages_and_run_lambda
+import pytest
+
+from qldebugger.actions.event_source_mapping import (
+    EventSourceMappingsError,
+    complete_messages,
+    convert_sqs_messages_to_event,
+    get_batch_item_failures,
+    get_heartbeat_visibility_timeout,
+    poll_messages_and_run_lambda,
+    poll_messages_and_run_lambda_async,
+    receive_messages,
+    receive_messages_and_run_lambda,
+    run_event_source_mappings,
+    run_event_source_mappings_async,
+    start_visibility_heartbeat,
+)
 from qldebugger.config.file_parser import ConfigEventSourceMapping
+from qldebugger.metrics import get_snapshot, reset_metrics
 from tests.utils import randstr
 
 if TYPE_CHECKING:
@@ -11,10 +31,10 @@ if TYPE_CHECKING:
 
 
 class TestReceiveMessagesAndRunLambda:
-    @patch('qldebugger.actions.event_source_mapping.get_account_id')
+    @patch('qldebugger.actions.event_source_mapping.get_queue_arn')
     @patch('qldebugger.actions.event_source_mapping.get_client')
     @patch('qldebugger.actions.event_source_mapping.get_config')
-    @patch('qldebugger.actions.event_source_mapping.receive_message')
+    @patch('qldebugger.actions.event_source_mapping.receive_message_batch')
     @patch('qldebugger.actions.event_source_mapping.convert_sqs_messages_to_event')
     @patch('qldebugger.actions.event_source_mapping.run_lambda')
     @patch('qldebugger.actions.event_source_mapping.delete_messages')
@@ -23,10 +43,10 @@ class TestReceiveMessagesAndRunLambda:
         mock_delete_messages: Mock,
         mock_run_lambda: Mock,
         mock_convert_sqs_messages_to_event: Mock,
-        mock_receive_message: Mock,
+        mock_receive_message_batch: Mock,
         mock_get_config: Mock,
         mock_get_client: Mock,
-        mock_get_account_id: Mock,
+        mock_get_queue_arn: Mock,
     ) -> None:
         partition = randstr()
         aws_region = randstr()
@@ -38,7 +58,7 @@ class TestReceiveMessagesAndRunLambda:
         maximum_batching_window = randint(0, 20)
         lambda_name = randstr()
 
-        mock_get_account_id.return_value = account_id
+        mock_get_queue_arn.return_value = queue_arn
         mock_get_client.return_value.meta.partition = partition
         mock_get_client.return_value.meta.region_name = aws_region
         mock_get_config.return_value.event_source_mapping = {
@@ -52,7 +72,7 @@ class TestReceiveMessagesAndRunLambda:
 
         receive_messages_and_run_lambda(event_source_mapping_name=event_source_mapping_name)
 
-        mock_receive_message.assert_called_once_with(
+        mock_receive_message_batch.assert_called_once_with(
             queue_name=queue_name,
             batch_size=batch_size,
             maximum_batching_window=maximum_batching_window,
@@ -61,17 +81,776 @@ class TestReceiveMessagesAndRunLambda:
             aws_region=aws_region,
             event_source=f'{partition}:sqs',
             event_source_arn=queue_arn,
-            messages=mock_receive_message.return_value,
+            messages=mock_receive_message_batch.return_value,
         )
         mock_run_lambda.assert_called_once_with(
             lambda_name=lambda_name,
             event=mock_convert_sqs_messages_to_event.return_value,
+            profile_filename=None,
         )
         mock_delete_messages.assert_called_once_with(
             queue_name=queue_name,
-            messages=mock_receive_message.return_value,
+            messages=mock_receive_message_batch.return_value,
+        )
+
+    @patch('qldebugger.actions.event_source_mapping.get_queue_arn')
+    @patch('qldebugger.actions.event_source_mapping.get_client')
+    @patch('qldebugger.actions.event_source_mapping.get_config')
+    @patch('qldebugger.actions.event_source_mapping.receive_message_batch')
+    @patch('qldebugger.actions.event_source_mapping.run_lambda')
+    @patch('qldebugger.actions.event_source_mapping.delete_messages')
+    def test_metrics(
+        self,
+        mock_delete_messages: Mock,
+        mock_run_lambda: Mock,
+        mock_receive_message_batch: Mock,
+        mock_get_config: Mock,
+        mock_get_client: Mock,
+        mock_get_queue_arn: Mock,
+    ) -> None:
+        event_source_mapping_name = randstr()
+        messages = [
+            {'MessageId': randstr(), 'ReceiptHandle': randstr(), 'Body': randstr(), 'MD5OfBody': randstr()}
+            for _ in range(randint(1, 10))
+        ]
+
+        mock_get_queue_arn.return_value = randstr()
+        mock_get_client.return_value.meta.partition = randstr()
+        mock_get_client.return_value.meta.region_name = randstr()
+        mock_get_config.return_value.event_source_mapping = {
+            event_source_mapping_name: ConfigEventSourceMapping(queue=randstr(), function_name=randstr()),
+        }
+        mock_receive_message_batch.return_value = {'Messages': messages}
+        reset_metrics()
+
+        receive_messages_and_run_lambda(event_source_mapping_name=event_source_mapping_name)
+
+        snapshot = get_snapshot()
+        labels = {'event_source_mapping': event_source_mapping_name}
+        assert {'name': 'qldebugger_batches_total', 'labels': labels, 'value': 1} in snapshot['counters']
+        for status in ['received', 'succeeded']:
+            assert {
+                'name': 'qldebugger_messages_total',
+                'labels': {**labels, 'status': status},
+                'value': len(messages),
+            } in snapshot['counters']
+        assert sorted(
+            histogram['labels']['stage']
+            for histogram in snapshot['histograms']
+            if histogram['labels']['event_source_mapping'] == event_source_mapping_name
+        ) == ['complete', 'convert', 'lambda', 'receive']
+
+
+class TestPollMessagesAndRunLambda:
+    @patch('qldebugger.actions.event_source_mapping.get_queue_arn')
+    @patch('qldebugger.actions.event_source_mapping.get_client')
+    @patch('qldebugger.actions.event_source_mapping.get_config')
+    @patch('qldebugger.actions.event_source_mapping.receive_message_batch')
+    @patch('qldebugger.actions.event_source_mapping.convert_sqs_messages_to_event')
+    @patch('qldebugger.actions.event_source_mapping.run_lambda')
+    @patch('qldebugger.actions.event_source_mapping.delete_messages')
+    def test_run_until_interrupted(
+        self,
+        mock_delete_messages: Mock,
+        mock_run_lambda: Mock,
+        mock_convert_sqs_messages_to_event: Mock,
+        mock_receive_message_batch: Mock,
+        mock_get_config: Mock,
+        mock_get_client: Mock,
+        mock_get_queue_arn: Mock,
+    ) -> None:
+        event_source_mapping_name = randstr()
+        queue_name = randstr()
+        lambda_name = randstr()
+        poll_interval = randint(1, 10)
+        messages1 = {'Messages': [randstr()]}
+        messages2 = {'Messages': [randstr()]}
+
+        mock_get_config.return_value.event_source_mapping = {
+            event_source_mapping_name: ConfigEventSourceMapping(queue=queue_name, function_name=lambda_name),
+        }
+        mock_receive_message_batch.side_effect = [messages1, RuntimeWarning, messages2, KeyboardInterrupt]
+        stop_event = Mock()
+        stop_event.is_set.return_value = False
+
+        poll_messages_and_run_lambda(
+            event_source_mapping_name=event_source_mapping_name,
+            poll_interval=poll_interval,
+            stop_event=stop_event,
+        )
+
+        mock_get_queue_arn.assert_called_once_with(queue_name)
+        assert mock_receive_message_batch.call_count == 4
+        stop_event.wait.assert_called_once_with(poll_interval)
+        assert mock_run_lambda.call_count == 2
+        assert mock_delete_messages.call_args_list == [
+            call(queue_name=queue_name, messages=messages1),
+            call(queue_name=queue_name, messages=messages2),
+        ]
+
+    @patch('qldebugger.actions.event_source_mapping.get_queue_arn')
+    @patch('qldebugger.actions.event_source_mapping.get_client')
+    @patch('qldebugger.actions.event_source_mapping.get_config')
+    @patch('qldebugger.actions.event_source_mapping.receive_message_batch')
+    @patch('qldebugger.actions.event_source_mapping.convert_sqs_messages_to_event')
+    @patch('qldebugger.actions.event_source_mapping.run_lambda')
+    @patch('qldebugger.actions.event_source_mapping.delete_messages')
+    def test_lambda_error_should_keep_messages(
+        self,
+        mock_delete_messages: Mock,
+        mock_run_lambda: Mock,
+        mock_convert_sqs_messages_to_event: Mock,
+        mock_receive_message_batch: Mock,
+        mock_get_config: Mock,
+        mock_get_client: Mock,
+        mock_get_queue_arn: Mock,
+    ) -> None:
+        event_source_mapping_name = randstr()
+        queue_name = randstr()
+        messages = {'Messages': [randstr()]}
+
+        mock_get_config.return_value.event_source_mapping = {
+            event_source_mapping_name: ConfigEventSourceMapping(queue=queue_name, function_name=randstr()),
+        }
+        mock_receive_message_batch.side_effect = [messages, KeyboardInterrupt]
+        mock_run_lambda.side_effect = Exception(randstr())
+
+        poll_messages_and_run_lambda(event_source_mapping_name=event_source_mapping_name)
+
+        mock_run_lambda.assert_called_once()
+        mock_delete_messages.assert_not_called()
+
+    @patch('qldebugger.actions.event_source_mapping.get_queue_arn')
+    @patch('qldebugger.actions.event_source_mapping.get_client')
+    @patch('qldebugger.actions.event_source_mapping.get_config')
+    @patch('qldebugger.actions.event_source_mapping.receive_message_batch')
+    def test_stop_event(
+        self,
+        mock_receive_message_batch: Mock,
+        mock_get_config: Mock,
+        mock_get_client: Mock,
+        mock_get_queue_arn: Mock,
+    ) -> None:
+        event_source_mapping_name = randstr()
+        stop_event = Event()
+
+        mock_get_config.return_value.event_source_mapping = {
+            event_source_mapping_name: ConfigEventSourceMapping(queue=randstr(), function_name=randstr()),
+        }
+
+        def receive_message_batch(**kwargs: Any) -> None:
+            stop_event.set()
+            raise RuntimeWarning
+
+        mock_receive_message_batch.side_effect = receive_message_batch
+
+        poll_messages_and_run_lambda(event_source_mapping_name=event_source_mapping_name, stop_event=stop_event)
+
+        mock_receive_message_batch.assert_called_once()
+
+    @patch('qldebugger.actions.event_source_mapping.get_queue_arn')
+    @patch('qldebugger.actions.event_source_mapping.get_client')
+    @patch('qldebugger.actions.event_source_mapping.get_config')
+    @patch('qldebugger.actions.event_source_mapping.receive_message_batch')
+    @patch('qldebugger.actions.event_source_mapping.convert_sqs_messages_to_event')
+    @patch('qldebugger.actions.event_source_mapping.submit_lambda')
+    @patch('qldebugger.actions.event_source_mapping.run_lambda')
+    @patch('qldebugger.actions.event_source_mapping.delete_messages')
+    def test_run_with_processes(
+        self,
+        mock_delete_messages: Mock,
+        mock_run_lambda: Mock,
+        mock_submit_lambda: Mock,
+        mock_convert_sqs_messages_to_event: Mock,
+        mock_receive_message_batch: Mock,
+        mock_get_config: Mock,
+        mock_get_client: Mock,
+        mock_get_queue_arn: Mock,
+    ) -> None:
+        event_source_mapping_name = randstr()
+        queue_name = randstr()
+        lambda_name = randstr()
+        processes = randint(2, 4)
+        messages1 = {'Messages': [randstr()]}
+        messages2 = {'Messages': [randstr()]}
+        future1: Future[Any] = Future()
+        future1.set_result(None)
+        future2: Future[Any] = Future()
+        future2.set_exception(Exception(randstr()))
+
+        mock_get_config.return_value.event_source_mapping = {
+            event_source_mapping_name: ConfigEventSourceMapping(queue=queue_name, function_name=lambda_name),
+        }
+        mock_receive_message_batch.side_effect = [messages1, messages2, KeyboardInterrupt]
+        mock_submit_lambda.side_effect = [future1, future2]
+
+        poll_messages_and_run_lambda(event_source_mapping_name=event_source_mapping_name, processes=processes)
+
+        mock_run_lambda.assert_not_called()
+        assert mock_submit_lambda.call_args_list == [
+            call(
+                lambda_name=lambda_name,
+                event=mock_convert_sqs_messages_to_event.return_value,
+                processes=processes,
+                profile_filename=None,
+            ),
+            call(
+                lambda_name=lambda_name,
+                event=mock_convert_sqs_messages_to_event.return_value,
+                processes=processes,
+                profile_filename=None,
+            ),
+        ]
+        mock_delete_messages.assert_called_once_with(queue_name=queue_name, messages=messages1)
+
+    @patch('qldebugger.actions.event_source_mapping.get_queue_arn')
+    @patch('qldebugger.actions.event_source_mapping.get_client')
+    @patch('qldebugger.actions.event_source_mapping.get_config')
+    @patch('qldebugger.actions.event_source_mapping.get_visibility_timeout')
+    @patch('qldebugger.actions.event_source_mapping.receive_message_batch')
+    @patch('qldebugger.actions.event_source_mapping.convert_sqs_messages_to_event')
+    @patch('qldebugger.actions.event_source_mapping.run_lambda')
+    @patch('qldebugger.actions.event_source_mapping.delete_messages')
+    @patch('qldebugger.actions.event_source_mapping.release_messages')
+    def test_run_with_prefetch(
+        self,
+        mock_release_messages: Mock,
+        mock_delete_messages: Mock,
+        mock_run_lambda: Mock,
+        mock_convert_sqs_messages_to_event: Mock,
+        mock_receive_message_batch: Mock,
+        mock_get_visibility_timeout: Mock,
+        mock_get_config: Mock,
+        mock_get_client: Mock,
+        mock_get_queue_arn: Mock,
+    ) -> None:
+        event_source_mapping_name = randstr()
+        queue_name = randstr()
+        messages1 = {'Messages': [randstr()]}
+        messages2 = {'Messages': [randstr()]}
+        stop_event = Event()
+
+        mock_get_config.return_value.event_source_mapping = {
+            event_source_mapping_name: ConfigEventSourceMapping(queue=queue_name, function_name=randstr()),
+        }
+        mock_get_visibility_timeout.return_value = 30
+        mock_receive_message_batch.side_effect = [messages1, messages2]
+        mock_run_lambda.side_effect = lambda **kwargs: stop_event.set()
+
+        poll_messages_and_run_lambda(
+            event_source_mapping_name=event_source_mapping_name, prefetch=1, stop_event=stop_event
         )
 
+        mock_get_visibility_timeout.assert_called_once_with(queue_name=queue_name)
+        assert mock_receive_message_batch.call_count == 2
+        mock_run_lambda.assert_called_once()
+        mock_delete_messages.assert_called_once_with(queue_name=queue_name, messages=messages1)
+        mock_release_messages.assert_called_once_with(queue_name=queue_name, messages=messages2)
+
+    @patch('qldebugger.actions.event_source_mapping.get_queue_arn')
+    @patch('qldebugger.actions.event_source_mapping.get_client')
+    @patch('qldebugger.actions.event_source_mapping.get_config')
+    @patch('qldebugger.actions.event_source_mapping.get_visibility_timeout')
+    @patch('qldebugger.actions.event_source_mapping.receive_message_batch')
+    @patch('qldebugger.actions.event_source_mapping.run_lambda')
+    def test_prefetch_should_skip_batches_after_visibility_timeout(
+        self,
+        mock_run_lambda: Mock,
+        mock_receive_message_batch: Mock,
+        mock_get_visibility_timeout: Mock,
+        mock_get_config: Mock,
+        mock_get_client: Mock,
+        mock_get_queue_arn: Mock,
+    ) -> None:
+        event_source_mapping_name = randstr()
+        stop_event = Event()
+
+        mock_get_config.return_value.event_source_mapping = {
+            event_source_mapping_name: ConfigEventSourceMapping(queue=randstr(), function_name=randstr()),
+        }
+        mock_get_visibility_timeout.return_value = 0
+
+        def receive_message_batch(**kwargs: Any) -> Dict[str, Any]:
+            if mock_receive_message_batch.call_count > 2:
+                stop_event.set()
+                raise RuntimeWarning
+            return {'Messages': [randstr()]}
+
+        mock_receive_message_batch.side_effect = receive_message_batch
+
+        poll_messages_and_run_lambda(
+            event_source_mapping_name=event_source_mapping_name, poll_interval=0, prefetch=1, stop_event=stop_event
+        )
+
+        mock_run_lambda.assert_not_called()
+
+
+class TestGetBatchItemFailures:
+    messages: ClassVar[Dict[str, Any]] = {'Messages': [{'MessageId': randstr()} for _ in range(3)]}
+
+    @pytest.mark.parametrize('result', [None, {}, {'batchItemFailures': []}, {'batchItemFailures': None}])
+    def test_success(self, result: Any) -> None:
+        returned = get_batch_item_failures(result=result, messages=cast(Any, self.messages))
+
+        assert returned == set()
+
+    @pytest.mark.parametrize('result', [randstr(), [], [{'itemIdentifier': randstr()}], randint(0, 10)])
+    def test_invalid_result(self, result: Any) -> None:
+        returned = get_batch_item_failures(result=result, messages=cast(Any, self.messages))
+
+        assert returned == {message['MessageId'] for message in self.messages['Messages']}
+
+    def test_failures(self) -> None:
+        message_id = self.messages['Messages'][1]['MessageId']
+
+        returned = get_batch_item_failures(
+            result={'batchItemFailures': [{'itemIdentifier': message_id}]}, messages=cast(Any, self.messages)
+        )
+
+        assert returned == {message_id}
+
+    @pytest.mark.parametrize(
+        'failures',
+        [randstr(), '', 0, [{'itemIdentifier': randstr()}], [{'itemIdentifier': None}], [{}], [randstr()]],
+    )
+    def test_invalid_failures(self, failures: Any) -> None:
+        returned = get_batch_item_failures(result={'batchItemFailures': failures}, messages=cast(Any, self.messages))
+
+        assert returned == {message['MessageId'] for message in self.messages['Messages']}
+
+
+class TestCompleteMessages:
+    @patch('qldebugger.actions.event_source_mapping.delete_messages')
+    @patch('qldebugger.actions.event_source_mapping.release_messages')
+    def test_without_report_batch_item_failures(self, mock_release_messages: Mock, mock_delete_messages: Mock) -> None:
+        queue_name = randstr()
+        messages = {'Messages': [{'MessageId': randstr()} for _ in range(randint(1, 10))]}
+
+        complete_messages(
+            event_source_mapping=ConfigEventSourceMapping(queue=queue_name, function_name=randstr()),
+            messages=cast(Any, messages),
+            result={'batchItemFailures': [{'itemIdentifier': messages['Messages'][0]['MessageId']}]},
+        )
+
+        mock_release_messages.assert_not_called()
+        mock_delete_messages.assert_called_once_with(queue_name=queue_name, messages=messages)
+
+    @patch('qldebugger.actions.event_source_mapping.delete_messages')
+    @patch('qldebugger.actions.event_source_mapping.release_messages')
+    def test_report_batch_item_failures(self, mock_release_messages: Mock, mock_delete_messages: Mock) -> None:
+        queue_name = randstr()
+        messages = {'Messages': [{'MessageId': randstr()} for _ in range(randint(2, 10))]}
+        failed = messages['Messages'][:1]
+
+        complete_messages(
+            event_source_mapping=ConfigEventSourceMapping(
+                queue=queue_name, function_name=randstr(), function_response_types=['ReportBatchItemFailures']
+            ),
+            messages=cast(Any, messages),
+            result={'batchItemFailures': [{'itemIdentifier': message['MessageId']} for message in failed]},
+        )
+
+        mock_release_messages.assert_called_once_with(queue_name=queue_name, messages={'Messages': failed})
+        mock_delete_messages.assert_called_once_with(
+            queue_name=queue_name, messages={'Messages': messages['Messages'][1:]}
+        )
+
+    @patch('qldebugger.actions.event_source_mapping.delete_messages')
+    @patch('qldebugger.actions.event_source_mapping.release_messages')
+    def test_report_batch_item_failures_in_background(
+        self, mock_release_messages: Mock, mock_delete_messages: Mock
+    ) -> None:
+        queue_name = randstr()
+        messages = {'Messages': [{'MessageId': randstr()} for _ in range(randint(1, 10))]}
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            complete_messages(
+                event_source_mapping=ConfigEventSourceMapping(
+                    queue=queue_name, function_name=randstr(), function_response_types=['ReportBatchItemFailures']
+                ),
+                messages=cast(Any, messages),
+                result={'batchItemFailures': [{'itemIdentifier': randstr()}]},
+                executor=executor,
+            )
+
+        mock_release_messages.assert_called_once_with(queue_name=queue_name, messages=messages)
+        mock_delete_messages.assert_not_called()
+
+
+@patch('qldebugger.actions.event_source_mapping._idle_event_source_mappings', set())
+class TestReceiveMessages:
+    def test_warn_once_per_idle_period(self, caplog: pytest.LogCaptureFixture) -> None:
+        event_source_mapping_name = randstr()
+        messages = {'Messages': [randstr()]}
+        receive = Mock(side_effect=[RuntimeWarning, RuntimeWarning, messages, RuntimeWarning, RuntimeWarning])
+        warnings = []
+
+        for _ in range(5):
+            with suppress(RuntimeWarning):
+                receive_messages(receive, event_source_mapping_name=event_source_mapping_name)
+            warnings.append(caplog.text.count('No messages received'))
+
+        assert warnings == [1, 1, 1, 2, 2]
+
+
+class TestGetHeartbeatVisibilityTimeout:
+    @patch('qldebugger.actions.event_source_mapping.get_visibility_timeout')
+    def test_without_heartbeat(self, mock_get_visibility_timeout: Mock) -> None:
+        event_source_mapping = ConfigEventSourceMapping(queue=randstr(), function_name=randstr())
+
+        returned = get_heartbeat_visibility_timeout(event_source_mapping=event_source_mapping)
+
+        assert returned is None
+        mock_get_visibility_timeout.assert_not_called()
+
+    @pytest.mark.parametrize(('visibility_timeout', 'expected'), [(30, 30), (5, 20)])
+    @patch('qldebugger.actions.event_source_mapping.get_visibility_timeout')
+    def test_with_heartbeat(self, mock_get_visibility_timeout: Mock, visibility_timeout: int, expected: int) -> None:
+        queue_name = randstr()
+        event_source_mapping = ConfigEventSourceMapping(
+            queue=queue_name, function_name=randstr(), visibility_heartbeat_interval=10
+        )
+
+        mock_get_visibility_timeout.return_value = visibility_timeout
+
+        returned = get_heartbeat_visibility_timeout(event_source_mapping=event_source_mapping)
+
+        assert returned == expected
+        mock_get_visibility_timeout.assert_called_once_with(queue_name=queue_name)
+
+
+class TestStartVisibilityHeartbeat:
+    @patch('qldebugger.actions.event_source_mapping.Event')
+    @patch('qldebugger.actions.event_source_mapping.change_messages_visibility')
+    def test_run(self, mock_change_messages_visibility: Mock, mock_event: Mock) -> None:
+        queue_name = randstr()
+        interval = randint(1, 10)
+        visibility_timeout = randint(20, 60)
+        messages = {'Messages': [randstr()]}
+
+        mock_event.return_value.wait.side_effect = [False, False, True]
+        mock_change_messages_visibility.side_effect = [Exception(randstr()), None]
+
+        stop = start_visibility_heartbeat(
+            event_source_mapping=ConfigEventSourceMapping(
+                queue=queue_name, function_name=randstr(), visibility_heartbeat_interval=interval
+            ),
+            messages=cast(Any, messages),
+            visibility_timeout=visibility_timeout,
+        )
+        stop()
+
+        mock_event.return_value.set.assert_called_once_with()
+        mock_event.return_value.wait.assert_called_with(interval)
+        assert (
+            mock_change_messages_visibility.call_args_list
+            == [
+                call(queue_name=queue_name, messages=messages, visibility_timeout=visibility_timeout),
+            ]
+            * 2
+        )
+
+    @patch('qldebugger.actions.event_source_mapping.Thread')
+    def test_without_heartbeat(self, mock_thread: Mock) -> None:
+        stop = start_visibility_heartbeat(
+            event_source_mapping=ConfigEventSourceMapping(queue=randstr(), function_name=randstr()),
+            messages=cast(Any, {'Messages': [randstr()]}),
+            visibility_timeout=None,
+        )
+        stop()
+
+        mock_thread.assert_not_called()
+
+
+class TestRunEventSourceMappings:
+    @patch('qldebugger.actions.event_source_mapping.get_account_id')
+    @patch('qldebugger.actions.event_source_mapping.get_client')
+    @patch('qldebugger.actions.event_source_mapping.receive_messages_and_run_lambda')
+    def test_run_once(
+        self,
+        mock_receive_messages_and_run_lambda: Mock,
+        mock_get_client: Mock,
+        mock_get_account_id: Mock,
+    ) -> None:
+        event_source_mapping_names = [randstr() for _ in range(randint(3, 6))]
+        errors = {
+            event_source_mapping_names[0]: RuntimeWarning('No messages received'),
+            event_source_mapping_names[1]: Exception(randstr()),
+        }
+
+        def receive_messages_and_run_lambda(*, event_source_mapping_name: str) -> None:
+            if event_source_mapping_name in errors:
+                raise errors[event_source_mapping_name]
+
+        mock_receive_messages_and_run_lambda.side_effect = receive_messages_and_run_lambda
+
+        with pytest.raises(EventSourceMappingsError) as exc_info:
+            run_event_source_mappings(event_source_mapping_names=event_source_mapping_names, workers=2)
+
+        assert exc_info.value.event_source_mapping_names == [event_source_mapping_names[1]]
+        mock_get_client.assert_called_once_with('sqs')
+        mock_get_account_id.assert_called_once_with()
+        assert mock_receive_messages_and_run_lambda.call_count == len(event_source_mapping_names)
+        for event_source_mapping_name in event_source_mapping_names:
+            mock_receive_messages_and_run_lambda.assert_any_call(event_source_mapping_name=event_source_mapping_name)
+
+    @patch('qldebugger.actions.event_source_mapping.get_account_id')
+    @patch('qldebugger.actions.event_source_mapping.get_client')
+    @patch('qldebugger.actions.event_source_mapping.poll_messages_and_run_lambda')
+    def test_follow(
+        self,
+        mock_poll_messages_and_run_lambda: Mock,
+        mock_get_client: Mock,
+        mock_get_account_id: Mock,
+    ) -> None:
+        event_source_mapping_names = [randstr() for _ in range(randint(2, 5))]
+        poll_interval = randint(1, 10)
+        prefetch = randint(1, 3)
+
+        run_event_source_mappings(
+            event_source_mapping_names=event_source_mapping_names,
+            follow=True,
+            poll_interval=poll_interval,
+            prefetch=prefetch,
+        )
+
+        assert mock_poll_messages_and_run_lambda.call_count == len(event_source_mapping_names)
+        for event_source_mapping_name in event_source_mapping_names:
+            mock_poll_messages_and_run_lambda.assert_any_call(
+                event_source_mapping_name=event_source_mapping_name,
+                poll_interval=poll_interval,
+                processes=0,
+                prefetch=prefetch,
+                stop_event=ANY,
+            )
+
+
+class TestPollMessagesAndRunLambdaAsync:
+    @patch('qldebugger.actions.event_source_mapping.get_queue_arn')
+    @patch('qldebugger.actions.event_source_mapping.get_client')
+    @patch('qldebugger.actions.event_source_mapping.get_config')
+    @patch('qldebugger.actions.event_source_mapping.receive_message_batch')
+    @patch('qldebugger.actions.event_source_mapping.convert_sqs_messages_to_event')
+    @patch('qldebugger.actions.event_source_mapping.run_lambda')
+    @patch('qldebugger.actions.event_source_mapping.delete_messages')
+    def test_run_until_stopped(
+        self,
+        mock_delete_messages: Mock,
+        mock_run_lambda: Mock,
+        mock_convert_sqs_messages_to_event: Mock,
+        mock_receive_message_batch: Mock,
+        mock_get_config: Mock,
+        mock_get_client: Mock,
+        mock_get_queue_arn: Mock,
+    ) -> None:
+        event_source_mapping_name = randstr()
+        queue_name = randstr()
+        lambda_name = randstr()
+        messages1 = {'Messages': [randstr()]}
+        messages2 = {'Messages': [randstr()]}
+
+        mock_get_config.return_value.event_source_mapping = {
+            event_source_mapping_name: ConfigEventSourceMapping(queue=queue_name, function_name=lambda_name),
+        }
+
+        async def run() -> None:
+            loop = asyncio.get_running_loop()
+            stop_event = asyncio.Event()
+
+            responses: List[Any] = [messages1, RuntimeWarning, messages2]
+
+            def receive_message_batch(**kwargs: Any) -> Dict[str, Any]:
+                if not responses:
+                    loop.call_soon_threadsafe(stop_event.set)
+                    raise RuntimeWarning
+                response = responses.pop(0)
+                if response is RuntimeWarning:
+                    raise RuntimeWarning
+                return cast(Dict[str, Any], response)
+
+            mock_receive_message_batch.side_effect = receive_message_batch
+            with ThreadPoolExecutor(max_workers=2) as executor, ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix='lambda'
+            ) as lambda_executor, ThreadPoolExecutor(max_workers=1, thread_name_prefix='delete') as delete_executor:
+                await poll_messages_and_run_lambda_async(
+                    event_source_mapping_name=event_source_mapping_name,
+                    executor=executor,
+                    stop_event=stop_event,
+                    poll_interval=0,
+                    lambda_executor=lambda_executor,
+                    delete_executor=delete_executor,
+                )
+
+        lambda_threads = []
+        run_lambda_side_effect = iter([None, Exception(randstr())])
+
+        def run_lambda(**kwargs: Any) -> None:
+            lambda_threads.append(current_thread().name)
+            if (error := next(run_lambda_side_effect)) is not None:
+                raise error
+
+        mock_run_lambda.side_effect = run_lambda
+        delete_threads = []
+        mock_delete_messages.side_effect = lambda **kwargs: delete_threads.append(current_thread().name)
+
+        asyncio.run(run())
+
+        assert mock_receive_message_batch.call_count == 4
+        assert mock_run_lambda.call_count == 2
+        assert all(name.startswith('lambda') for name in lambda_threads)
+        assert len(delete_threads) == 1
+        assert delete_threads[0].startswith('delete')
+        mock_delete_messages.assert_called_once_with(queue_name=queue_name, messages=messages1)
+
+    @patch('qldebugger.actions.event_source_mapping.get_queue_arn')
+    @patch('qldebugger.actions.event_source_mapping.get_client')
+    @patch('qldebugger.actions.event_source_mapping.get_config')
+    @patch('qldebugger.actions.event_source_mapping.receive_message_batch')
+    def test_without_follow_and_without_messages(
+        self,
+        mock_receive_message_batch: Mock,
+        mock_get_config: Mock,
+        mock_get_client: Mock,
+        mock_get_queue_arn: Mock,
+    ) -> None:
+        event_source_mapping_name = randstr()
+
+        mock_get_config.return_value.event_source_mapping = {
+            event_source_mapping_name: ConfigEventSourceMapping(queue=randstr(), function_name=randstr()),
+        }
+        mock_receive_message_batch.side_effect = RuntimeWarning
+
+        async def run() -> None:
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                await poll_messages_and_run_lambda_async(
+                    event_source_mapping_name=event_source_mapping_name,
+                    executor=executor,
+                    stop_event=asyncio.Event(),
+                    follow=False,
+                )
+
+        asyncio.run(run())
+
+        mock_receive_message_batch.assert_called_once()
+
+    @patch('qldebugger.actions.event_source_mapping.get_queue_arn')
+    @patch('qldebugger.actions.event_source_mapping.get_client')
+    @patch('qldebugger.actions.event_source_mapping.get_config')
+    @patch('qldebugger.actions.event_source_mapping.receive_message_batch')
+    @patch('qldebugger.actions.event_source_mapping.convert_sqs_messages_to_event')
+    @patch('qldebugger.actions.event_source_mapping.run_lambda')
+    @patch('qldebugger.actions.event_source_mapping.delete_messages')
+    def test_without_follow_and_with_lambda_error(
+        self,
+        mock_delete_messages: Mock,
+        mock_run_lambda: Mock,
+        mock_convert_sqs_messages_to_event: Mock,
+        mock_receive_message_batch: Mock,
+        mock_get_config: Mock,
+        mock_get_client: Mock,
+        mock_get_queue_arn: Mock,
+    ) -> None:
+        event_source_mapping_name = randstr()
+        error = Exception(randstr())
+
+        mock_get_config.return_value.event_source_mapping = {
+            event_source_mapping_name: ConfigEventSourceMapping(queue=randstr(), function_name=randstr()),
+        }
+        mock_receive_message_batch.return_value = {'Messages': [randstr()]}
+        mock_run_lambda.side_effect = error
+
+        async def run() -> None:
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                await poll_messages_and_run_lambda_async(
+                    event_source_mapping_name=event_source_mapping_name,
+                    executor=executor,
+                    stop_event=asyncio.Event(),
+                    follow=False,
+                )
+
+        with pytest.raises(Exception, match=error.args[0]):
+            asyncio.run(run())
+
+        mock_delete_messages.assert_not_called()
+
+
+class TestRunEventSourceMappingsAsync:
+    @patch('qldebugger.actions.event_source_mapping.get_account_id')
+    @patch('qldebugger.actions.event_source_mapping.get_client')
+    @patch('qldebugger.actions.event_source_mapping.get_config')
+    @patch('qldebugger.actions.event_source_mapping.poll_messages_and_run_lambda_async')
+    def test_run(
+        self,
+        mock_poll_messages_and_run_lambda_async: Mock,
+        mock_get_config: Mock,
+        mock_get_client: Mock,
+        mock_get_account_id: Mock,
+    ) -> None:
+        event_source_mapping_names = [randstr() for _ in range(randint(2, 5))]
+        poll_interval = randint(1, 10)
+        called = []
+
+        mock_get_config.return_value.event_source_mapping = {
+            event_source_mapping_name: ConfigEventSourceMapping(queue=randstr(), function_name=randstr())
+            for event_source_mapping_name in event_source_mapping_names
+        }
+
+        async def poll_messages_and_run_lambda_async(*, event_source_mapping_name: str, **kwargs: Any) -> None:
+            called.append(event_source_mapping_name)
+            if len(called) == 1:
+                raise ValueError(randstr())
+
+        mock_poll_messages_and_run_lambda_async.side_effect = poll_messages_and_run_lambda_async
+
+        with pytest.raises(EventSourceMappingsError) as exc_info:
+            run_event_source_mappings_async(
+                event_source_mapping_names=event_source_mapping_names, follow=True, poll_interval=poll_interval
+            )
+
+        assert exc_info.value.event_source_mapping_names == [event_source_mapping_names[0]]
+
+        mock_get_client.assert_called_once_with('sqs')
+        mock_get_account_id.assert_called_once_with()
+        assert called == event_source_mapping_names
+        for event_source_mapping_name in event_source_mapping_names:
+            mock_poll_messages_and_run_lambda_async.assert_any_call(
+                event_source_mapping_name=event_source_mapping_name,
+                executor=ANY,
+                stop_event=ANY,
+                follow=True,
+                poll_interval=poll_interval,
+                processes=0,
+                lambda_executor=ANY,
+                delete_executor=ANY,
+            )
+
+    @patch('qldebugger.actions.event_source_mapping.get_account_id')
+    @patch('qldebugger.actions.event_source_mapping.get_client')
+    @patch('qldebugger.actions.event_source_mapping.get_config')
+    @patch('qldebugger.actions.event_source_mapping.poll_messages_and_run_lambda_async')
+    def test_warn_when_long_polling_can_hold_all_workers(
+        self,
+        mock_poll_messages_and_run_lambda_async: Mock,
+        mock_get_config: Mock,
+        mock_get_client: Mock,
+        mock_get_account_id: Mock,
+        caplog: pytest.LogCaptureFixture,
+    ) -> None:
+        event_source_mapping_names = [randstr() for _ in range(randint(2, 5))]
+
+        mock_get_config.return_value.event_source_mapping = {
+            event_source_mapping_name: ConfigEventSourceMapping(
+                queue=randstr(), function_name=randstr(), maximum_batching_window=randint(1, 20)
+            )
+            for event_source_mapping_name in event_source_mapping_names
+        }
+
+        run_event_source_mappings_async(
+            event_source_mapping_names=event_source_mapping_names, workers=len(event_source_mapping_names)
+        )
+
+        assert f'{len(event_source_mapping_names)} event source mappings wait for messages' in caplog.text
+
 
 class TestConvertSqsMessagesToEvent:
     def test_run(self) -> None:
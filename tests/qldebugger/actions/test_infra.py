@@ -1,12 +1,17 @@
+import hmac
 import json
 from collections import OrderedDict
+from hashlib import sha256
 from random import randint
-from typing import Dict
-from unittest.mock import Mock, call, patch
+from typing import Any, Dict, List
+from unittest.mock import ANY, Mock, call, patch
 
+import boto3
+import pytest
 from botocore.exceptions import ClientError
+from moto import mock_aws
 
-from qldebugger.actions.infra import create_queues, create_secrets, create_topics, subscribe_topics
+from qldebugger.actions.infra import create_all, create_queues, create_secrets, create_topics, subscribe_topics
 from qldebugger.config.file_parser import (
     ConfigQueue,
     ConfigQueueRedrivePolicy,
@@ -17,6 +22,12 @@ from qldebugger.config.file_parser import (
 )
 from tests.utils import randstr
 
+SECRET_HASH_KEY = b'k' * 32
+
+
+def string_hash(value: str) -> str:
+    return hmac.new(SECRET_HASH_KEY, b'string:' + value.encode(), sha256).hexdigest()
+
 
 class TestCreateSecrets:
     @patch('qldebugger.actions.infra.get_client')
@@ -89,6 +100,73 @@ class TestCreateSecrets:
             mock_get_client.return_value.put_secret_value.assert_any_call(SecretId=name, SecretBinary=value)
         mock_get_client.return_value.create_secret.assert_not_called()
 
+    @patch('qldebugger.actions.infra.load_binary_cache', Mock(return_value=SECRET_HASH_KEY))
+    @patch('qldebugger.actions.infra.get_client')
+    @patch('qldebugger.actions.infra.get_config')
+    def test_reconcile_secrets(self, mock_get_config: Mock, mock_get_client: Mock) -> None:
+        new_name, new_value = randstr(), randstr()
+        unchanged_name, unchanged_value = randstr(), randstr()
+        changed_name, changed_value = randstr(), randstr().encode()
+
+        def tags(secret_hash: str) -> List[Dict[str, str]]:
+            return [{'Key': randstr(), 'Value': randstr()}, {'Key': 'qldebugger:hash', 'Value': secret_hash}]
+
+        mock_get_config.return_value.secrets = {
+            new_name: ConfigSecretString(string=new_value),
+            unchanged_name: ConfigSecretString(string=unchanged_value),
+            changed_name: ConfigSecretBinary(binary=changed_value),
+        }
+        mock_get_client.return_value.get_paginator.return_value.paginate.return_value = [
+            {'SecretList': [{'Name': unchanged_name, 'Tags': tags(string_hash(unchanged_value))}]},
+            {'SecretList': [{'Name': changed_name, 'Tags': tags(randstr())}, {'Name': randstr()}]},
+        ]
+
+        create_secrets(reconcile=True)
+
+        mock_get_client.return_value.get_paginator.assert_called_once_with('list_secrets')
+        mock_get_client.return_value.describe_secret.assert_not_called()
+        mock_get_client.return_value.create_secret.assert_called_once_with(
+            Name=new_name,
+            SecretString=new_value,
+            Tags=[{'Key': 'qldebugger:hash', 'Value': string_hash(new_value)}],
+        )
+        mock_get_client.return_value.put_secret_value.assert_called_once_with(
+            SecretId=changed_name, SecretBinary=changed_value
+        )
+        mock_get_client.return_value.tag_resource.assert_called_once_with(
+            SecretId=changed_name,
+            Tags=[
+                {
+                    'Key': 'qldebugger:hash',
+                    'Value': hmac.new(SECRET_HASH_KEY, b'binary:' + changed_value, sha256).hexdigest(),
+                }
+            ],
+        )
+
+    @patch('qldebugger.actions.infra.save_binary_cache')
+    @patch('qldebugger.actions.infra.load_binary_cache')
+    @patch('qldebugger.actions.infra.get_client')
+    @patch('qldebugger.actions.infra.get_config')
+    def test_reconcile_secrets_with_new_hash_key(
+        self, mock_get_config: Mock, mock_get_client: Mock, mock_load_binary_cache: Mock, mock_save_binary_cache: Mock
+    ) -> None:
+        name, value = randstr(), randstr()
+
+        mock_get_config.return_value.secrets = {name: ConfigSecretString(string=value)}
+        mock_get_client.return_value.get_paginator.return_value.paginate.return_value = [{'SecretList': []}]
+        mock_load_binary_cache.return_value = None
+
+        create_secrets(reconcile=True)
+
+        mock_save_binary_cache.assert_called_once_with('secret-hash-key', ANY)
+        key = mock_save_binary_cache.call_args.args[1]
+        assert len(key) == 32
+        mock_get_client.return_value.create_secret.assert_called_once_with(
+            Name=name,
+            SecretString=value,
+            Tags=[{'Key': 'qldebugger:hash', 'Value': hmac.new(key, b'string:' + value.encode(), sha256).hexdigest()}],
+        )
+
 
 class TestCreateTopics:
     @patch('qldebugger.actions.infra.get_client')
@@ -105,6 +183,23 @@ class TestCreateTopics:
         for topic_name in topics_names:
             mock_get_client.return_value.create_topic.assert_any_call(Name=topic_name)
 
+    @patch('qldebugger.actions.infra.get_client')
+    @patch('qldebugger.actions.infra.get_config')
+    def test_reconcile(self, mock_get_config: Mock, mock_get_client: Mock) -> None:
+        existing_topic_name = randstr()
+        new_topic_name = randstr()
+
+        mock_get_config.return_value.topics = {existing_topic_name: ConfigTopic(), new_topic_name: ConfigTopic()}
+        mock_get_client.return_value.get_paginator.return_value.paginate.return_value = [
+            {'Topics': [{'TopicArn': f'arn:aws:sns:us-east-1:123456789012:{existing_topic_name}'}]},
+            {'Topics': [{'TopicArn': f'arn:aws:sns:us-east-1:123456789012:{randstr()}'}]},
+        ]
+
+        create_topics(reconcile=True)
+
+        mock_get_client.return_value.get_paginator.assert_called_once_with('list_topics')
+        mock_get_client.return_value.create_topic.assert_called_once_with(Name=new_topic_name)
+
 
 class TestCreateQueues:
     @patch('qldebugger.actions.infra.get_client')
@@ -283,14 +378,170 @@ class TestCreateQueues:
             },
         )
 
+    @patch('qldebugger.actions.infra.get_client')
+    @patch('qldebugger.actions.infra.get_config')
+    def test_create_queues_by_level(self, mock_get_config: Mock, mock_get_client: Mock) -> None:
+        dead_letter_queues = [randstr() for _ in range(randint(2, 5))]
+        queues_names = [randstr() for _ in dead_letter_queues]
+
+        mock_get_config.return_value.queues = {
+            queue_name: ConfigQueue(
+                redrive_policy=ConfigQueueRedrivePolicy(dead_letter_queue=dead_letter_queue, max_receive_count=1)
+            )
+            for queue_name, dead_letter_queue in zip(queues_names, dead_letter_queues)
+        }
+        mock_get_client.return_value.get_queue_url.side_effect = ClientError({}, '')
+        mock_get_client.return_value.get_queue_attributes.side_effect = lambda QueueUrl, AttributeNames: {  # noqa: N803
+            'Attributes': {'QueueArn': f'arn:aws:sqs:us-east-1:123456789012:{QueueUrl}'}
+        }
+
+        create_queues(workers=randint(1, 4))
+
+        created = [c.kwargs['QueueName'] for c in mock_get_client.return_value.create_queue.call_args_list]
+        assert sorted(created[: len(dead_letter_queues)]) == sorted(dead_letter_queues)
+        assert sorted(created[len(dead_letter_queues) :]) == sorted(queues_names)
+
+    @patch('qldebugger.actions.infra.get_queue_arn')
+    @patch('qldebugger.actions.infra.get_client')
+    @patch('qldebugger.actions.infra.get_config')
+    def test_reconcile(self, mock_get_config: Mock, mock_get_client: Mock, mock_get_queue_arn: Mock) -> None:
+        host = randstr()
+        dead_letter_queue = randstr()
+        new_queue_name = randstr()
+        unchanged_queue_name = randstr()
+        changed_queue_name = randstr()
+        removed_policy_queue_name = randstr()
+        max_receive_count = randint(1, 10)
+
+        def get_queue_attributes(*, QueueUrl: str, AttributeNames: List[str]) -> Dict[str, Any]:  # noqa: N803
+            if QueueUrl.endswith(dead_letter_queue):
+                return {'Attributes': {}}
+            count = max_receive_count if QueueUrl.endswith(unchanged_queue_name) else max_receive_count + 1
+            return {
+                'Attributes': {
+                    'RedrivePolicy': json.dumps(
+                        {'deadLetterTargetArn': f'arn:{dead_letter_queue}', 'maxReceiveCount': str(count)}
+                    ),
+                },
+            }
+
+        redrive_policy = ConfigQueueRedrivePolicy(
+            dead_letter_queue=dead_letter_queue, max_receive_count=max_receive_count
+        )
+        mock_get_config.return_value.queues = {
+            dead_letter_queue: ConfigQueue(),
+            new_queue_name: ConfigQueue(),
+            unchanged_queue_name: ConfigQueue(redrive_policy=redrive_policy),
+            changed_queue_name: ConfigQueue(redrive_policy=redrive_policy),
+            removed_policy_queue_name: ConfigQueue(),
+        }
+        mock_get_queue_arn.side_effect = lambda name: f'arn:{name}'
+        mock_get_client.return_value.get_paginator.return_value.paginate.return_value = [
+            {'QueueUrls': [f'http://{host}/{dead_letter_queue}', f'http://{host}/{unchanged_queue_name}']},
+            {'QueueUrls': [f'http://{host}/{changed_queue_name}', f'http://{host}/{removed_policy_queue_name}']},
+        ]
+        mock_get_client.return_value.get_queue_attributes.side_effect = get_queue_attributes
+
+        create_queues(reconcile=True)
+
+        mock_get_client.return_value.get_paginator.assert_called_once_with('list_queues')
+        mock_get_client.return_value.get_paginator.return_value.paginate.assert_called_once_with(
+            PaginationConfig={'PageSize': 1000}
+        )
+        mock_get_client.return_value.get_queue_url.assert_not_called()
+        mock_get_client.return_value.create_queue.assert_called_once_with(QueueName=new_queue_name, Attributes={})
+        assert sorted(
+            mock_get_client.return_value.set_queue_attributes.call_args_list, key=lambda c: c.kwargs['QueueUrl']
+        ) == sorted(
+            [
+                call(
+                    QueueUrl=f'http://{host}/{changed_queue_name}',
+                    Attributes={
+                        'RedrivePolicy': json.dumps(
+                            {'deadLetterTargetArn': f'arn:{dead_letter_queue}', 'maxReceiveCount': max_receive_count}
+                        )
+                    },
+                ),
+                call(QueueUrl=f'http://{host}/{removed_policy_queue_name}', Attributes={'RedrivePolicy': ''}),
+            ],
+            key=lambda c: c.kwargs['QueueUrl'],
+        )
+
+    @mock_aws
+    @patch('qldebugger.actions.infra.get_client')
+    @patch('qldebugger.actions.infra.get_config')
+    def test_reconcile_more_than_one_page_of_queues(self, mock_get_config: Mock, mock_get_client: Mock) -> None:
+        sqs = boto3.client('sqs', region_name='us-east-1')
+        queues_names = [f'queue-{i:04d}' for i in range(1005)]
+        for queue_name in queues_names:
+            sqs.create_queue(QueueName=queue_name)
+
+        mock_get_config.return_value.queues = {queue_name: ConfigQueue() for queue_name in queues_names}
+        mock_get_client.return_value = Mock(wraps=sqs)
+
+        create_queues(reconcile=True)
+
+        mock_get_client.return_value.create_queue.assert_not_called()
+        mock_get_client.return_value.set_queue_attributes.assert_not_called()
+
+
+class TestCreateAll:
+    @patch('qldebugger.actions.infra.create_secrets')
+    @patch('qldebugger.actions.infra.create_topics')
+    @patch('qldebugger.actions.infra.create_queues')
+    @patch('qldebugger.actions.infra.subscribe_topics')
+    def test_run(
+        self,
+        mock_subscribe_topics: Mock,
+        mock_create_queues: Mock,
+        mock_create_topics: Mock,
+        mock_create_secrets: Mock,
+    ) -> None:
+        workers = randint(1, 10)
+        called = []
+
+        mock_create_queues.side_effect = lambda **kwargs: called.append('queues')
+        mock_create_topics.side_effect = lambda **kwargs: called.append('topics')
+        mock_subscribe_topics.side_effect = lambda **kwargs: called.append('subscriptions')
+
+        create_all(workers=workers)
+
+        mock_create_secrets.assert_called_once_with(workers=workers, reconcile=False)
+        mock_create_topics.assert_called_once_with(workers=workers, reconcile=False)
+        mock_create_queues.assert_called_once_with(workers=workers, reconcile=False)
+        mock_subscribe_topics.assert_called_once_with(workers=workers)
+        assert called[-1] == 'subscriptions'
+
+    @patch('qldebugger.actions.infra.create_secrets')
+    @patch('qldebugger.actions.infra.create_topics')
+    @patch('qldebugger.actions.infra.create_queues')
+    @patch('qldebugger.actions.infra.subscribe_topics')
+    def test_error_should_skip_subscriptions(
+        self,
+        mock_subscribe_topics: Mock,
+        mock_create_queues: Mock,
+        mock_create_topics: Mock,
+        mock_create_secrets: Mock,
+    ) -> None:
+        mock_create_queues.side_effect = ClientError({}, '')
+
+        with pytest.raises(ClientError):
+            create_all()
+
+        mock_create_secrets.assert_called_once()
+        mock_create_topics.assert_called_once()
+        mock_subscribe_topics.assert_not_called()
+
 
 class TestSubscribeTopics:
     @patch('qldebugger.actions.infra.get_client')
     @patch('qldebugger.actions.infra.get_config')
-    @patch('qldebugger.actions.infra.get_account_id')
+    @patch('qldebugger.actions.infra.get_topic_arn')
+    @patch('qldebugger.actions.infra.get_queue_arn')
     def test_topics_without_subscribers(
         self,
-        mock_get_account_id: Mock,
+        mock_get_queue_arn: Mock,
+        mock_get_topic_arn: Mock,
         mock_get_config: Mock,
         mock_get_client: Mock,
     ) -> None:
@@ -305,10 +556,12 @@ class TestSubscribeTopics:
 
     @patch('qldebugger.actions.infra.get_client')
     @patch('qldebugger.actions.infra.get_config')
-    @patch('qldebugger.actions.infra.get_account_id')
+    @patch('qldebugger.actions.infra.get_topic_arn')
+    @patch('qldebugger.actions.infra.get_queue_arn')
     def test_topics_with_one_subscriber(
         self,
-        mock_get_account_id: Mock,
+        mock_get_queue_arn: Mock,
+        mock_get_topic_arn: Mock,
         mock_get_config: Mock,
         mock_get_client: Mock,
     ) -> None:
@@ -316,12 +569,12 @@ class TestSubscribeTopics:
         region = randstr()
         topics_queues_names = [(randstr(), randstr()) for _ in range(randint(2, 5))]
 
-        mock_get_account_id.return_value = account_id
+        mock_get_topic_arn.side_effect = lambda name: f'arn:aws:sns:{region}:{account_id}:{name}'
+        mock_get_queue_arn.side_effect = lambda name: f'arn:aws:sqs:{region}:{account_id}:{name}'
         mock_get_config.return_value.topics = {
             topic_name: ConfigTopic(subscribers=[ConfigTopicSubscriber(queue=queue_name)])
             for topic_name, queue_name in topics_queues_names
         }
-        mock_get_client.return_value.meta.region_name = region
 
         subscribe_topics()
 
@@ -337,10 +590,12 @@ class TestSubscribeTopics:
 
     @patch('qldebugger.actions.infra.get_client')
     @patch('qldebugger.actions.infra.get_config')
-    @patch('qldebugger.actions.infra.get_account_id')
+    @patch('qldebugger.actions.infra.get_topic_arn')
+    @patch('qldebugger.actions.infra.get_queue_arn')
     def test_topic_with_multiple_subscribers(
         self,
-        mock_get_account_id: Mock,
+        mock_get_queue_arn: Mock,
+        mock_get_topic_arn: Mock,
         mock_get_config: Mock,
         mock_get_client: Mock,
     ) -> None:
@@ -349,13 +604,13 @@ class TestSubscribeTopics:
         topic_name = randstr()
         queues_names = [randstr() for _ in range(randint(2, 5))]
 
-        mock_get_account_id.return_value = account_id
+        mock_get_topic_arn.side_effect = lambda name: f'arn:aws:sns:{region}:{account_id}:{name}'
+        mock_get_queue_arn.side_effect = lambda name: f'arn:aws:sqs:{region}:{account_id}:{name}'
         mock_get_config.return_value.topics = {
             topic_name: ConfigTopic(
                 subscribers=[ConfigTopicSubscriber(queue=queue_name) for queue_name in queues_names],
             ),
         }
-        mock_get_client.return_value.meta.region_name = region
 
         subscribe_topics()
 
@@ -371,10 +626,12 @@ class TestSubscribeTopics:
 
     @patch('qldebugger.actions.infra.get_client')
     @patch('qldebugger.actions.infra.get_config')
-    @patch('qldebugger.actions.infra.get_account_id')
+    @patch('qldebugger.actions.infra.get_topic_arn')
+    @patch('qldebugger.actions.infra.get_queue_arn')
     def test_raw_subscriber(
         self,
-        mock_get_account_id: Mock,
+        mock_get_queue_arn: Mock,
+        mock_get_topic_arn: Mock,
         mock_get_config: Mock,
         mock_get_client: Mock,
     ) -> None:
@@ -383,13 +640,13 @@ class TestSubscribeTopics:
         topic_name = randstr()
         queue_name = randstr()
 
-        mock_get_account_id.return_value = account_id
+        mock_get_topic_arn.side_effect = lambda name: f'arn:aws:sns:{region}:{account_id}:{name}'
+        mock_get_queue_arn.side_effect = lambda name: f'arn:aws:sqs:{region}:{account_id}:{name}'
         mock_get_config.return_value.topics = {
             topic_name: ConfigTopic(
                 subscribers=[ConfigTopicSubscriber(queue=queue_name, raw_message_delivery=True)],
             ),
         }
-        mock_get_client.return_value.meta.region_name = region
 
         subscribe_topics()
 
@@ -403,10 +660,12 @@ class TestSubscribeTopics:
 
     @patch('qldebugger.actions.infra.get_client')
     @patch('qldebugger.actions.infra.get_config')
-    @patch('qldebugger.actions.infra.get_account_id')
+    @patch('qldebugger.actions.infra.get_topic_arn')
+    @patch('qldebugger.actions.infra.get_queue_arn')
     def test_subscriber_with_filter_policy(
         self,
-        mock_get_account_id: Mock,
+        mock_get_queue_arn: Mock,
+        mock_get_topic_arn: Mock,
         mock_get_config: Mock,
         mock_get_client: Mock,
     ) -> None:
@@ -416,13 +675,13 @@ class TestSubscribeTopics:
         queue_name = randstr()
         filter_policy = randstr()
 
-        mock_get_account_id.return_value = account_id
+        mock_get_topic_arn.side_effect = lambda name: f'arn:aws:sns:{region}:{account_id}:{name}'
+        mock_get_queue_arn.side_effect = lambda name: f'arn:aws:sqs:{region}:{account_id}:{name}'
         mock_get_config.return_value.topics = {
             topic_name: ConfigTopic(
                 subscribers=[ConfigTopicSubscriber(queue=queue_name, filter_policy=filter_policy)],
             ),
         }
-        mock_get_client.return_value.meta.region_name = region
 
         subscribe_topics()
 
@@ -436,24 +695,115 @@ class TestSubscribeTopics:
 
     @patch('qldebugger.actions.infra.get_client')
     @patch('qldebugger.actions.infra.get_config')
-    @patch('qldebugger.actions.infra.get_account_id')
+    @patch('qldebugger.actions.infra.get_topic_arn')
+    @patch('qldebugger.actions.infra.get_queue_arn')
     def test_remove_old_subscribers(
         self,
-        mock_get_account_id: Mock,
+        mock_get_queue_arn: Mock,
+        mock_get_topic_arn: Mock,
         mock_get_config: Mock,
         mock_get_client: Mock,
     ) -> None:
         subscriptions = [randstr() for _ in range(randint(2, 5))]
 
-        mock_get_client.return_value.list_subscriptions.return_value = {
-            'Subscriptions': [
-                {'SubscriptionArn': subscription, 'Endpoint': randstr()} for subscription in subscriptions
-            ]
-        }
+        mock_get_client.return_value.get_paginator.return_value.paginate.return_value = [
+            {
+                'Subscriptions': [
+                    {'SubscriptionArn': subscription, 'TopicArn': randstr(), 'Endpoint': randstr()}
+                    for subscription in subscriptions[:1]
+                ],
+            },
+            {
+                'Subscriptions': [
+                    {'SubscriptionArn': subscription, 'TopicArn': randstr(), 'Endpoint': randstr()}
+                    for subscription in subscriptions[1:]
+                ]
+                + [{'SubscriptionArn': 'PendingConfirmation', 'TopicArn': randstr(), 'Endpoint': randstr()}],
+            },
+        ]
 
         subscribe_topics()
 
         mock_get_client.assert_called_once_with('sns')
+        mock_get_client.return_value.get_paginator.assert_called_once_with('list_subscriptions')
         assert mock_get_client.return_value.unsubscribe.call_count == len(subscriptions)
         for subscription in subscriptions:
             mock_get_client.return_value.unsubscribe.assert_any_call(SubscriptionArn=subscription)
+
+    @patch('qldebugger.actions.infra.get_client')
+    @patch('qldebugger.actions.infra.get_config')
+    @patch('qldebugger.actions.infra.get_topic_arn')
+    @patch('qldebugger.actions.infra.get_queue_arn')
+    def test_keep_existing_subscribers(
+        self,
+        mock_get_queue_arn: Mock,
+        mock_get_topic_arn: Mock,
+        mock_get_config: Mock,
+        mock_get_client: Mock,
+    ) -> None:
+        unchanged_queue_name = randstr()
+        changed_queue_name = randstr()
+        duplicated_queue_name = randstr()
+        topic_name = randstr()
+        filter_policy = '{"status": ["success"]}'
+        subscriptions_arns = {
+            unchanged_queue_name: [randstr()],
+            changed_queue_name: [randstr()],
+            duplicated_queue_name: [randstr(), randstr()],
+        }
+        current_attributes = {
+            subscriptions_arns[unchanged_queue_name][0]: {
+                'RawMessageDelivery': 'true',
+                'FilterPolicy': '{"status":["success"]}',
+            },
+            subscriptions_arns[changed_queue_name][0]: {'RawMessageDelivery': 'true', 'FilterPolicy': '{}'},
+            subscriptions_arns[duplicated_queue_name][0]: {'RawMessageDelivery': 'false'},
+        }
+
+        mock_get_topic_arn.side_effect = lambda name: f'arn:sns:{name}'
+        mock_get_queue_arn.side_effect = lambda name: f'arn:sqs:{name}'
+        mock_get_config.return_value.topics = {
+            topic_name: ConfigTopic(
+                subscribers=[
+                    ConfigTopicSubscriber(
+                        queue=unchanged_queue_name, raw_message_delivery=True, filter_policy=filter_policy
+                    ),
+                    ConfigTopicSubscriber(queue=changed_queue_name, filter_policy=filter_policy),
+                    ConfigTopicSubscriber(queue=duplicated_queue_name),
+                ],
+            ),
+        }
+        mock_get_client.return_value.get_paginator.return_value.paginate.return_value = [
+            {
+                'Subscriptions': [
+                    {'SubscriptionArn': arn, 'TopicArn': f'arn:sns:{topic_name}', 'Endpoint': f'arn:sqs:{queue_name}'}
+                    for queue_name, arns in subscriptions_arns.items()
+                    for arn in arns
+                ],
+            },
+        ]
+        mock_get_client.return_value.get_subscription_attributes.side_effect = lambda SubscriptionArn: {  # noqa: N803
+            'Attributes': current_attributes[SubscriptionArn]
+        }
+
+        subscribe_topics()
+
+        mock_get_client.return_value.subscribe.assert_not_called()
+        assert sorted(
+            mock_get_client.return_value.set_subscription_attributes.call_args_list,
+            key=lambda c: c.kwargs['AttributeName'],
+        ) == [
+            call(
+                SubscriptionArn=subscriptions_arns[changed_queue_name][0],
+                AttributeName='FilterPolicy',
+                AttributeValue=filter_policy,
+            ),
+            call(
+                SubscriptionArn=subscriptions_arns[changed_queue_name][0],
+                AttributeName='RawMessageDelivery',
+                AttributeValue='false',
+            ),
+        ]
+        mock_get_client.return_value.unsubscribe.assert_called_once_with(
+            SubscriptionArn=subscriptions_arns[duplicated_queue_name][1]
+        )
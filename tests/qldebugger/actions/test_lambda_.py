@@ -1,11 +1,32 @@
+import cProfile
+import os
+import pstats
+import sys
+from concurrent.futures.process import BrokenProcessPool
+from importlib import import_module
+from io import StringIO
+from pathlib import Path
 from random import randint
-from typing import TYPE_CHECKING, cast
+from time import sleep
+from typing import TYPE_CHECKING, Any, cast
 from unittest.mock import Mock, patch
 
 import pytest
 
-from qldebugger.actions.lambda_ import get_lambda_function, run_lambda
-from qldebugger.config.file_parser import ConfigLambda
+from qldebugger.actions.lambda_ import (
+    aggregate_profiles,
+    get_lambda_function,
+    get_profile_filename,
+    profile_lambdas,
+    reload_changed_modules,
+    run_lambda,
+    shutdown_lambda_pools,
+    submit_lambda,
+    watch_lambda_modules,
+)
+from qldebugger.aws import InjectedSession, inject_aws_config_in_client
+from qldebugger.config.file_parser import Config, ConfigAWS, ConfigLambda
+from qldebugger.example.lambdas import LambdaCustomError
 from tests.utils import randstr
 
 if TYPE_CHECKING:
@@ -43,6 +64,9 @@ class TestRunLambda:
     ) -> None:
         lambda_name = randstr()
         event: 'SQSEvent' = cast('SQSEvent', object())
+
+        mock_get_config.return_value.lambdas = {lambda_name: ConfigLambda(handler='a.a')}
+
         returned = run_lambda(lambda_name=lambda_name, event=event)
 
         mock_get_lambda_function.assert_called_once_with(lambda_name=lambda_name)
@@ -67,6 +91,74 @@ class TestRunLambda:
 
         assert exc_info.value == error
 
+    @patch('qldebugger.actions.lambda_.get_config')
+    @patch('qldebugger.actions.lambda_.get_lambda_function')
+    def test_with_profile(self, mock_get_lambda_function: Mock, mock_get_config: Mock, tmp_path: Path) -> None:
+        lambda_name = randstr()
+        profile_filename = tmp_path / f'{randstr()}.pstats'
+        event: 'SQSEvent' = cast('SQSEvent', object())
+        expected = randstr()
+
+        def lambda_handler(event: 'SQSEvent', context: None) -> str:
+            return expected
+
+        mock_get_config.return_value.lambdas = {lambda_name: ConfigLambda(handler='a.a')}
+        mock_get_lambda_function.return_value = lambda_handler
+
+        returned = run_lambda(lambda_name=lambda_name, event=event, profile_filename=profile_filename)
+
+        assert returned == expected
+        stats: Any = pstats.Stats(str(profile_filename))
+        assert any(function_name == 'lambda_handler' for _, _, function_name in stats.stats)
+
+    @patch('qldebugger.actions.lambda_.get_config')
+    @patch('qldebugger.actions.lambda_.get_lambda_function')
+    def test_with_memory_size(
+        self, mock_get_lambda_function: Mock, mock_get_config: Mock, caplog: pytest.LogCaptureFixture
+    ) -> None:
+        lambda_name = randstr()
+        event: 'SQSEvent' = cast('SQSEvent', object())
+
+        def lambda_handler(event: 'SQSEvent', context: None) -> int:
+            data = bytearray(2 * 1024 * 1024)
+            sleep(0.1)
+            return len(data)
+
+        allocation_line = lambda_handler.__code__.co_firstlineno + 1
+        mock_get_config.return_value.lambdas = {
+            lambda_name: ConfigLambda(handler='a.a').model_copy(
+                update={'memory_size': 1, 'enforce_memory_size': False}
+            )
+        }
+        mock_get_lambda_function.return_value = lambda_handler
+
+        with caplog.at_level('INFO', logger='qldebugger.actions.lambda_'):
+            returned = run_lambda(lambda_name=lambda_name, event=event)
+
+        assert returned == 2 * 1024 * 1024
+        assert f'Peak memory of {lambda_name!r} lambda' in caplog.text
+        assert f'Lambda {lambda_name!r} exceeded its memory size' in caplog.text
+        assert f'{__file__}:{allocation_line}:' in caplog.text
+        assert 'tracemalloc.py' not in caplog.text
+        assert 'actions/lambda_.py' not in caplog.text
+
+    @patch('qldebugger.actions.lambda_.get_config')
+    @patch('qldebugger.actions.lambda_.get_lambda_function')
+    def test_with_memory_size_enforced(self, mock_get_lambda_function: Mock, mock_get_config: Mock) -> None:
+        lambda_name = randstr()
+        event: 'SQSEvent' = cast('SQSEvent', object())
+
+        def lambda_handler(event: 'SQSEvent', context: None) -> int:
+            return len(bytearray(2 * 1024 * 1024))
+
+        mock_get_config.return_value.lambdas = {
+            lambda_name: ConfigLambda(handler='a.a').model_copy(update={'memory_size': 1, 'enforce_memory_size': True})
+        }
+        mock_get_lambda_function.return_value = lambda_handler
+
+        with pytest.raises(MemoryError, match=f'Lambda {lambda_name!r} used'):
+            run_lambda(lambda_name=lambda_name, event=event)
+
     @patch('qldebugger.actions.lambda_.get_config')
     @patch('qldebugger.actions.lambda_.get_lambda_function')
     def test_with_environment_variables(
@@ -115,6 +207,7 @@ class TestRunLambda:
                 region_name=region_name,
             )
 
+        mock_aws_get_config.return_value.lambdas = {lambda_name: ConfigLambda(handler='a.a')}
         mock_get_lambda_function.return_value = lambda_function
 
         run_lambda(lambda_name=lambda_name, event=event)
@@ -125,3 +218,348 @@ class TestRunLambda:
             aws_secret_access_key=aws_secret_access_key,
             region_name=region_name,
         )
+
+    @patch('qldebugger.actions.lambda_.get_config')
+    @patch('qldebugger.actions.lambda_.get_lambda_function')
+    @patch('qldebugger.actions.lambda_.inject_aws_config_in_resource')
+    def test_with_aws_configuration_injection_in_resource(
+        self,
+        mock_inject_aws_config_in_resource: Mock,
+        mock_get_lambda_function: Mock,
+        mock_aws_get_config: Mock,
+    ) -> None:
+        lambda_name = randstr()
+        event: 'SQSEvent' = cast('SQSEvent', object())
+        service_name = randstr()
+
+        def lambda_function(event: 'ReceiveMessageResultTypeDef', context: None) -> None:
+            import boto3
+
+            boto3.resource(service_name)  # type: ignore[call-overload]
+
+        mock_aws_get_config.return_value.lambdas = {lambda_name: ConfigLambda(handler='a.a')}
+        mock_get_lambda_function.return_value = lambda_function
+
+        run_lambda(lambda_name=lambda_name, event=event)
+
+        mock_inject_aws_config_in_resource.assert_called_once_with(service_name)
+
+    @patch('qldebugger.actions.lambda_.get_config')
+    @patch('qldebugger.actions.lambda_.get_lambda_function')
+    def test_with_aws_configuration_injection_in_session(
+        self,
+        mock_get_lambda_function: Mock,
+        mock_aws_get_config: Mock,
+    ) -> None:
+        lambda_name = randstr()
+        event: 'SQSEvent' = cast('SQSEvent', object())
+
+        def lambda_function(event: 'ReceiveMessageResultTypeDef', context: None) -> None:
+            import boto3
+
+            assert isinstance(boto3.Session(), InjectedSession)
+
+        mock_aws_get_config.return_value.lambdas = {lambda_name: ConfigLambda(handler='a.a')}
+        mock_get_lambda_function.return_value = lambda_function
+
+        run_lambda(lambda_name=lambda_name, event=event)
+
+
+@patch.dict('qldebugger.actions.lambda_._profile_dirs', clear=True)
+@patch.dict('qldebugger.actions.lambda_._profile_invocations', clear=True)
+class TestProfileLambdas:
+    def test_without_profile(self) -> None:
+        lambda_name = randstr()
+
+        profile_lambdas(lambda_names=[])
+
+        assert get_profile_filename(lambda_name=lambda_name, event_source_mapping_name=randstr()) is None
+
+    @patch('qldebugger.actions.lambda_.get_config')
+    def test_with_profile_dir(self, mock_get_config: Mock, tmp_path: Path) -> None:
+        lambda_name = randstr()
+        event_source_mapping_name = randstr()
+        profile_dir = tmp_path / randstr()
+
+        profile_lambdas(lambda_names=[lambda_name], profile_dir=profile_dir)
+
+        mock_get_config.assert_not_called()
+        assert profile_dir.is_dir()
+        assert [
+            get_profile_filename(lambda_name=lambda_name, event_source_mapping_name=event_source_mapping_name)
+            for _ in range(2)
+        ] == [
+            profile_dir / f'{event_source_mapping_name}-000001.pstats',
+            profile_dir / f'{event_source_mapping_name}-000002.pstats',
+        ]
+        assert get_profile_filename(lambda_name=lambda_name, event_source_mapping_name='other') == (
+            profile_dir / 'other-000001.pstats'
+        )
+
+    def test_continue_numbering_of_previous_runs(self, tmp_path: Path) -> None:
+        lambda_name = randstr()
+        event_source_mapping_name = randstr()
+
+        (tmp_path / f'{event_source_mapping_name}-000007.pstats').write_bytes(b'')
+        (tmp_path / f'{event_source_mapping_name}-x-000009.pstats').write_bytes(b'')
+        profile_lambdas(lambda_names=[lambda_name], profile_dir=tmp_path)
+
+        returned = get_profile_filename(lambda_name=lambda_name, event_source_mapping_name=event_source_mapping_name)
+
+        assert returned == tmp_path / f'{event_source_mapping_name}-000008.pstats'
+
+    @patch('qldebugger.actions.lambda_.get_config')
+    def test_with_config(self, mock_get_config: Mock, tmp_path: Path) -> None:
+        lambda_name = randstr()
+        other_lambda_name = randstr()
+        event_source_mapping_name = randstr()
+
+        mock_get_config.return_value.lambdas = {
+            lambda_name: ConfigLambda(handler='a.a', profile_dir=tmp_path),
+            other_lambda_name: ConfigLambda(handler='a.a'),
+        }
+
+        profile_lambdas(lambda_names=[lambda_name, other_lambda_name])
+
+        assert get_profile_filename(lambda_name=lambda_name, event_source_mapping_name=event_source_mapping_name) == (
+            tmp_path / f'{event_source_mapping_name}-000001.pstats'
+        )
+        assert (
+            get_profile_filename(lambda_name=other_lambda_name, event_source_mapping_name=event_source_mapping_name)
+            is None
+        )
+
+
+def profiled_function() -> None:
+    pass
+
+
+class TestAggregateProfiles:
+    def test_run(self, tmp_path: Path) -> None:
+        event_source_mapping_name = randstr()
+        dump = tmp_path / 'all.pstats'
+        output = StringIO()
+        for i in range(3):
+            profiler = cProfile.Profile()
+            profiler.runcall(profiled_function)
+            profiler.dump_stats(tmp_path / f'{event_source_mapping_name}-{i:06d}.pstats')
+        (tmp_path / 'other-000001.pstats').write_bytes(b'')
+
+        returned = aggregate_profiles(
+            profile_dir=tmp_path, output=output, event_source_mapping_names=[event_source_mapping_name], dump=dump
+        )
+
+        assert returned == 3
+        assert 'profiled_function' in output.getvalue()
+        stats: Any = pstats.Stats(str(dump))
+        assert (
+            next(
+                stat[0] for (_, _, function_name), stat in stats.stats.items() if function_name == 'profiled_function'
+            )
+            == 3
+        )
+
+    def test_ignore_event_source_mappings_with_same_prefix(self, tmp_path: Path) -> None:
+        event_source_mapping_name = f'{randstr()}[a]'
+        profiler = cProfile.Profile()
+        profiler.runcall(profiled_function)
+        profiler.dump_stats(tmp_path / f'{event_source_mapping_name}-000001.pstats')
+        (tmp_path / f'{event_source_mapping_name}-b-000001.pstats').write_bytes(b'')
+        (tmp_path / f'{event_source_mapping_name}-b-000002.pstats').write_bytes(b'')
+
+        returned = aggregate_profiles(
+            profile_dir=tmp_path, output=StringIO(), event_source_mapping_names=[event_source_mapping_name]
+        )
+
+        assert returned == 1
+
+    def test_without_profiles(self, tmp_path: Path) -> None:
+        with pytest.raises(RuntimeWarning, match='No profiles found'):
+            aggregate_profiles(profile_dir=tmp_path, output=StringIO())
+
+
+class TestReloadChangedModules:
+    def test_reload_changed_module(self, tmp_path: Path) -> None:
+        module_name = f'test_{randstr().lower()}'
+        module_file = tmp_path / f'{module_name}.py'
+        value1 = randstr()
+        value2 = randstr()
+
+        module_file.write_text(f'value = {value1!r}\n')
+        with patch('sys.path', [str(tmp_path), *sys.path]):
+            module = import_module(module_name)
+            try:
+                returned1 = reload_changed_modules(root=tmp_path)
+                module_file.write_text(f'value = {value2!r}\n')
+                os.utime(module_file, (0, module_file.stat().st_mtime + 1))
+                returned2 = reload_changed_modules(root=tmp_path)
+                returned3 = reload_changed_modules(root=tmp_path)
+            finally:
+                del sys.modules[module_name]
+
+        assert returned1 == []
+        assert returned2 == [module_name]
+        assert returned3 == []
+        assert module.value == value2
+
+    def test_reload_modules_importing_changed_module(self, tmp_path: Path) -> None:
+        helper_name = f'test_{randstr().lower()}'
+        helper_file = tmp_path / f'{helper_name}.py'
+        handler_name = f'test_{randstr().lower()}'
+        value1 = randstr()
+        value2 = randstr()
+
+        helper_file.write_text(f'def get_value():\n    return {value1!r}\n')
+        (tmp_path / f'{handler_name}.py').write_text(
+            f'from {helper_name} import get_value\n\n\ndef lambda_handler(event, context):\n    return get_value()\n'
+        )
+        with patch('sys.path', [str(tmp_path), *sys.path]):
+            handler = import_module(handler_name)
+            try:
+                reload_changed_modules(root=tmp_path)
+                returned1 = handler.lambda_handler(None, None)
+                helper_file.write_text(f'def get_value():\n    return {value2!r}\n')
+                os.utime(helper_file, (0, helper_file.stat().st_mtime + 1))
+                returned = reload_changed_modules(root=tmp_path)
+                returned2 = handler.lambda_handler(None, None)
+            finally:
+                del sys.modules[handler_name]
+                del sys.modules[helper_name]
+
+        assert returned == [helper_name, handler_name]
+        assert returned1 == value1
+        assert returned2 == value2
+
+    def test_ignore_modules_outside_root(self, tmp_path: Path) -> None:
+        returned1 = reload_changed_modules(root=tmp_path)
+        returned2 = reload_changed_modules(root=tmp_path)
+
+        assert returned1 == []
+        assert returned2 == []
+
+
+class TestWatchLambdaModules:
+    @patch('qldebugger.actions.lambda_._watch_modules', False)
+    @patch('qldebugger.actions.lambda_.get_config')
+    @patch('qldebugger.actions.lambda_.get_lambda_function')
+    @patch('qldebugger.actions.lambda_.reload_changed_modules')
+    def test_run(
+        self,
+        mock_reload_changed_modules: Mock,
+        mock_get_lambda_function: Mock,
+        mock_get_config: Mock,
+    ) -> None:
+        lambda_names = [randstr() for _ in range(randint(1, 5))]
+        event: 'SQSEvent' = cast('SQSEvent', object())
+
+        mock_get_config.return_value.lambdas = {name: ConfigLambda(handler='a.a') for name in lambda_names}
+
+        watch_lambda_modules(lambda_names=lambda_names)
+
+        assert mock_get_lambda_function.call_count == len(lambda_names)
+        mock_reload_changed_modules.assert_called_once_with()
+
+        run_lambda(lambda_name=lambda_names[0], event=event)
+
+        assert mock_reload_changed_modules.call_count == 2
+
+    @patch('qldebugger.actions.lambda_._watch_modules', False)
+    @patch('qldebugger.actions.lambda_.get_config')
+    @patch('qldebugger.actions.lambda_.get_lambda_function')
+    def test_import_with_aws_configuration(self, mock_get_lambda_function: Mock, mock_get_config: Mock) -> None:
+        import boto3
+
+        clients = []
+        mock_get_lambda_function.side_effect = lambda **_: clients.append(boto3.client)
+
+        watch_lambda_modules(lambda_names=[randstr()])
+
+        assert clients == [inject_aws_config_in_client]
+
+
+class TestSubmitLambda:
+    def test_run_in_worker_process(self) -> None:
+        config = Config(
+            queues={},
+            lambdas={
+                'print': ConfigLambda(handler='qldebugger.example.lambdas.print_messages'),
+                'fail': ConfigLambda(handler='qldebugger.example.lambdas.exec_fail'),
+            },
+            event_source_mapping={},
+        )
+        event = cast('SQSEvent', {'Records': []})
+
+        with patch('qldebugger.config._current_config', config):
+            try:
+                future_print = submit_lambda(lambda_name='print', event=event, processes=1)
+                future_fail = submit_lambda(lambda_name='fail', event=event, processes=1)
+
+                assert future_print.result(timeout=30) is None
+                with pytest.raises(LambdaCustomError):
+                    future_fail.result(timeout=30)
+            finally:
+                shutdown_lambda_pools()
+
+    def test_import_with_aws_configuration_in_worker_process(self, tmp_path: Path) -> None:
+        module_name = f'test_{randstr().lower()}'
+        endpoint_url = f'http://{randstr().lower()}:4566/'
+        (tmp_path / f'{module_name}.py').write_text(
+            'import boto3\n\n'
+            "CLIENT = boto3.client('sqs')\n\n\n"
+            'def lambda_handler(event, context):\n'
+            '    return CLIENT.meta.endpoint_url\n'
+        )
+        config = Config(
+            aws=ConfigAWS(region='us-east-1', endpoint_url=endpoint_url),
+            queues={},
+            lambdas={'client': ConfigLambda(handler=f'{module_name}.lambda_handler')},
+            event_source_mapping={},
+        )
+        event = cast('SQSEvent', {'Records': []})
+
+        with patch('qldebugger.config._current_config', config), patch('sys.path', [str(tmp_path), *sys.path]):
+            try:
+                future = submit_lambda(lambda_name='client', event=event, processes=1)
+
+                assert future.result(timeout=30) == endpoint_url
+            finally:
+                shutdown_lambda_pools()
+
+    @patch('qldebugger.actions.lambda_.get_config')
+    @patch('qldebugger.actions.lambda_.ProcessPoolExecutor')
+    def test_reuse_pool(self, mock_process_pool_executor: Mock, mock_get_config: Mock) -> None:
+        lambda_name = randstr()
+        processes = randint(1, 4)
+        event = cast('SQSEvent', object())
+
+        try:
+            submit_lambda(lambda_name=lambda_name, event=event, processes=processes)
+            returned = submit_lambda(lambda_name=lambda_name, event=event, processes=processes)
+        finally:
+            shutdown_lambda_pools()
+
+        mock_process_pool_executor.assert_called_once()
+        assert mock_process_pool_executor.call_args.kwargs['max_workers'] == processes
+        assert mock_process_pool_executor.call_args.kwargs['mp_context'].get_start_method() == 'spawn'
+        assert mock_process_pool_executor.return_value.submit.call_count == 2
+        assert returned == mock_process_pool_executor.return_value.submit.return_value
+
+    @patch('qldebugger.actions.lambda_.get_config')
+    @patch('qldebugger.actions.lambda_.ProcessPoolExecutor')
+    def test_restart_broken_pool(self, mock_process_pool_executor: Mock, mock_get_config: Mock) -> None:
+        lambda_name = randstr()
+        event = cast('SQSEvent', object())
+        broken_pool = Mock()
+        broken_pool.submit.side_effect = BrokenProcessPool
+        new_pool = Mock()
+
+        mock_process_pool_executor.side_effect = [broken_pool, new_pool]
+
+        try:
+            returned = submit_lambda(lambda_name=lambda_name, event=event, processes=1)
+        finally:
+            shutdown_lambda_pools()
+
+        broken_pool.shutdown.assert_called_once_with(wait=False)
+        new_pool.shutdown.assert_called_once_with()
+        assert returned == new_pool.submit.return_value
@@ -1,10 +1,30 @@
+import json
+from base64 import b64encode
+from io import StringIO
 from random import randint
-from typing import TYPE_CHECKING, Any, Mapping, cast
+from typing import TYPE_CHECKING, Any, Dict, List, Mapping, cast
 from unittest.mock import Mock, patch
 
 import pytest
 
-from qldebugger.actions.message import delete_messages, publish_message, purge_messages, receive_message, send_message
+from qldebugger.actions.message import (
+    MAX_BATCH_ATTEMPTS,
+    MessageEntry,
+    batch_message_entries,
+    change_messages_visibility,
+    delete_messages,
+    drain_messages,
+    get_visibility_timeout,
+    publish_message,
+    publish_messages,
+    purge_messages,
+    read_message_entries,
+    receive_message,
+    receive_message_batch,
+    release_messages,
+    send_message,
+    send_messages,
+)
 from tests.utils import randstr
 
 if TYPE_CHECKING:
@@ -13,31 +33,29 @@ if TYPE_CHECKING:
 
 
 class TestPublishMessage:
-    @patch('qldebugger.actions.message.get_account_id')
+    @patch('qldebugger.actions.message.get_topic_arn')
     @patch('qldebugger.actions.message.get_client')
-    def test_without_attributes(self, mock_get_client: Mock, mock_get_account_id: Mock) -> None:
-        account_id = f'{randint(0, 999999999999):012}'
-        region = randstr()
+    def test_without_attributes(self, mock_get_client: Mock, mock_get_topic_arn: Mock) -> None:
+        topic_arn = randstr()
         topic_name = randstr()
         message = randstr()
 
-        mock_get_account_id.return_value = account_id
-        mock_get_client.return_value.meta.region_name = region
+        mock_get_topic_arn.return_value = topic_arn
 
         publish_message(topic_name=topic_name, message=message)
 
         mock_get_client.assert_called_once_with('sns')
-        mock_get_client.return_value.publish(
-            TopicArn=f'arn:aws:sns:{region}:{account_id}:{topic_name}',
+        mock_get_topic_arn.assert_called_once_with(topic_name)
+        mock_get_client.return_value.publish.assert_called_once_with(
+            TopicArn=topic_arn,
             Message=message,
             MessageAttributes={},
         )
 
-    @patch('qldebugger.actions.message.get_account_id')
+    @patch('qldebugger.actions.message.get_topic_arn')
     @patch('qldebugger.actions.message.get_client')
-    def test_with_attributes(self, mock_get_client: Mock, mock_get_account_id: Mock) -> None:
-        account_id = f'{randint(0, 999999999999):012}'
-        region = randstr()
+    def test_with_attributes(self, mock_get_client: Mock, mock_get_topic_arn: Mock) -> None:
+        topic_arn = randstr()
         topic_name = randstr()
         message = randstr()
         attributes = cast(
@@ -45,44 +63,210 @@ class TestPublishMessage:
             {randstr(): {'DataType': 'String', 'StringValue': randstr()} for _ in range(randint(2, 5))},
         )
 
-        mock_get_account_id.return_value = account_id
-        mock_get_client.return_value.meta.region_name = region
+        mock_get_topic_arn.return_value = topic_arn
 
         publish_message(topic_name=topic_name, message=message, attributes=attributes)
 
         mock_get_client.assert_called_once_with('sns')
-        mock_get_client.return_value.publish(
-            TopicArn=f'arn:aws:sns:{region}:{account_id}:{topic_name}',
+        mock_get_topic_arn.assert_called_once_with(topic_name)
+        mock_get_client.return_value.publish.assert_called_once_with(
+            TopicArn=topic_arn,
             Message=message,
             MessageAttributes=attributes,
         )
 
 
+class TestPublishMessages:
+    @patch('qldebugger.actions.message.get_topic_arn')
+    @patch('qldebugger.actions.message.get_client')
+    def test_run(self, mock_get_client: Mock, mock_get_topic_arn: Mock) -> None:
+        topic_name = randstr()
+        topic_arn = randstr()
+        attributes = {randstr(): {'DataType': 'String', 'StringValue': randstr()}}
+        entries = [MessageEntry(body=randstr(), attributes=attributes) for _ in range(randint(11, 30))]
+
+        mock_get_topic_arn.return_value = topic_arn
+        mock_get_client.return_value.publish_batch.side_effect = lambda TopicArn, PublishBatchRequestEntries: {  # noqa: N803
+            'Successful': PublishBatchRequestEntries,
+            'Failed': [],
+        }
+
+        returned = publish_messages(topic_name=topic_name, entries=entries, workers=2)
+
+        mock_get_client.assert_called_with('sns')
+        mock_get_topic_arn.assert_called_once_with(topic_name)
+        assert returned == len(entries)
+        published = [
+            entry
+            for c in mock_get_client.return_value.publish_batch.call_args_list
+            for entry in c.kwargs['PublishBatchRequestEntries']
+        ]
+        assert sorted(entry['Message'] for entry in published) == sorted(entry.body for entry in entries)
+        for entry in published:
+            assert entry['MessageAttributes'] == attributes
+        for c in mock_get_client.return_value.publish_batch.call_args_list:
+            assert c.kwargs['TopicArn'] == topic_arn
+            assert len(c.kwargs['PublishBatchRequestEntries']) <= 10
+
+    @patch('qldebugger.actions.message.sleep')
+    @patch('qldebugger.actions.message.get_topic_arn')
+    @patch('qldebugger.actions.message.get_client')
+    def test_retry_failed_entries(self, mock_get_client: Mock, mock_get_topic_arn: Mock, mock_sleep: Mock) -> None:
+        entries = [MessageEntry(body=randstr(), attributes={}) for _ in range(2)]
+
+        mock_get_client.return_value.publish_batch.side_effect = [
+            {'Successful': [{'Id': '0'}], 'Failed': [{'Id': '1', 'SenderFault': False, 'Code': randstr()}]},
+            {'Successful': [{'Id': '1'}], 'Failed': []},
+        ]
+
+        returned = publish_messages(topic_name=randstr(), entries=entries)
+
+        assert returned == 2
+        assert mock_get_client.return_value.publish_batch.call_args.kwargs['PublishBatchRequestEntries'] == [
+            {'Id': '1', 'Message': entries[1].body}
+        ]
+
+
 class TestSendMessage:
     @patch('qldebugger.actions.message.get_client')
-    def test_run(self, mock_get_client: Mock) -> None:
+    @patch('qldebugger.actions.message.get_queue_url')
+    def test_run(self, mock_get_queue_url: Mock, mock_get_client: Mock) -> None:
         queue_name = randstr()
         queue_url = randstr()
         message = randstr()
 
-        mock_get_client.return_value.get_queue_url.return_value = {'QueueUrl': queue_url}
+        mock_get_queue_url.return_value = queue_url
 
         send_message(queue_name=queue_name, message=message)
 
         mock_get_client.assert_called_once_with('sqs')
-        mock_get_client.return_value.get_queue_url.assert_called_once_with(QueueName=queue_name)
+        mock_get_queue_url.assert_called_once_with(queue_name)
         mock_get_client.return_value.send_message.assert_called_once_with(QueueUrl=queue_url, MessageBody=message)
 
 
+class TestReadMessageEntries:
+    def test_text(self) -> None:
+        bodies = [randstr() for _ in range(randint(2, 5))]
+
+        returned = list(read_message_entries(StringIO('\n'.join(bodies) + '\n\n')))
+
+        assert returned == [MessageEntry(body=body, attributes={}) for body in bodies]
+
+    def test_jsonl(self) -> None:
+        entries = [
+            MessageEntry(body=randstr(), attributes={randstr(): {'DataType': 'String', 'StringValue': randstr()}})
+            for _ in range(randint(2, 5))
+        ]
+        content = '\n'.join(json.dumps({'body': entry.body, 'attributes': entry.attributes}) for entry in entries)
+
+        returned = list(read_message_entries(StringIO(content), jsonl=True))
+
+        assert returned == entries
+
+
+class TestBatchMessageEntries:
+    def test_split_by_count(self) -> None:
+        entries = [MessageEntry(body=randstr(), attributes={}) for _ in range(25)]
+
+        returned = list(batch_message_entries(entries))
+
+        assert returned == [entries[:10], entries[10:20], entries[20:]]
+
+    def test_split_by_size(self) -> None:
+        entries = [MessageEntry(body='a' * 100 * 1024, attributes={}) for _ in range(5)]
+
+        returned = list(batch_message_entries(entries))
+
+        assert returned == [entries[:2], entries[2:4], entries[4:]]
+
+
+class TestSendMessages:
+    @patch('qldebugger.actions.message.get_client')
+    @patch('qldebugger.actions.message.get_queue_url')
+    def test_run(self, mock_get_queue_url: Mock, mock_get_client: Mock) -> None:
+        queue_name = randstr()
+        queue_url = randstr()
+        attributes = {randstr(): {'DataType': 'String', 'StringValue': randstr()}}
+        entries = [
+            MessageEntry(body=randstr(), attributes=attributes if i % 2 else {}) for i in range(randint(11, 30))
+        ]
+
+        mock_get_queue_url.return_value = queue_url
+        mock_get_client.return_value.send_message_batch.side_effect = lambda QueueUrl, Entries: {  # noqa: N803
+            'Successful': Entries,
+            'Failed': [],
+        }
+
+        returned = send_messages(queue_name=queue_name, entries=entries, workers=2)
+
+        mock_get_queue_url.assert_called_once_with(queue_name)
+        assert returned == len(entries)
+        sent = [
+            entry
+            for c in mock_get_client.return_value.send_message_batch.call_args_list
+            for entry in c.kwargs['Entries']
+        ]
+        assert sorted(entry['MessageBody'] for entry in sent) == sorted(entry.body for entry in entries)
+        for entry in sent:
+            assert entry.get('MessageAttributes', {}) in ({}, attributes)
+        for c in mock_get_client.return_value.send_message_batch.call_args_list:
+            assert c.kwargs['QueueUrl'] == queue_url
+            assert len(c.kwargs['Entries']) <= 10
+
+    @patch('qldebugger.actions.message.sleep')
+    @patch('qldebugger.actions.message.get_client')
+    @patch('qldebugger.actions.message.get_queue_url')
+    def test_retry_failed_entries(self, mock_get_queue_url: Mock, mock_get_client: Mock, mock_sleep: Mock) -> None:
+        entries = [MessageEntry(body=randstr(), attributes={}) for _ in range(3)]
+
+        mock_get_client.return_value.send_message_batch.side_effect = [
+            {
+                'Successful': [{'Id': '0'}],
+                'Failed': [
+                    {'Id': '1', 'SenderFault': False, 'Code': randstr()},
+                    {'Id': '2', 'SenderFault': True, 'Code': randstr()},
+                ],
+            },
+            {'Successful': [{'Id': '1'}], 'Failed': []},
+        ]
+
+        returned = send_messages(queue_name=randstr(), entries=entries)
+
+        assert returned == 2
+        assert mock_get_client.return_value.send_message_batch.call_count == 2
+        assert mock_get_client.return_value.send_message_batch.call_args.kwargs['Entries'] == [
+            {'Id': '1', 'MessageBody': entries[1].body}
+        ]
+        mock_sleep.assert_called_once()
+
+    @patch('qldebugger.actions.message.sleep')
+    @patch('qldebugger.actions.message.get_client')
+    @patch('qldebugger.actions.message.get_queue_url')
+    def test_give_up_after_max_attempts(
+        self, mock_get_queue_url: Mock, mock_get_client: Mock, mock_sleep: Mock
+    ) -> None:
+        entries = [MessageEntry(body=randstr(), attributes={})]
+
+        mock_get_client.return_value.send_message_batch.return_value = {
+            'Failed': [{'Id': '0', 'SenderFault': False, 'Code': randstr()}],
+        }
+
+        returned = send_messages(queue_name=randstr(), entries=entries)
+
+        assert returned == 0
+        assert mock_get_client.return_value.send_message_batch.call_count == MAX_BATCH_ATTEMPTS
+
+
 class TestReceiveMessage:
     @patch('qldebugger.actions.message.get_client')
-    def test_with_messages_in_queue(self, mock_get_client: Mock) -> None:
+    @patch('qldebugger.actions.message.get_queue_url')
+    def test_with_messages_in_queue(self, mock_get_queue_url: Mock, mock_get_client: Mock) -> None:
         queue_name = randstr()
         queue_url = randstr()
         batch_size = randint(1, 10)
         maximum_batching_window = randint(0, 30)
 
-        mock_get_client.return_value.get_queue_url.return_value = {'QueueUrl': queue_url}
+        mock_get_queue_url.return_value = queue_url
         mock_get_client.return_value.receive_message.return_value = {
             'Messages': [randstr(10) for _ in range(randint(2, 5))],
         }
@@ -94,7 +278,7 @@ class TestReceiveMessage:
         )
 
         mock_get_client.assert_called_once_with('sqs')
-        mock_get_client.return_value.get_queue_url.assert_called_once_with(QueueName=queue_name)
+        mock_get_queue_url.assert_called_once_with(queue_name)
         mock_get_client.return_value.receive_message.assert_called_once_with(
             QueueUrl=queue_url,
             MaxNumberOfMessages=batch_size,
@@ -103,13 +287,14 @@ class TestReceiveMessage:
         assert returned == mock_get_client.return_value.receive_message.return_value
 
     @patch('qldebugger.actions.message.get_client')
-    def test_without_messages_in_queue(self, mock_get_client: Mock) -> None:
+    @patch('qldebugger.actions.message.get_queue_url')
+    def test_without_messages_in_queue(self, mock_get_queue_url: Mock, mock_get_client: Mock) -> None:
         queue_name = randstr()
         queue_url = randstr()
         batch_size = randint(1, 10)
         maximum_batching_window = randint(0, 30)
 
-        mock_get_client.return_value.get_queue_url.return_value = {'QueueUrl': queue_url}
+        mock_get_queue_url.return_value = queue_url
         mock_get_client.return_value.receive_message.return_value = {}
 
         with pytest.raises(RuntimeWarning, match='No messages received'):
@@ -120,7 +305,7 @@ class TestReceiveMessage:
             )
 
         mock_get_client.assert_called_once_with('sqs')
-        mock_get_client.return_value.get_queue_url.assert_called_once_with(QueueName=queue_name)
+        mock_get_queue_url.assert_called_once_with(queue_name)
         mock_get_client.return_value.receive_message.assert_called_once_with(
             QueueUrl=queue_url,
             MaxNumberOfMessages=batch_size,
@@ -128,9 +313,101 @@ class TestReceiveMessage:
         )
 
 
+class TestReceiveMessageBatch:
+    @staticmethod
+    def receive_message(*, MaxNumberOfMessages: int, **kwargs: Any) -> Dict[str, Any]:  # noqa: N803
+        return {
+            'Messages': [
+                {'MessageId': randstr(), 'ReceiptHandle': randstr(), 'Body': randstr()}
+                for _ in range(MaxNumberOfMessages)
+            ],
+        }
+
+    @patch('qldebugger.actions.message.ThreadPoolExecutor')
+    @patch('qldebugger.actions.message.get_client')
+    @patch('qldebugger.actions.message.get_queue_url')
+    def test_without_batching_window(
+        self, mock_get_queue_url: Mock, mock_get_client: Mock, mock_thread_pool_executor: Mock
+    ) -> None:
+        queue_name = randstr()
+        queue_url = randstr()
+        messages = {'Messages': [{'MessageId': randstr(), 'Body': randstr()} for _ in range(randint(1, 5))]}
+
+        mock_get_queue_url.return_value = queue_url
+        mock_get_client.return_value.receive_message.return_value = messages
+
+        returned = receive_message_batch(queue_name=queue_name, batch_size=10, maximum_batching_window=0)
+
+        mock_get_client.return_value.receive_message.assert_called_once_with(
+            QueueUrl=queue_url, MaxNumberOfMessages=10, WaitTimeSeconds=0
+        )
+        assert returned['Messages'] == messages['Messages']
+        mock_thread_pool_executor.assert_not_called()
+
+    @patch('qldebugger.actions.message.get_client')
+    @patch('qldebugger.actions.message.get_queue_url')
+    def test_receive_concurrently_until_batch_size(self, mock_get_queue_url: Mock, mock_get_client: Mock) -> None:
+        mock_get_client.return_value.receive_message.side_effect = self.receive_message
+
+        returned = receive_message_batch(queue_name=randstr(), batch_size=25, maximum_batching_window=5)
+
+        assert len(returned['Messages']) == 25
+        assert sorted(
+            c.kwargs['MaxNumberOfMessages'] for c in mock_get_client.return_value.receive_message.call_args_list
+        ) == [5, 10, 10]
+
+    @patch('qldebugger.actions.message.monotonic')
+    @patch('qldebugger.actions.message.get_client')
+    @patch('qldebugger.actions.message.get_queue_url')
+    def test_receive_until_batching_window(
+        self, mock_get_queue_url: Mock, mock_get_client: Mock, mock_monotonic: Mock
+    ) -> None:
+        messages = [{'MessageId': randstr(), 'Body': randstr()} for _ in range(2)]
+
+        mock_monotonic.side_effect = [0, 0, 1, 1, 6]
+        mock_get_client.return_value.receive_message.side_effect = [
+            {'Messages': messages[:1]},
+            {'Messages': messages[1:]},
+        ]
+
+        returned = receive_message_batch(queue_name=randstr(), batch_size=10, maximum_batching_window=5)
+
+        assert returned['Messages'] == messages
+        assert [
+            (c.kwargs['MaxNumberOfMessages'], c.kwargs['WaitTimeSeconds'])
+            for c in mock_get_client.return_value.receive_message.call_args_list
+        ] == [(10, 5), (9, 4)]
+
+    @patch('qldebugger.actions.message.MAX_RECEIVE_PAYLOAD_SIZE', 1000)
+    @patch('qldebugger.actions.message.release_messages')
+    @patch('qldebugger.actions.message.get_client')
+    @patch('qldebugger.actions.message.get_queue_url')
+    def test_release_messages_over_payload_size(
+        self, mock_get_queue_url: Mock, mock_get_client: Mock, mock_release_messages: Mock
+    ) -> None:
+        queue_name = randstr()
+        messages = [{'MessageId': randstr(), 'Body': randstr(400)} for _ in range(3)]
+
+        mock_get_client.return_value.receive_message.return_value = {'Messages': messages}
+
+        returned = receive_message_batch(queue_name=queue_name, batch_size=3, maximum_batching_window=0)
+
+        assert returned['Messages'] == messages[:2]
+        mock_release_messages.assert_called_once_with(queue_name=queue_name, messages={'Messages': messages[2:]})
+
+    @patch('qldebugger.actions.message.get_client')
+    @patch('qldebugger.actions.message.get_queue_url')
+    def test_without_messages_in_queue(self, mock_get_queue_url: Mock, mock_get_client: Mock) -> None:
+        mock_get_client.return_value.receive_message.return_value = {}
+
+        with pytest.raises(RuntimeWarning, match='No messages received'):
+            receive_message_batch(queue_name=randstr(), batch_size=randint(1, 100), maximum_batching_window=0)
+
+
 class TestDeleteMessages:
     @patch('qldebugger.actions.message.get_client')
-    def test_run(self, mock_get_client: Mock) -> None:
+    @patch('qldebugger.actions.message.get_queue_url')
+    def test_run(self, mock_get_queue_url: Mock, mock_get_client: Mock) -> None:
         queue_name = randstr()
         queue_url = randstr()
         messages: 'ReceiveMessageResultTypeDef' = {
@@ -140,12 +417,12 @@ class TestDeleteMessages:
             'ResponseMetadata': cast(Any, None),
         }
 
-        mock_get_client.return_value.get_queue_url.return_value = {'QueueUrl': queue_url}
+        mock_get_queue_url.return_value = queue_url
 
         delete_messages(queue_name=queue_name, messages=messages)
 
         mock_get_client.assert_called_once_with('sqs')
-        mock_get_client.return_value.get_queue_url.assert_called_once_with(QueueName=queue_name)
+        mock_get_queue_url.assert_called_once_with(queue_name)
         mock_get_client.return_value.delete_message_batch.assert_called_once_with(
             QueueUrl=queue_url,
             Entries=[
@@ -157,17 +434,191 @@ class TestDeleteMessages:
             ],
         )
 
+    @patch('qldebugger.actions.message.get_client')
+    @patch('qldebugger.actions.message.get_queue_url')
+    def test_delete_in_chunks(self, mock_get_queue_url: Mock, mock_get_client: Mock) -> None:
+        messages: 'ReceiveMessageResultTypeDef' = {
+            'Messages': [{'MessageId': randstr(), 'ReceiptHandle': randstr()} for _ in range(25)],
+            'ResponseMetadata': cast(Any, None),
+        }
+
+        delete_messages(queue_name=randstr(), messages=messages)
+
+        calls = mock_get_client.return_value.delete_message_batch.call_args_list
+        assert sorted(len(c.kwargs['Entries']) for c in calls) == [5, 10, 10]
+        assert sorted(entry['Id'] for c in calls for entry in c.kwargs['Entries']) == sorted(
+            message['MessageId'] for message in messages['Messages']
+        )
+
+
+class TestGetVisibilityTimeout:
+    @patch('qldebugger.actions.message.get_client')
+    @patch('qldebugger.actions.message.get_queue_url')
+    def test_run(self, mock_get_queue_url: Mock, mock_get_client: Mock) -> None:
+        queue_name = randstr()
+        queue_url = randstr()
+        visibility_timeout = randint(0, 43200)
+
+        mock_get_queue_url.return_value = queue_url
+        mock_get_client.return_value.get_queue_attributes.return_value = {
+            'Attributes': {'VisibilityTimeout': str(visibility_timeout)},
+        }
+
+        returned = get_visibility_timeout(queue_name=queue_name)
+
+        assert returned == visibility_timeout
+        mock_get_client.assert_called_once_with('sqs')
+        mock_get_queue_url.assert_called_once_with(queue_name)
+        mock_get_client.return_value.get_queue_attributes.assert_called_once_with(
+            QueueUrl=queue_url, AttributeNames=['VisibilityTimeout']
+        )
+
+
+class TestChangeMessagesVisibility:
+    @patch('qldebugger.actions.message.get_client')
+    @patch('qldebugger.actions.message.get_queue_url')
+    def test_run(self, mock_get_queue_url: Mock, mock_get_client: Mock) -> None:
+        queue_name = randstr()
+        queue_url = randstr()
+        visibility_timeout = randint(1, 43200)
+        messages: 'ReceiveMessageResultTypeDef' = {
+            'Messages': [
+                {'MessageId': randstr(), 'ReceiptHandle': randstr(), 'Body': randstr()} for _ in range(randint(1, 10))
+            ],
+            'ResponseMetadata': cast(Any, None),
+        }
+
+        mock_get_queue_url.return_value = queue_url
+
+        change_messages_visibility(queue_name=queue_name, messages=messages, visibility_timeout=visibility_timeout)
+
+        mock_get_client.assert_called_once_with('sqs')
+        mock_get_queue_url.assert_called_once_with(queue_name)
+        mock_get_client.return_value.change_message_visibility_batch.assert_called_once_with(
+            QueueUrl=queue_url,
+            Entries=[
+                {
+                    'Id': message['MessageId'],
+                    'ReceiptHandle': message['ReceiptHandle'],
+                    'VisibilityTimeout': visibility_timeout,
+                }
+                for message in messages['Messages']
+            ],
+        )
+
+
+class TestReleaseMessages:
+    @patch('qldebugger.actions.message.get_client')
+    @patch('qldebugger.actions.message.get_queue_url')
+    def test_run(self, mock_get_queue_url: Mock, mock_get_client: Mock) -> None:
+        queue_name = randstr()
+        queue_url = randstr()
+        messages: 'ReceiveMessageResultTypeDef' = {
+            'Messages': [
+                {'MessageId': randstr(), 'ReceiptHandle': randstr(), 'Body': randstr()} for _ in range(randint(1, 10))
+            ],
+            'ResponseMetadata': cast(Any, None),
+        }
+
+        mock_get_queue_url.return_value = queue_url
+
+        release_messages(queue_name=queue_name, messages=messages)
+
+        mock_get_client.return_value.change_message_visibility_batch.assert_called_once_with(
+            QueueUrl=queue_url,
+            Entries=[
+                {
+                    'Id': message['MessageId'],
+                    'ReceiptHandle': message['ReceiptHandle'],
+                    'VisibilityTimeout': 0,
+                }
+                for message in messages['Messages']
+            ],
+        )
+
+
+class TestDrainMessages:
+    @patch('qldebugger.actions.message.get_client')
+    @patch('qldebugger.actions.message.get_queue_url')
+    def test_until_empty(self, mock_get_queue_url: Mock, mock_get_client: Mock) -> None:
+        queue_url = randstr()
+        batches: List[List[Dict[str, Any]]] = [
+            [
+                {
+                    'MessageId': randstr(),
+                    'ReceiptHandle': randstr(),
+                    'Body': randstr(),
+                    'MessageAttributes': {randstr(): {'DataType': 'Binary', 'BinaryValue': randstr().encode()}},
+                }
+                for _ in range(randint(1, 10))
+            ]
+            for _ in range(randint(2, 5))
+        ]
+        output = StringIO()
+
+        mock_get_queue_url.return_value = queue_url
+        mock_get_client.return_value.receive_message.side_effect = [
+            {'Messages': batches[0]},
+            {},
+            *({'Messages': batch} for batch in batches[1:]),
+            {},
+            {},
+        ]
+
+        returned = drain_messages(queue_name=randstr(), output=output, workers=1, empty_receives=2)
+
+        messages = [message for batch in batches for message in batch]
+        assert returned == len(messages)
+        assert [json.loads(line) for line in output.getvalue().splitlines()] == [
+            {
+                'MessageId': message['MessageId'],
+                'Body': message['Body'],
+                'MessageAttributes': {
+                    k: {'DataType': 'Binary', 'BinaryValue': b64encode(v['BinaryValue']).decode()}
+                    for k, v in message['MessageAttributes'].items()
+                },
+            }
+            for message in messages
+        ]
+        assert mock_get_client.return_value.delete_message_batch.call_count == len(batches)
+        for c, batch in zip(mock_get_client.return_value.delete_message_batch.call_args_list, batches):
+            assert c.kwargs == {
+                'QueueUrl': queue_url,
+                'Entries': [
+                    {'Id': str(i), 'ReceiptHandle': message['ReceiptHandle']} for i, message in enumerate(batch)
+                ],
+            }
+
+    @patch('qldebugger.actions.message.get_client')
+    @patch('qldebugger.actions.message.get_queue_url')
+    def test_max_messages(self, mock_get_queue_url: Mock, mock_get_client: Mock) -> None:
+        max_messages = randint(11, 50)
+        output = StringIO()
+
+        mock_get_client.return_value.receive_message.side_effect = lambda **kwargs: {
+            'Messages': [
+                {'MessageId': randstr(), 'ReceiptHandle': randstr(), 'Body': randstr()}
+                for _ in range(kwargs['MaxNumberOfMessages'])
+            ],
+        }
+
+        returned = drain_messages(queue_name=randstr(), output=output, workers=3, max_messages=max_messages)
+
+        assert returned == max_messages
+        assert len(output.getvalue().splitlines()) == max_messages
+
 
 class TestPurgeMessages:
     @patch('qldebugger.actions.message.get_client')
-    def test_run(self, mock_get_client: Mock) -> None:
+    @patch('qldebugger.actions.message.get_queue_url')
+    def test_run(self, mock_get_queue_url: Mock, mock_get_client: Mock) -> None:
         queue_name = randstr()
         queue_url = randstr()
 
-        mock_get_client.return_value.get_queue_url.return_value = {'QueueUrl': queue_url}
+        mock_get_queue_url.return_value = queue_url
 
         purge_messages(queue_name=queue_name)
 
         mock_get_client.assert_called_once_with('sqs')
-        mock_get_client.return_value.get_queue_url.assert_called_once_with(QueueName=queue_name)
+        mock_get_queue_url.assert_called_once_with(queue_name)
         mock_get_client.return_value.purge_queue.assert_called_once_with(QueueUrl=queue_url)
@@ -114,6 +114,9 @@ class TestConfigLambda:
         assert returned.model_dump() == {
             'handler': tuple(self.DEFAULT_ARGS['handler'].rsplit('.', maxsplit=1)),
             'environment': {},
+            'profile_dir': None,
+            'memory_size': None,
+            'enforce_memory_size': False,
         }
 
     def test_handler_argument(self) -> None:
@@ -173,8 +176,28 @@ class TestConfigEventSourceMapping:
             'function_name': self.DEFAULT_ARGS['function_name'],
             'batch_size': 10,
             'maximum_batching_window': 0,
+            'function_response_types': [],
+            'visibility_heartbeat_interval': None,
         }
 
+    @pytest.mark.parametrize(
+        'args',
+        [
+            {'batch_size': 0},
+            {'batch_size': 10001},
+            {'maximum_batching_window': -1},
+            {'maximum_batching_window': 301},
+            {'visibility_heartbeat_interval': 0},
+        ],
+    )
+    def test_invalid_batching(self, args: Dict[str, Any]) -> None:
+        with pytest.raises(ValidationError):
+            ConfigEventSourceMapping(**self.DEFAULT_ARGS, **args)
+
+    def test_invalid_function_response_types(self) -> None:
+        with pytest.raises(ValidationError):
+            ConfigEventSourceMapping(**self.DEFAULT_ARGS, function_response_types=[randstr()])
+
 
 class TestConfig:
     def test_required_fields(self) -> None:
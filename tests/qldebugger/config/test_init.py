@@ -1,10 +1,22 @@
+from pathlib import Path
 from unittest.mock import Mock, patch
 
 import pytest
 
-from qldebugger.config import get_config, load_config
+from qldebugger.config import get_config, load_config, set_config
 from tests.utils import randstr
 
+CONFIG = """
+[queues]
+{queue_name} = {{}}
+
+[lambdas]
+print = {{handler = "qldebugger.example.lambdas.print_messages"}}
+
+[event_source_mapping]
+a = {{queue = "{queue_name}", function_name = "print"}}
+"""
+
 
 class TestLoadConfig:
     @patch('qldebugger.config.Path')
@@ -12,13 +24,73 @@ class TestLoadConfig:
     def test_load_config(self, mock_config: Mock, mock_path: Mock) -> None:
         filename = randstr()
 
-        returned = load_config(filename)
+        returned = load_config(filename, use_cache=False)
 
         mock_path.assert_called_once_with(filename)
-        mock_path.return_value.open.assert_called_once_with('rb')
-        mock_config.from_toml.assert_called_once_with(mock_path.return_value.open.return_value.__enter__.return_value)
+        mock_path.return_value.resolve.return_value.open.assert_called_once_with('rb')
+        mock_config.from_toml.assert_called_once_with(
+            mock_path.return_value.resolve.return_value.open.return_value.__enter__.return_value
+        )
         assert returned == mock_config.from_toml.return_value
 
+    @patch('qldebugger.config._current_config', None)
+    @patch('qldebugger.cache.get_cache_dir')
+    def test_load_cached_config(self, mock_get_cache_dir: Mock, tmp_path: Path) -> None:
+        filename = tmp_path / 'qldebugger.toml'
+        queue_name = randstr()
+
+        mock_get_cache_dir.return_value = tmp_path / 'cache'
+        filename.write_text(CONFIG.format(queue_name=queue_name))
+
+        returned = load_config(filename)
+        with patch('qldebugger.config.Config.from_toml') as mock_from_toml:
+            cached = load_config(filename)
+
+        mock_from_toml.assert_not_called()
+        assert cached == returned
+        assert list(cached.queues) == [queue_name]
+
+    @patch('qldebugger.config._current_config', None)
+    @patch('qldebugger.cache.get_cache_dir')
+    def test_reload_changed_config(self, mock_get_cache_dir: Mock, tmp_path: Path) -> None:
+        filename = tmp_path / 'qldebugger.toml'
+        queue_name = randstr()
+
+        mock_get_cache_dir.return_value = tmp_path / 'cache'
+        filename.write_text(CONFIG.format(queue_name=randstr()))
+        load_config(filename)
+        filename.write_text(CONFIG.format(queue_name=queue_name))
+
+        returned = load_config(filename)
+
+        assert list(returned.queues) == [queue_name]
+
+    @patch('qldebugger.config._current_config', None)
+    @patch('qldebugger.cache.get_cache_dir')
+    def test_invalid_cache(self, mock_get_cache_dir: Mock, tmp_path: Path) -> None:
+        filename = tmp_path / 'qldebugger.toml'
+        queue_name = randstr()
+
+        mock_get_cache_dir.return_value = tmp_path / 'cache'
+        filename.write_text(CONFIG.format(queue_name=queue_name))
+        load_config(filename)
+        for cache_file in (tmp_path / 'cache').iterdir():
+            cache_file.write_bytes(randstr().encode())
+
+        returned = load_config(filename)
+
+        assert list(returned.queues) == [queue_name]
+
+
+class TestSetConfig:
+    @patch('qldebugger.config._current_config', None)
+    def test_set_config(self) -> None:
+        config = Mock()
+
+        set_config(config)
+
+        assert get_config() == config
+
 
 class TestGetConfig:
     @patch('qldebugger.config._current_config', None)
@@ -1,9 +1,23 @@
 from random import randint
+from typing import Any, Dict
 from unittest.mock import Mock, patch
 
 import pytest
+from botocore.config import Config
+from botocore.exceptions import ClientError
 
-from qldebugger.aws import get_account_id, get_client, inject_aws_config_in_client
+from qldebugger.aws import (
+    InjectedSession,
+    clear_injected_clients,
+    forget_queue_url_on_error,
+    get_account_id,
+    get_client,
+    get_queue_arn,
+    get_queue_url,
+    get_topic_arn,
+    inject_aws_config_in_client,
+    inject_aws_config_in_resource,
+)
 from qldebugger.config.file_parser import ConfigAWS
 from tests.utils import randstr
 
@@ -26,18 +40,18 @@ class TestGetClient:
 
         returned = get_client(service)  # type: ignore[call-overload]
 
-        mock_boto3.Session.assert_called_once_with(
+        mock_boto3.session.Session.assert_called_once_with(
             aws_access_key_id=aws_config.access_key_id,
             aws_secret_access_key=aws_config.secret_access_key,
             aws_session_token=aws_config.session_token,
             region_name=aws_config.region,
             profile_name=aws_config.profile,
         )
-        mock_boto3.Session.return_value.client.assert_called_once_with(
+        mock_boto3.session.Session.return_value.client.assert_called_once_with(
             service_name=service,
             endpoint_url=aws_config.endpoint_url,
         )
-        assert returned == mock_boto3.Session.return_value.client.return_value
+        assert returned == mock_boto3.session.Session.return_value.client.return_value
 
     @patch('qldebugger.aws.get_config')
     @patch('qldebugger.aws.boto3')
@@ -52,7 +66,7 @@ class TestGetClient:
         )
 
         mock_get_config.return_value.aws = aws_config
-        mock_boto3.Session.return_value.client.side_effect = lambda **kwargs: object()
+        mock_boto3.session.Session.return_value.client.side_effect = lambda **kwargs: object()
 
         get_client.cache_clear()  # type: ignore[attr-defined]
 
@@ -61,16 +75,16 @@ class TestGetClient:
         cache_info = get_client.cache_info()  # type: ignore[attr-defined]
         assert cache_info.hits == 0
         assert cache_info.misses == 1
-        assert mock_boto3.Session.call_count == 1
-        assert mock_boto3.Session.return_value.client.call_count == 1
+        assert mock_boto3.session.Session.call_count == 1
+        assert mock_boto3.session.Session.return_value.client.call_count == 1
 
         returned2 = get_client('sts')
 
         cache_info = get_client.cache_info()  # type: ignore[attr-defined]
         assert cache_info.hits == 1
         assert cache_info.misses == 1
-        assert mock_boto3.Session.call_count == 1
-        assert mock_boto3.Session.return_value.client.call_count == 1
+        assert mock_boto3.session.Session.call_count == 1
+        assert mock_boto3.session.Session.return_value.client.call_count == 1
         assert returned1 is returned2
 
         returned3 = get_client('sqs')
@@ -78,26 +92,227 @@ class TestGetClient:
         cache_info = get_client.cache_info()  # type: ignore[attr-defined]
         assert cache_info.hits == 1
         assert cache_info.misses == 2
-        assert mock_boto3.Session.call_count == 2
-        assert mock_boto3.Session.return_value.client.call_count == 2
+        assert mock_boto3.session.Session.call_count == 2
+        assert mock_boto3.session.Session.return_value.client.call_count == 2
         assert returned3 is not returned1  # type: ignore[comparison-overlap]
 
 
 class TestGetAccountId:
+    @patch('qldebugger.aws.save_cache')
+    @patch('qldebugger.aws.load_cache')
+    @patch('qldebugger.aws.get_config')
     @patch('qldebugger.aws.get_client')
-    def test_run(self, mock_get_client: Mock) -> None:
+    def test_run(
+        self, mock_get_client: Mock, mock_get_config: Mock, mock_load_cache: Mock, mock_save_cache: Mock
+    ) -> None:
         account_id = f'{randint(0, 999999999999):012}'
 
+        mock_get_config.return_value.aws = ConfigAWS()
+        mock_load_cache.return_value = {}
         mock_get_client.return_value.get_caller_identity.return_value = {
             'Account': account_id,
         }
 
+        get_account_id.cache_clear()  # type: ignore[attr-defined]
+
         returned = get_account_id()
 
         mock_get_client.assert_called_once_with('sts')
         mock_get_client.return_value.get_caller_identity.assert_called_once_with()
+        mock_save_cache.assert_called_once()
         assert returned == account_id
 
+    @patch('qldebugger.aws.save_cache')
+    @patch('qldebugger.aws.load_cache')
+    @patch('qldebugger.aws.get_config')
+    @patch('qldebugger.aws.get_client')
+    def test_cache(
+        self, mock_get_client: Mock, mock_get_config: Mock, mock_load_cache: Mock, mock_save_cache: Mock
+    ) -> None:
+        mock_get_config.return_value.aws = ConfigAWS()
+        mock_load_cache.return_value = {}
+        mock_get_client.return_value.get_caller_identity.return_value = {
+            'Account': f'{randint(0, 999999999999):012}',
+        }
+
+        get_account_id.cache_clear()  # type: ignore[attr-defined]
+
+        returned1 = get_account_id()
+        returned2 = get_account_id()
+
+        mock_get_client.return_value.get_caller_identity.assert_called_once_with()
+        assert returned1 == returned2
+
+    @patch('qldebugger.aws.save_cache')
+    @patch('qldebugger.aws.load_cache')
+    @patch('qldebugger.aws.get_config')
+    @patch('qldebugger.aws.get_client')
+    def test_persistent_cache(
+        self, mock_get_client: Mock, mock_get_config: Mock, mock_load_cache: Mock, mock_save_cache: Mock
+    ) -> None:
+        aws_config = ConfigAWS(endpoint_url=randstr(), profile=randstr(), access_key_id=randstr())
+        account_id = f'{randint(0, 999999999999):012}'
+        cache: Dict[str, Any] = {}
+
+        mock_get_config.return_value.aws = aws_config
+        mock_load_cache.side_effect = lambda name: cache
+        mock_save_cache.side_effect = lambda name, data: cache.update(data)
+        mock_get_client.return_value.get_caller_identity.return_value = {'Account': account_id}
+
+        get_account_id.cache_clear()  # type: ignore[attr-defined]
+        returned1 = get_account_id()
+        get_account_id.cache_clear()  # type: ignore[attr-defined]
+        returned2 = get_account_id()
+        mock_get_config.return_value.aws = aws_config.model_copy(update={'access_key_id': randstr()})
+        get_account_id.cache_clear()  # type: ignore[attr-defined]
+        get_account_id()
+
+        assert returned1 == account_id
+        assert returned2 == account_id
+        assert mock_get_client.return_value.get_caller_identity.call_count == 2
+
+    @patch('qldebugger.aws.save_cache')
+    @patch('qldebugger.aws.load_cache')
+    @patch('qldebugger.aws.get_config')
+    @patch('qldebugger.aws.get_client')
+    def test_expired_cache(
+        self, mock_get_client: Mock, mock_get_config: Mock, mock_load_cache: Mock, mock_save_cache: Mock
+    ) -> None:
+        account_id = f'{randint(0, 999999999999):012}'
+
+        mock_get_config.return_value.aws = ConfigAWS()
+        mock_load_cache.return_value = {
+            key: {'account_id': randstr(), 'expires_at': 0} for key in [randstr() for _ in range(randint(1, 5))]
+        }
+        mock_get_client.return_value.get_caller_identity.return_value = {'Account': account_id}
+
+        get_account_id.cache_clear()  # type: ignore[attr-defined]
+
+        returned = get_account_id()
+
+        mock_get_client.return_value.get_caller_identity.assert_called_once_with()
+        assert len(mock_save_cache.call_args.args[1]) == 1
+        assert returned == account_id
+
+    @patch('qldebugger.aws.load_cache')
+    @patch('qldebugger.aws.get_config')
+    @patch('qldebugger.aws.get_client')
+    def test_with_account_id_in_config(
+        self, mock_get_client: Mock, mock_get_config: Mock, mock_load_cache: Mock
+    ) -> None:
+        account_id = f'{randint(0, 999999999999):012}'
+
+        mock_get_config.return_value.aws = ConfigAWS(account_id=account_id)
+
+        get_account_id.cache_clear()  # type: ignore[attr-defined]
+
+        returned = get_account_id()
+
+        mock_get_client.assert_not_called()
+        mock_load_cache.assert_not_called()
+        assert returned == account_id
+
+
+class TestGetQueueUrl:
+    @patch('qldebugger.aws.get_client')
+    def test_cache(self, mock_get_client: Mock) -> None:
+        queue_name = randstr()
+        queue_url = randstr()
+
+        mock_get_client.return_value.meta.endpoint_url = randstr()
+        mock_get_client.return_value.get_queue_url.return_value = {'QueueUrl': queue_url}
+
+        returned1 = get_queue_url(queue_name)
+        returned2 = get_queue_url(queue_name)
+
+        mock_get_client.assert_called_with('sqs')
+        mock_get_client.return_value.get_queue_url.assert_called_once_with(QueueName=queue_name)
+        assert returned1 == queue_url
+        assert returned2 == queue_url
+
+    @patch('qldebugger.aws.get_client')
+    def test_cache_per_endpoint(self, mock_get_client: Mock) -> None:
+        queue_name = randstr()
+
+        mock_get_client.return_value.get_queue_url.side_effect = lambda QueueName: {'QueueUrl': randstr()}  # noqa: N803
+
+        mock_get_client.return_value.meta.endpoint_url = randstr()
+        returned1 = get_queue_url(queue_name)
+        mock_get_client.return_value.meta.endpoint_url = randstr()
+        returned2 = get_queue_url(queue_name)
+
+        assert mock_get_client.return_value.get_queue_url.call_count == 2
+        assert returned1 != returned2
+
+    @pytest.mark.parametrize('error_code', ['AWS.SimpleQueueService.NonExistentQueue', 'QueueDoesNotExist'])
+    @patch('qldebugger.aws.get_client')
+    def test_forget_on_queue_does_not_exist_error(self, mock_get_client: Mock, error_code: str) -> None:
+        queue_name = randstr()
+        error = ClientError({'Error': {'Code': error_code}}, randstr())
+
+        mock_get_client.return_value.meta.endpoint_url = randstr()
+        mock_get_client.return_value.get_queue_url.return_value = {'QueueUrl': randstr()}
+
+        get_queue_url(queue_name)
+        with pytest.raises(ClientError), forget_queue_url_on_error(queue_name):
+            raise error
+        get_queue_url(queue_name)
+
+        assert mock_get_client.return_value.get_queue_url.call_count == 2
+
+    @patch('qldebugger.aws.get_client')
+    def test_keep_on_other_errors(self, mock_get_client: Mock) -> None:
+        queue_name = randstr()
+        error = ClientError({'Error': {'Code': randstr()}}, randstr())
+
+        mock_get_client.return_value.meta.endpoint_url = randstr()
+        mock_get_client.return_value.get_queue_url.return_value = {'QueueUrl': randstr()}
+
+        get_queue_url(queue_name)
+        with pytest.raises(ClientError), forget_queue_url_on_error(queue_name):
+            raise error
+        get_queue_url(queue_name)
+
+        mock_get_client.return_value.get_queue_url.assert_called_once_with(QueueName=queue_name)
+
+
+class TestGetQueueArn:
+    @patch('qldebugger.aws.get_account_id')
+    @patch('qldebugger.aws.get_client')
+    def test_run(self, mock_get_client: Mock, mock_get_account_id: Mock) -> None:
+        partition = randstr()
+        region = randstr()
+        account_id = f'{randint(0, 999999999999):012}'
+        queue_name = randstr()
+
+        mock_get_client.return_value.meta.partition = partition
+        mock_get_client.return_value.meta.region_name = region
+        mock_get_account_id.return_value = account_id
+
+        returned = get_queue_arn(queue_name)
+
+        mock_get_client.assert_called_once_with('sqs')
+        assert returned == f'arn:{partition}:sqs:{region}:{account_id}:{queue_name}'
+
+
+class TestGetTopicArn:
+    @patch('qldebugger.aws.get_account_id')
+    @patch('qldebugger.aws.get_client')
+    def test_run(self, mock_get_client: Mock, mock_get_account_id: Mock) -> None:
+        partition = randstr()
+        region = randstr()
+        account_id = f'{randint(0, 999999999999):012}'
+        topic_name = randstr()
+
+        mock_get_client.return_value.meta.partition = partition
+        mock_get_client.return_value.meta.region_name = region
+        mock_get_account_id.return_value = account_id
+
+        returned = get_topic_arn(topic_name)
+
+        mock_get_client.assert_called_once_with('sns')
+        assert returned == f'arn:{partition}:sns:{region}:{account_id}:{topic_name}'
+
 
 class TestInjectAwsConfigInClient:
     @patch('qldebugger.aws.get_config')
@@ -107,16 +322,17 @@ class TestInjectAwsConfigInClient:
 
         mock_get_config.return_value.aws = ConfigAWS()
 
+        clear_injected_clients()
         inject_aws_config_in_client(service_name)
 
-        mock_boto3.Session.assert_called_once_with(
+        mock_boto3.session.Session.assert_called_once_with(
             aws_access_key_id=None,
             aws_secret_access_key=None,
             aws_session_token=None,
             region_name=None,
             profile_name=None,
         )
-        mock_boto3.Session.return_value.client.assert_called_once_with(
+        mock_boto3.session.Session.return_value.client.assert_called_once_with(
             service_name=service_name,
             api_version=None,
             use_ssl=True,
@@ -140,16 +356,17 @@ class TestInjectAwsConfigInClient:
 
         mock_get_config.return_value.aws = config
 
+        clear_injected_clients()
         inject_aws_config_in_client(service_name)
 
-        mock_boto3.Session.assert_called_once_with(
+        mock_boto3.session.Session.assert_called_once_with(
             aws_access_key_id=config.access_key_id,
             aws_secret_access_key=config.secret_access_key,
             aws_session_token=config.session_token,
             region_name=config.region,
             profile_name=config.profile,
         )
-        mock_boto3.Session.return_value.client.assert_called_once_with(
+        mock_boto3.session.Session.return_value.client.assert_called_once_with(
             service_name=service_name,
             api_version=None,
             use_ssl=True,
@@ -157,3 +374,89 @@ class TestInjectAwsConfigInClient:
             endpoint_url=config.endpoint_url,
             config=None,
         )
+
+    @patch('qldebugger.aws.get_config')
+    @patch('qldebugger.aws.boto3')
+    def test_cache(self, mock_boto3: Mock, mock_get_config: Mock) -> None:
+        service_name1 = randstr()
+        service_name2 = randstr()
+
+        mock_get_config.return_value.aws = ConfigAWS(endpoint_url=f'https://{randstr()}')
+        mock_boto3.session.Session.return_value.client.side_effect = lambda **kwargs: object()
+
+        clear_injected_clients()
+        returned1 = inject_aws_config_in_client(service_name1)
+        returned2 = inject_aws_config_in_client(service_name1)
+        returned3 = inject_aws_config_in_client(service_name1, config=Config(retries={'max_attempts': 1}))
+        returned4 = inject_aws_config_in_client(service_name1, config=Config(retries={'max_attempts': 1}))
+        returned5 = inject_aws_config_in_client(service_name2)
+
+        assert mock_boto3.session.Session.return_value.client.call_count == 3
+        assert returned1 is returned2
+        assert returned3 is returned4
+        assert returned1 is not returned3
+        assert returned1 is not returned5
+
+
+class TestInjectAwsConfigInResource:
+    @patch('qldebugger.aws.get_config')
+    @patch('qldebugger.aws.boto3')
+    def test_with_aws_configuration(self, mock_boto3: Mock, mock_get_config: Mock) -> None:
+        service_name = randstr()
+        config = ConfigAWS(
+            profile=randstr(),
+            access_key_id=randstr(),
+            secret_access_key=randstr(),
+            session_token=randstr(),
+            region=randstr(),
+            endpoint_url=f'https://{randstr()}',
+        )
+
+        mock_get_config.return_value.aws = config
+
+        clear_injected_clients()
+        returned1 = inject_aws_config_in_resource(service_name)
+        returned2 = inject_aws_config_in_resource(service_name)
+
+        mock_boto3.session.Session.assert_called_once_with(
+            aws_access_key_id=config.access_key_id,
+            aws_secret_access_key=config.secret_access_key,
+            aws_session_token=config.session_token,
+            region_name=config.region,
+            profile_name=config.profile,
+        )
+        mock_boto3.session.Session.return_value.resource.assert_called_once_with(
+            service_name=service_name,
+            api_version=None,
+            use_ssl=True,
+            verify=None,
+            endpoint_url=config.endpoint_url,
+            config=None,
+        )
+        assert returned1 is returned2
+
+
+class TestInjectedSession:
+    @patch('qldebugger.aws.inject_aws_config_in_client')
+    def test_client(self, mock_inject_aws_config_in_client: Mock) -> None:
+        service_name = randstr()
+        region_name = randstr()
+
+        returned = InjectedSession(region_name=region_name).client(service_name)
+
+        mock_inject_aws_config_in_client.assert_called_once_with(
+            service_name, region_name, None, True, None, None, None, None, None, None
+        )
+        assert returned == mock_inject_aws_config_in_client.return_value
+
+    @patch('qldebugger.aws.inject_aws_config_in_resource')
+    def test_resource(self, mock_inject_aws_config_in_resource: Mock) -> None:
+        service_name = randstr()
+        region_name = randstr()
+
+        returned = InjectedSession().resource(service_name, region_name=region_name)
+
+        mock_inject_aws_config_in_resource.assert_called_once_with(
+            service_name, region_name, None, True, None, None, None, None, None, None
+        )
+        assert returned == mock_inject_aws_config_in_resource.return_value
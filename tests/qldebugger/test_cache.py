@@ -0,0 +1,115 @@
+import stat
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+from qldebugger.cache import get_cache_dir, load_binary_cache, load_cache, save_binary_cache, save_cache
+from tests.utils import randstr
+
+
+class TestGetCacheDir:
+    def test_with_xdg_cache_home(self, tmp_path: Path) -> None:
+        with patch.dict('os.environ', {'XDG_CACHE_HOME': str(tmp_path)}):
+            returned = get_cache_dir()
+
+        assert returned == tmp_path / 'qldebugger'
+
+    def test_without_xdg_cache_home(self, tmp_path: Path) -> None:
+        with patch.dict('os.environ', {'XDG_CACHE_HOME': '', 'HOME': str(tmp_path)}):
+            returned = get_cache_dir()
+
+        assert returned == tmp_path / '.cache' / 'qldebugger'
+
+
+class TestLoadCache:
+    @patch('qldebugger.cache.get_cache_dir')
+    def test_without_file(self, mock_get_cache_dir: Path, tmp_path: Path) -> None:
+        mock_get_cache_dir.return_value = tmp_path  # type: ignore[attr-defined]
+
+        returned = load_cache(randstr())
+
+        assert returned == {}
+
+    @patch('qldebugger.cache.get_cache_dir')
+    def test_with_invalid_file(self, mock_get_cache_dir: Path, tmp_path: Path) -> None:
+        name = randstr()
+
+        mock_get_cache_dir.return_value = tmp_path  # type: ignore[attr-defined]
+        (tmp_path / f'{name}.json').write_text(randstr())
+
+        returned = load_cache(name)
+
+        assert returned == {}
+
+
+class TestSaveCache:
+    @patch('qldebugger.cache.get_cache_dir')
+    def test_save_and_load(self, mock_get_cache_dir: Path, tmp_path: Path) -> None:
+        name = randstr()
+        data = {randstr(): randstr() for _ in range(5)}
+
+        mock_get_cache_dir.return_value = tmp_path / randstr()  # type: ignore[attr-defined]
+
+        save_cache(name, data)
+        returned = load_cache(name)
+
+        assert returned == data
+
+
+class TestBinaryCache:
+    @patch('qldebugger.cache.get_cache_dir')
+    def test_without_file(self, mock_get_cache_dir: Path, tmp_path: Path) -> None:
+        mock_get_cache_dir.return_value = tmp_path  # type: ignore[attr-defined]
+
+        returned = load_binary_cache(randstr())
+
+        assert returned is None
+
+    @patch('qldebugger.cache.get_cache_dir')
+    def test_save_and_load(self, mock_get_cache_dir: Path, tmp_path: Path) -> None:
+        name = randstr()
+        data = randstr().encode()
+
+        mock_get_cache_dir.return_value = tmp_path / randstr()  # type: ignore[attr-defined]
+
+        save_binary_cache(name, data)
+        returned = load_binary_cache(name)
+
+        assert returned == data
+
+    @patch('qldebugger.cache.get_cache_dir')
+    def test_save_private_file(self, mock_get_cache_dir: Path, tmp_path: Path) -> None:
+        name = randstr()
+        cache_dir = tmp_path / randstr()
+
+        mock_get_cache_dir.return_value = cache_dir  # type: ignore[attr-defined]
+
+        save_binary_cache(name, randstr().encode())
+
+        assert stat.S_IMODE(cache_dir.stat().st_mode) == 0o700
+        assert stat.S_IMODE((cache_dir / f'{name}.bin').stat().st_mode) == 0o600
+        assert [filename.name for filename in cache_dir.iterdir()] == [f'{name}.bin']
+
+    @patch('qldebugger.cache.get_cache_dir')
+    def test_ignore_file_writable_by_other_users(self, mock_get_cache_dir: Path, tmp_path: Path) -> None:
+        name = randstr()
+
+        mock_get_cache_dir.return_value = tmp_path  # type: ignore[attr-defined]
+        (tmp_path / f'{name}.bin').write_bytes(randstr().encode())
+        (tmp_path / f'{name}.bin').chmod(0o666)
+
+        returned = load_binary_cache(name)
+
+        assert returned is None
+
+    @patch('qldebugger.cache.os.getuid', create=True)
+    @patch('qldebugger.cache.get_cache_dir')
+    def test_ignore_file_of_other_users(self, mock_get_cache_dir: Path, mock_getuid: Mock, tmp_path: Path) -> None:
+        name = randstr()
+
+        mock_get_cache_dir.return_value = tmp_path  # type: ignore[attr-defined]
+        mock_getuid.return_value = (tmp_path.stat().st_uid + 1) % 65536
+        save_binary_cache(name, randstr().encode())
+
+        returned = load_binary_cache(name)
+
+        assert returned is None
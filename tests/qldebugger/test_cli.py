@@ -0,0 +1,81 @@
+import os
+import subprocess
+import sys
+from typing import List
+from unittest.mock import Mock, patch
+
+import pytest
+from click.testing import CliRunner
+
+from qldebugger.actions.event_source_mapping import EventSourceMappingsError
+from qldebugger.cli import cli
+from tests.utils import randstr
+
+HEAVY_MODULES = ['boto3', 'botocore', 'pydantic', 'tomli', 'unittest.mock', 'qldebugger.config', 'qldebugger.aws']
+STARTUP_BUDGET = 0.2
+
+
+def run_python(*args: str) -> 'subprocess.CompletedProcess[str]':
+    return subprocess.run(  # noqa: S603
+        [sys.executable, *args],
+        capture_output=True,
+        check=True,
+        env={**os.environ, 'PYTHONPATH': os.pathsep.join(sys.path)},
+        text=True,
+    )
+
+
+class TestStartup:
+    @pytest.mark.parametrize('args', [['--help'], ['run', '--help'], ['init', '--help']])
+    def test_help_should_not_import_heavy_modules(self, args: List[str]) -> None:
+        code = f"""
+import sys
+from qldebugger.cli import cli
+try:
+    cli({args!r})
+except SystemExit:
+    pass
+print(','.join(module for module in {HEAVY_MODULES!r} if module in sys.modules))
+"""
+
+        returned = run_python('-c', code)
+
+        assert returned.stdout.splitlines()[-1] == ''
+
+    def test_import_time(self) -> None:
+        returned = run_python('-X', 'importtime', '-c', 'import qldebugger.cli')
+
+        cumulative = next(
+            int(line.split('|')[1])
+            for line in returned.stderr.splitlines()
+            if line.split('|')[-1].strip() == 'qldebugger.cli'
+        )
+        assert cumulative / 1_000_000 < STARTUP_BUDGET
+
+
+class TestRun:
+    @patch('qldebugger.cli.load_config')
+    @patch('qldebugger.actions.event_source_mapping.run_event_source_mappings')
+    def test_follow_with_fewer_workers_than_event_source_mappings(
+        self, mock_run_event_source_mappings: Mock, mock_load_config: Mock
+    ) -> None:
+        returned = CliRunner().invoke(cli, ['run', '--follow', '--workers', '1', randstr(), randstr()])
+
+        assert returned.exit_code == 2
+        assert '--follow requires at least one worker per event source mapping' in returned.output
+        mock_run_event_source_mappings.assert_not_called()
+
+    @patch('qldebugger.cli.load_config')
+    @patch('qldebugger.actions.lambda_.profile_lambdas')
+    @patch('qldebugger.actions.event_source_mapping.run_event_source_mappings')
+    def test_failed_event_source_mappings(
+        self, mock_run_event_source_mappings: Mock, mock_profile_lambdas: Mock, mock_load_config: Mock
+    ) -> None:
+        event_source_mapping_names = [randstr(), randstr()]
+
+        mock_run_event_source_mappings.side_effect = EventSourceMappingsError(event_source_mapping_names[1:])
+
+        returned = CliRunner().invoke(cli, ['run', *event_source_mapping_names])
+
+        assert returned.exit_code == 1
+        assert f'Error on execute event source mappings: {event_source_mapping_names[1]}' in returned.output
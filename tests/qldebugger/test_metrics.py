@@ -0,0 +1,178 @@
+import json
+import socket
+from pathlib import Path
+from random import randint
+from time import sleep
+from typing import Iterator
+from unittest.mock import patch
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import pytest
+
+from qldebugger.metrics import (
+    BUCKETS,
+    get_snapshot,
+    increment_counter,
+    measure_stage,
+    observe_histogram,
+    render_prometheus,
+    reset_metrics,
+    start_metrics,
+    start_metrics_server,
+)
+from tests.utils import randstr
+
+
+@pytest.fixture(autouse=True)
+def _reset_metrics() -> Iterator[None]:
+    reset_metrics()
+    yield
+    reset_metrics()
+
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return int(sock.getsockname()[1])
+
+
+class TestIncrementCounter:
+    def test_run(self) -> None:
+        name = randstr()
+        label = randstr()
+        values = [randint(1, 100) for _ in range(randint(2, 10))]
+
+        for value in values:
+            increment_counter(name, value, label=label)
+        increment_counter(name, label=randstr())
+
+        counters = get_snapshot()['counters']
+        assert {'name': name, 'labels': {'label': label}, 'value': sum(values)} in counters
+        assert len(counters) == 2
+
+
+class TestObserveHistogram:
+    def test_run(self) -> None:
+        name = randstr()
+
+        observe_histogram(name, BUCKETS[0], label='a')
+        observe_histogram(name, BUCKETS[1], label='a')
+        observe_histogram(name, BUCKETS[-1] + 1, label='a')
+
+        (histogram,) = get_snapshot()['histograms']
+        assert histogram['name'] == name
+        assert histogram['labels'] == {'label': 'a'}
+        assert histogram['count'] == 3
+        assert histogram['sum'] == BUCKETS[0] + BUCKETS[1] + BUCKETS[-1] + 1
+        assert histogram['buckets'][str(BUCKETS[0])] == 1
+        assert histogram['buckets'][str(BUCKETS[1])] == 2
+        assert histogram['buckets'][str(BUCKETS[-1])] == 2
+
+
+class TestMeasureStage:
+    def test_success(self) -> None:
+        event_source_mapping_name = randstr()
+
+        with patch('qldebugger.metrics.perf_counter', side_effect=[1.0, 1.5]), measure_stage(
+            event_source_mapping_name, 'lambda'
+        ):
+            pass
+
+        snapshot = get_snapshot()
+        assert snapshot['counters'] == []
+        (histogram,) = snapshot['histograms']
+        assert histogram['name'] == 'qldebugger_stage_duration_seconds'
+        assert histogram['labels'] == {'event_source_mapping': event_source_mapping_name, 'stage': 'lambda'}
+        assert histogram['sum'] == 0.5
+
+    def test_error(self) -> None:
+        event_source_mapping_name = randstr()
+
+        with pytest.raises(ValueError, match='error'), measure_stage(event_source_mapping_name, 'lambda'):
+            raise ValueError('error')
+
+        snapshot = get_snapshot()
+        assert snapshot['counters'] == [
+            {
+                'name': 'qldebugger_stage_errors_total',
+                'labels': {'event_source_mapping': event_source_mapping_name, 'stage': 'lambda'},
+                'value': 1,
+            }
+        ]
+        assert snapshot['histograms'][0]['count'] == 1
+
+    def test_empty_receive_is_not_an_error(self) -> None:
+        with pytest.raises(RuntimeWarning), measure_stage(randstr(), 'receive'):
+            raise RuntimeWarning
+
+        snapshot = get_snapshot()
+        assert snapshot['counters'] == []
+        assert snapshot['histograms'][0]['count'] == 1
+
+
+class TestRenderPrometheus:
+    def test_run(self) -> None:
+        increment_counter('qldebugger_batches_total', 2, event_source_mapping='a')
+        observe_histogram('qldebugger_stage_duration_seconds', 0.2, event_source_mapping='a', stage='receive')
+
+        returned = render_prometheus()
+
+        lines = returned.splitlines()
+        assert '# TYPE process_cpu_seconds_total counter' in lines
+        assert '# TYPE qldebugger_batches_total counter' in lines
+        assert 'qldebugger_batches_total{event_source_mapping="a"} 2.0' in lines
+        assert '# TYPE qldebugger_stage_duration_seconds histogram' in lines
+        assert 'qldebugger_stage_duration_seconds_bucket{event_source_mapping="a",stage="receive",le="0.1"} 0' in lines
+        assert (
+            'qldebugger_stage_duration_seconds_bucket{event_source_mapping="a",stage="receive",le="0.25"} 1' in lines
+        )
+        assert (
+            'qldebugger_stage_duration_seconds_bucket{event_source_mapping="a",stage="receive",le="+Inf"} 1' in lines
+        )
+        assert 'qldebugger_stage_duration_seconds_sum{event_source_mapping="a",stage="receive"} 0.2' in lines
+        assert 'qldebugger_stage_duration_seconds_count{event_source_mapping="a",stage="receive"} 1' in lines
+        assert returned.endswith('\n')
+
+
+class TestStartMetricsServer:
+    def test_run(self) -> None:
+        port = get_free_port()
+        increment_counter('qldebugger_batches_total', event_source_mapping='a')
+
+        stop = start_metrics_server(port=port)
+        try:
+            with urlopen(f'http://127.0.0.1:{port}/metrics') as response:
+                body = response.read().decode()
+                content_type = response.headers['Content-Type']
+            with pytest.raises(HTTPError, match='404'):
+                urlopen(f'http://127.0.0.1:{port}/{randstr()}')
+        finally:
+            stop()
+
+        assert content_type.startswith('text/plain; version=0.0.4')
+        assert 'qldebugger_batches_total{event_source_mapping="a"} 1.0' in body.splitlines()
+
+
+class TestStartMetrics:
+    def test_snapshots(self, tmp_path: Path) -> None:
+        filename = tmp_path / 'metrics.jsonl'
+        increment_counter('qldebugger_batches_total', event_source_mapping='a')
+
+        stop = start_metrics(filename=filename, interval=0.01)
+        while not filename.exists():
+            sleep(0.01)
+        stop()
+
+        snapshots = [json.loads(line) for line in filename.read_text().splitlines()]
+        assert len(snapshots) >= 2
+        for snapshot in snapshots:
+            assert snapshot['counters'] == [
+                {'name': 'qldebugger_batches_total', 'labels': {'event_source_mapping': 'a'}, 'value': 1}
+            ]
+            assert snapshot['process']['process_cpu_seconds_total'] > 0
+
+    def test_without_outputs(self) -> None:
+        stop = start_metrics()
+
+        stop()